@@ -1,7 +1,9 @@
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Send
 from app.core.state import AgentState
-from app.agent.nodes import node_explore, node_design, node_implement, node_verify, node_human_approval
+from app.core.checkpoint import get_checkpointer
+from app.core.metrics import timed_node
+from app.agent.nodes import node_explore, node_crawl, node_design, node_implement, node_scenario, node_verify, node_human_approval
 
 def check_feedback(state: AgentState):
     """
@@ -22,23 +24,54 @@ def check_feedback(state: AgentState):
     
     return "end"
 
-def build_graph():
+def route_after_explore(state: AgentState):
+    """Router: crawl the rest of the site first when the run asked for crawl mode."""
+    return "crawl" if state.get("crawl") else "design"
+
+def fan_out_scenarios(state: AgentState):
+    """
+    Router: Sends every new or modified scenario of the approved plan to its own
+    'scenario' branch. Branches run in parallel and are joined by 'verify'; scenarios
+    reused by 'implement' skip straight to the join.
+    """
+    results = state.get("scenario_results") or {}
+    pending = [
+        s for s in state.get("scenarios") or []
+        if results.get(s["id"], {}).get("plan_fingerprint") != s["fingerprint"]
+    ]
+    if not pending:
+        return "verify"
+    shared = {
+        key: state.get(key, "")
+        for key in ("url", "clean_dom", "extractor", "execution_limits", "metrics", "error_feedback", "user_feedback")
+    }
+    return [
+        Send("scenario", {**shared, "scenario": scenario, "previous": results.get(scenario["id"])})
+        for scenario in pending
+    ]
+
+def build_graph(checkpointer=None):
     """
     Defines the workflow with Human-in-the-Loop interrupts.
+    Checkpoints go to `checkpointer`, or the process-wide one from Config.CHECKPOINT_BACKEND.
     """
     workflow = StateGraph(AgentState)
     
-    workflow.add_node("explore", node_explore)
-    workflow.add_node("design", node_design)
-    workflow.add_node("implement", node_implement)
-    workflow.add_node("verify", node_verify)
-    workflow.add_node("human_approval", node_human_approval)
+    workflow.add_node("explore", timed_node("explore", node_explore))
+    workflow.add_node("crawl", timed_node("crawl", node_crawl))
+    workflow.add_node("design", timed_node("design", node_design))
+    workflow.add_node("implement", timed_node("implement", node_implement))
+    workflow.add_node("scenario", timed_node("scenario", node_scenario))
+    workflow.add_node("verify", timed_node("verify", node_verify))
+    workflow.add_node("human_approval", timed_node("human_approval", node_human_approval))
     
     workflow.set_entry_point("explore")
     
-    workflow.add_edge("explore", "design")
+    workflow.add_conditional_edges("explore", route_after_explore, ["crawl", "design"])
+    workflow.add_edge("crawl", "design")
     workflow.add_edge("design", "implement")
-    workflow.add_edge("implement", "verify")
+    workflow.add_conditional_edges("implement", fan_out_scenarios, ["scenario", "verify"])
+    workflow.add_edge("scenario", "verify")
     workflow.add_edge("verify", "human_approval")
     
     # Conditional routing based on feedback
@@ -52,6 +85,6 @@ def build_graph():
     )
     
     return workflow.compile(
-        checkpointer=MemorySaver(),
+        checkpointer=checkpointer or get_checkpointer(),
         interrupt_before=["implement", "human_approval"]
     )
\ No newline at end of file
@@ -1,25 +1,31 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from app.core.state import AgentState
-from app.core.llm import get_llm
+from app.agent.scenarios import code_fingerprint, plan_fingerprint, split_scenarios
+from app.core.llm import get_llm, model_id
+from app.core.cache import ExplorationCache, get_exploration_cache
+from app.core.blobs import maybe_put, resolve
+from app.core.tokens import fit_prompt, truncate_to_tokens, warm_token_counter
 from app.engine.browser import BrowserManager
+from app.engine.crawler import SiteCrawler, format_site_map, normalize_url
 from app.engine.dom_cleaner import DOMCleaner
+from app.engine.dom_retriever import format_chunks, get_dom_index
+from app.engine.executor import ExecutionLimits, LogBuffer, RunOutcome
+from langchain_core.callbacks.manager import adispatch_custom_event
 from langchain_core.messages import HumanMessage
+from langgraph.config import get_config
 from app.core.tracing import observe # Import robust observer
+from app.core.profiling import span
+from loguru import logger
+from config import Config
 
 # Global browser instance
 browser = BrowserManager()
 
-@observe(name="explore")
-async def node_explore(state: AgentState):
-    """Phase 1: Exploration."""
-    url = state['url']
-    await browser.navigate(url)
-    
-    raw_html = await browser.get_content()
-    clean_dom = DOMCleaner.clean_dom(raw_html)
-    screenshot = await browser.take_screenshot()
-    
-    llm = get_llm()
-    prompt = f"""
+# Bump when the exploration prompt changes so cached summaries are not reused
+EXPLORE_PROMPT_VERSION = "2"
+EXPLORE_PROMPT = """
     Analyze this DOM structure for a QA testing agent.
     1. Identify the main purpose of the page.
     2. List the interactive elements (Buttons, Inputs, Links) with their Locators.
@@ -27,32 +33,169 @@ async def node_explore(state: AgentState):
     DOM Content:
     {clean_dom}
     """
-    response = llm.invoke([HumanMessage(content=prompt)])
+
+# Scenario results ordered from least to most severe; the report shows the worst
+RESULT_SEVERITY = {"Passed": 0, "Failed": 1, "Timeout": 2, "OOM": 3, "Crash": 4}
+# Executor outcomes that replace the Passed/Failed verdict
+OUTCOME_RESULTS = {"timeout": "Timeout", "oom": "OOM", "crash": "Crash"}
+
+def _record_llm_usage(state: AgentState, response, node: str):
+    """Adds the response's token usage (prompt/completion) and LLM-cache hit/miss to the session metrics."""
+    state['metrics'].add_usage(response.usage_metadata, node)
+    if Config.LLM_CACHE_BACKEND != "none" and node not in Config.LLM_CACHE_DISABLED_NODES:
+        state['metrics'].record_cache("llm", hit=bool(response.response_metadata.get("cache_hit")))
+
+async def _summarize_page(state: AgentState, clean_dom: str, node: str = "explore") -> str:
+    """Exploration summary of one page representation, from the exploration cache when possible."""
+    # Never cache a failed navigation (empty DOM)
+    cache = get_exploration_cache() if clean_dom else None
+    cache_key = ExplorationCache.key(clean_dom, model_id(), EXPLORE_PROMPT_VERSION)
+    cached = cache.get(cache_key) if cache else None
+    if cache:
+        state['metrics'].record_cache("exploration", hit=cached is not None)
+    if cached:
+        return cached["page_summary"]
+
+    llm = get_llm(node=node)
+    await warm_token_counter()
+    prompt = fit_prompt(node, EXPLORE_PROMPT, {"clean_dom": clean_dom}).text
+    response = await llm.ainvoke([HumanMessage(content=prompt)])
+    _record_llm_usage(state, response, node)
+    if cache:
+        cache.set(cache_key, {"page_summary": response.content})
+    return response.content
+
+@observe(name="explore")
+async def node_explore(state: AgentState):
+    """
+    Phase 1: Exploration. The page representation (`clean_dom`) is the cleaned HTML or,
+    with the "a11y" extractor, the accessibility-tree outline.
+    """
+    url = state['url']
+    extractor = state.get('extractor') or Config.PAGE_EXTRACTOR
+    # Lease an isolated page so concurrent sessions don't share a tab
+    async with browser.lease() as page:
+        readiness = await browser.navigate(url, page=page)
+        raw_html = await browser.get_content(page=page)
+        a11y_tree = await browser.get_accessibility_tree(page=page) if extractor == "a11y" else ""
+        # Skipped when the caller has no use for the image (e.g. the CLI)
+        wants_screenshot = Config.SCREENSHOT_ENABLED and state.get('capture_screenshot', True)
+        screenshot = await browser.take_screenshot(page=page) if wants_screenshot else None
+    
+    state['metrics'].record_timing("readiness_wait", readiness.waited)
+    if a11y_tree:
+        clean_dom = a11y_tree
+    else:
+        if extractor == "a11y":
+            logger.warning("Accessibility tree unavailable; falling back to the DOM extractor")
+            extractor = "dom"
+        clean_dom = DOMCleaner.clean_dom(raw_html, mode=Config.DOM_MODE)
+    if extractor == "dom" and Config.DOM_RETRIEVAL and clean_dom:
+        # Build the chunk index once per exploration; implementation retries reuse it
+        with span("dom.index", "dom"):
+            get_dom_index(clean_dom, Config.RETRIEVAL_CHUNK_CHARS)
     
-    state['metrics'].add_tokens(response.usage_metadata.get('total_tokens', 0))
+    page_summary = await _summarize_page(state, clean_dom)
     state['metrics'].log_step("Exploration")
     
     return {
-        "dom_content": raw_html,
-        "clean_dom": clean_dom,
-        "screenshot_path": screenshot,
-        "page_summary": response.content,
+        # Large fields are checkpointed as blob references; nodes resolve() them on read
+        "dom_content": maybe_put(raw_html),
+        "clean_dom": maybe_put(clean_dom),
+        "extractor": extractor,
+        "screenshot": screenshot,
+        "page_summary": page_summary,
         "attempt_count": 0 
     }
 
 
+@observe(name="crawl")
+async def node_crawl(state: AgentState):
+    """
+    Phase 1b (crawl mode): explores the same-origin pages reachable from the start page
+    and condenses them into a site map for the design prompt. Pages are summarized as
+    soon as they are fetched, while the crawl continues.
+    """
+    settings = {**Config.CRAWL_DEFAULTS, **(state.get('crawl') or {})}
+    extractor = state.get('extractor') or "dom"
+    crawler = SiteCrawler(
+        browser, settings["max_depth"], settings["max_pages"], Config.CRAWL_CONCURRENCY,
+        Config.CRAWL_DUPLICATE_DISTANCE, clean=lambda html: DOMCleaner.clean_dom(html, mode=Config.DOM_MODE),
+    )
+    start_url = normalize_url(state['url']) or state['url']
+    summaries = {}
+
+    async def summarize(page):
+        summary = await _summarize_page(state, page.clean_dom, node="crawl")
+        page.summary = truncate_to_tokens(summary, Config.CRAWL_SUMMARY_TOKENS)
+
+    def on_page(page):
+        # The start page already has its full summary in page_summary
+        if page.url != start_url:
+            summaries[page.url] = asyncio.create_task(summarize(page))
+
+    await warm_token_counter()
+    started = time.perf_counter()
+    # The start page's HTML is reused when exploration cleaned it as a DOM (not a11y)
+    start_html = resolve(state.get('dom_content') or "") if extractor == "dom" else ""
+    try:
+        pages = await crawler.crawl(start_url, start_html or None, on_page)
+    finally:
+        results = await asyncio.gather(*summaries.values(), return_exceptions=True)
+    for url, result in zip(summaries, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Summary of {url} failed: {result}")
+    state['metrics'].record_timing("crawl", time.perf_counter() - started)
+    state['metrics'].log_step("Crawl")
+
+    return {
+        "site_pages": [
+            {"url": p.url, "depth": p.depth, "title": p.title, "summary": p.summary,
+             "duplicate_of": p.duplicate_of, "error": p.error}
+            for p in pages
+        ],
+        "site_map": format_site_map(pages),
+    }
+
+
+def _select_dom_context(dom: str, query: str, extractor: str = "dom"):
+    """
+    Returns (dom_context, chunk_ids) for the implementation prompt. Pages that fit in
+    the retrieval budget are sent whole; larger ones are reduced to the chunks that
+    best match the plan and feedback. Accessibility outlines are already budgeted.
+    """
+    budget = Config.RETRIEVAL_BUDGET_TOKENS * 4
+    if not Config.DOM_RETRIEVAL or extractor != "dom" or len(dom) <= budget:
+        return dom, []
+    with span("dom.retrieve", "dom") as args:
+        chunks = get_dom_index(dom, Config.RETRIEVAL_CHUNK_CHARS).select(query, budget)
+        args["chunks"] = len(chunks)
+    chunk_ids = [chunk.id for chunk in chunks]
+    logger.info(f"DOM retrieval: {len(chunk_ids)} chunks ({sum(len(c.html) for c in chunks)} chars) -> {chunk_ids}")
+    return format_chunks(chunks), chunk_ids
+
+
 @observe(name="design")
 async def node_design(state: AgentState):
     """Phase 2: Collaborative Test Design."""
-    llm = get_llm()
+    llm = get_llm(node="design")
     summary = state['page_summary']
     user_feedback = state.get('user_feedback', "")
     previous_plan = state.get('test_plan', "")
     
-    # Build context-aware prompt
+    # Build context-aware prompt; sections are filled in (and shrunk if needed) by fit_prompt
+    sections = {"page_summary": summary}
+    site_context = ""
+    if state.get('site_map'):
+        sections["site_map"] = state['site_map']
+        site_context = """
+    Other pages reachable from this one (crawl mode); scenarios may navigate to them:
+    {site_map}
+    """
     feedback_context = ""
     if user_feedback and len(user_feedback.strip()) > 0:
-        feedback_context = f"""
+        sections.update(previous_plan=previous_plan, user_feedback=user_feedback)
+        feedback_context = """
     
     CRITICAL: The user provided the following feedback on the previous test plan:
     Previous Plan: {previous_plan}
@@ -63,18 +206,20 @@ async def node_design(state: AgentState):
     You MUST revise the test plan to fully address this feedback. Do not ignore any of the user's requests.
     """
     
-    prompt = f"""
+    template = """
     Based on the page analysis below, propose a Test Plan.
     Create a list of 3 distinct test scenarios (e.g., "Verify Login", "Check Header").
+    Start each one on its own line as "Scenario N: <title>" so they can be run independently.
     
     Page Analysis:
-    {summary}
-    {feedback_context}
-    """
+    {page_summary}
+    """ + site_context + feedback_context
+    await warm_token_counter()
+    prompt = fit_prompt("design", template, sections).text
     
-    response = llm.invoke([HumanMessage(content=prompt)])
+    response = await llm.ainvoke([HumanMessage(content=prompt)])
     
-    state['metrics'].add_tokens(response.usage_metadata.get('total_tokens', 0))
+    _record_llm_usage(state, response, "design")
     state['metrics'].log_step("Design")
     
     # Clear user_feedback after incorporating it
@@ -86,23 +231,72 @@ async def node_design(state: AgentState):
 
 @observe(name="implement")
 async def node_implement(state: AgentState):
-    """Phase 3: Implementation."""
-    llm = get_llm()
-    plan = state['test_plan']
-    dom = state['clean_dom']
-    
+    """
+    Phase 3: Implementation. Splits the approved plan into scenarios for parallel branches.
+    With INCREMENTAL_VERIFY, scenarios whose plan fingerprint matches a previously passed
+    one reuse its code and result; only new or modified scenarios are sent to a branch.
+    """
+    scenarios = split_scenarios(state['test_plan'])
+    for scenario in scenarios:
+        scenario['fingerprint'] = plan_fingerprint(scenario['text'], state['url'], state['clean_dom'])
+    logger.info(f"Test plan split into {len(scenarios)} scenario(s): {[s['title'] for s in scenarios]}")
+
+    previous = state.get('scenario_results') or {}
+    if not Config.INCREMENTAL_VERIFY or not previous:
+        # None resets the per-scenario table before the branches write into it
+        return {"scenarios": scenarios, "scenario_results": None}
+
+    passed = {r['plan_fingerprint']: r for r in previous.values() if r['result'] == "Passed"}
+    current_ids = {s['id'] for s in scenarios}
+    # Stale entries of changed scenarios stay until their branch overwrites them (code reuse)
+    updates = {sid: None for sid in previous if sid not in current_ids}
+    for scenario in scenarios:
+        match = passed.get(scenario['fingerprint'])
+        if match:
+            updates[scenario['id']] = {**match, "title": scenario['title'], "reused": True}
+        elif scenario['id'] in previous and previous[scenario['id']]['result'] != "Passed":
+            # Failed (or killed) runs are always retried, even when the plan text is unchanged
+            updates[scenario['id']] = None
+    logger.info(f"Incremental verification: reusing {sum(1 for r in updates.values() if r)} of {len(scenarios)} scenario(s)")
+    return {"scenarios": scenarios, "scenario_results": updates}
+
+# Workflow thread id -> [semaphore, branches holding or waiting for it]
+_scenario_semaphores = {}
+
+@asynccontextmanager
+async def _scenario_slot():
+    """Caps how many scenarios of one run (workflow thread) are implemented and verified at once."""
+    try:
+        key = get_config()["configurable"].get("thread_id")
+    except RuntimeError:  # called outside a graph run
+        key = None
+    entry = _scenario_semaphores.setdefault(key, [asyncio.Semaphore(max(1, Config.SCENARIO_PARALLELISM)), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            _scenario_semaphores.pop(key, None)
+
+async def _generate_code(state: dict, scenario_text: str):
+    """Generates the Playwright script for one scenario. Returns (code, chunk_ids)."""
+    llm = get_llm(node="implement")
     feedback = state.get('error_feedback', "")
     user_feedback = state.get('user_feedback', "")
     
     full_feedback = f"System Errors: {feedback}\nHuman Review Feedback: {user_feedback}"
+    dom, chunk_ids = _select_dom_context(resolve(state['clean_dom']), f"{scenario_text}\n{full_feedback}",
+                                          state.get('extractor') or "dom")
     
-    prompt = f"""
+    template = """
     You are a Senior SDET. Write a Python script using Playwright to test this page.
     
-    URL: {state['url']}
-    Test Plan: {plan}
+    URL: {url}
+    Test Scenario: {scenario}
     DOM Context: {dom}
-    Feedback/Refinements: {full_feedback}
+    Feedback/Refinements: {feedback}
     
     STRICT CONSTRAINTS:
     1. Output ONLY the Python code. No markdown.
@@ -112,30 +306,79 @@ async def node_implement(state: AgentState):
     5. Wrap logic in `async def main():` and call `asyncio.run(main())`.
     6. Print "TEST PASSED" or "TEST FAILED".
     """
+    await warm_token_counter()
+    prompt = fit_prompt("implement", template, {
+        "url": state['url'], "scenario": scenario_text, "dom": dom, "feedback": full_feedback,
+    }).text
     
-    response = llm.invoke([HumanMessage(content=prompt)])
+    response = await llm.ainvoke([HumanMessage(content=prompt)])
     
     code = response.content.replace("```python", "").replace("```", "").strip()
     
-    state['metrics'].add_tokens(response.usage_metadata.get('total_tokens', 0))
-    state['metrics'].log_step("Implementation")
+    _record_llm_usage(state, response, "implement")
+    return code, chunk_ids
+
+@observe(name="scenario")
+async def node_scenario(state: dict):
+    """Phase 3+4 for one scenario (runs in a parallel branch): generate the script, then run it."""
+    scenario = state['scenario']
+    previous = state.get('previous') or {}
+    async with _scenario_slot():
+        started = time.perf_counter()
+        code, chunk_ids = await _generate_code(state, scenario['text'])
+        code_hash = code_fingerprint(code)
+        reused = previous.get('code_fingerprint') == code_hash and previous.get('result') == "Passed"
+        if reused:
+            # Plan wording changed but the script did not: the previous pass still holds
+            logs, result = previous['logs'], previous['result']
+        else:
+            output = LogBuffer()
+            outcome = RunOutcome()
+            limits = ExecutionLimits.from_config(state.get('execution_limits'))
+            async for stream, line in browser.stream_generated_test(code, limits, outcome):
+                output.add(stream, line)
+                # Live progress for the UI (astream_events "on_custom_event")
+                await adispatch_custom_event(
+                    "test_output", {"scenario": scenario['id'], "stream": stream, "line": line}
+                )
+            logs = output.text()
+            # Runs killed by a limit or crash report how they ended instead of a plain failure
+            result = OUTCOME_RESULTS.get(outcome.status) or ("Passed" if "TEST PASSED" in logs else "Failed")
+        duration = time.perf_counter() - started
+    
+    state['metrics'].record_timing("scenario", duration)
+    state['metrics'].log_step(f"Scenario {scenario['id']}")
     
-    return {"generated_code": code}
+    return {"scenario_results": {scenario['id']: {
+        "title": scenario['title'],
+        "code": maybe_put(code),
+        "logs": maybe_put(logs),
+        "result": result,
+        "duration": round(duration, 2),
+        "retrieved_chunks": chunk_ids,
+        "plan_fingerprint": scenario['fingerprint'],
+        "code_fingerprint": code_hash,
+        "reused": reused,
+    }}}
 
 @observe(name="verify")
 async def node_verify(state: AgentState):
-    """Phase 4: Verification."""
-    code = state['generated_code']
-    logs = await browser.execute_generated_test(code)
+    """Phase 4: Verification. Joins the scenario branches into one report."""
+    results = state.get('scenario_results') or {}
+    ordered = [(s['id'], results[s['id']]) for s in state.get('scenarios', []) if s['id'] in results]
     
-    result = "Failed"
-    if "TEST PASSED" in logs:
-        result = "Passed"
+    code = "\n\n".join(f"# --- {sid}: {r['title']} ---\n{resolve(r['code'])}" for sid, r in ordered)
+    logs = "\n\n".join(f"=== {sid}: {r['title']} ({r['result']}) ===\n{resolve(r['logs'])}" for sid, r in ordered)
+    # Passed only if every scenario passed; otherwise the most severe scenario result
+    result = max((r['result'] for _, r in ordered), key=RESULT_SEVERITY.get, default="Failed")
+    chunk_ids = sorted({c for _, r in ordered for c in r['retrieved_chunks']}, key=lambda c: int(c[1:]))
     
     state['metrics'].log_step("Verification")
     
     return {
-        "execution_logs": logs,
+        "generated_code": maybe_put(code),
+        "retrieved_chunks": chunk_ids,
+        "execution_logs": maybe_put(logs),
         "test_results": result,
         "attempt_count": state['attempt_count'] + 1
     }
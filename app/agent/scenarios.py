@@ -0,0 +1,61 @@
+import re
+from typing import Dict, List
+
+from app.core.cache import make_key
+
+# "Scenario 2: ...", "**Test Case 2 -** ...", "### Scenario 2" ...
+_SCENARIO_HEADING = re.compile(
+    r'^[ \t]*(?:#+[ \t]*|[*_\-][ \t]*)*(?:\*\*|__)?[ \t]*(?:scenario|test[ \t]*case|test)[ \t]*#?(\d+)\b',
+    re.IGNORECASE | re.MULTILINE
+)
+# Top-level "1. ..." / "**2)** ..." items (indented numbers are steps, not scenarios)
+_NUMBERED_ITEM = re.compile(r'^(?:#+[ \t]*)?(?:\*\*|__)?(\d+)[.)][ \t]+', re.MULTILINE)
+_MARKDOWN = re.compile(r'[*_#`]+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _title(block: str) -> str:
+    first_line = block.strip().splitlines()[0]
+    title = _MARKDOWN.sub('', first_line).strip(" :-")
+    return title[:120]
+
+
+def split_scenarios(plan: str) -> List[Dict[str, str]]:
+    """
+    Splits a test plan into scenarios: [{"id": "s1", "title": ..., "text": ...}, ...].
+    Prefers explicit "Scenario N" headings, falls back to top-level numbered items,
+    and returns the whole plan as a single scenario when neither is found.
+    """
+    plan = (plan or "").strip()
+    for pattern in (_SCENARIO_HEADING, _NUMBERED_ITEM):
+        starts = [m.start() for m in pattern.finditer(plan)]
+        if len(starts) >= 2:
+            break
+    else:
+        starts = []
+
+    if not starts:
+        return [{"id": "s1", "title": _title(plan) if plan else "Test Plan", "text": plan}] if plan else []
+
+    blocks = [plan[start:end].strip() for start, end in zip(starts, starts[1:] + [len(plan)])]
+    return [
+        {"id": f"s{index}", "title": _title(block), "text": block}
+        for index, block in enumerate(blocks, start=1)
+    ]
+
+
+def plan_fingerprint(scenario_text: str, *context: str) -> str:
+    """
+    Fingerprint of a scenario's plan text plus the inputs its code depends on (URL, DOM).
+    Markdown and the scenario number are ignored, so renumbering or reformatting the
+    plan does not count as a change.
+    """
+    heading = _SCENARIO_HEADING.match(scenario_text) or _NUMBERED_ITEM.match(scenario_text)
+    if heading:
+        scenario_text = scenario_text[:heading.start(1)] + scenario_text[heading.end(1):]
+    text = _WHITESPACE.sub(' ', _MARKDOWN.sub('', scenario_text)).strip().lower()
+    return make_key("scenario-plan", text, *context)
+
+
+def code_fingerprint(code: str) -> str:
+    return make_key("scenario-code", code.strip())
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import tempfile
+import time
+from typing import Optional
+
+from loguru import logger
+from config import Config
+from app.core.cache import MemoryLRUCache
+
+BLOB_PREFIX = "blob:sha256:"
+
+
+def is_ref(value) -> bool:
+    return isinstance(value, str) and value.startswith(BLOB_PREFIX)
+
+
+class BlobStore:
+    """
+    Content-addressed store for large state fields (raw HTML, cleaned DOM, code, logs)
+    and binary artifacts such as screenshots.
+
+    Blobs live on the local filesystem as `<root>/<2 hex>/<62 hex>` named by their
+    SHA-256, so identical content is stored once; an in-memory LRU serves hot reads.
+    `maybe_put` swaps values of at least `min_bytes` for a short "blob:sha256:..."
+    reference, and `resolve` turns references back into the original string.
+    """
+
+    def __init__(self, root: str, min_bytes: int = 4096, memory_max_bytes: Optional[int] = None):
+        self.root = root
+        self.min_bytes = min_bytes
+        self._memory = MemoryLRUCache("blobs", max_bytes=memory_max_bytes)
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def put(self, value: str) -> str:
+        digest = self._write(value.encode("utf-8", errors="surrogatepass"))
+        self._memory.set(digest, value)
+        return BLOB_PREFIX + digest
+
+    def put_bytes(self, data: bytes) -> str:
+        """Stores binary content (e.g. screenshots); read it back with `get_bytes`."""
+        digest = self._write(data)
+        self._memory.set("b:" + digest, data)
+        return BLOB_PREFIX + digest
+
+    def _write(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path):
+            os.utime(path)  # identical content: stored once, age refreshed for prune()
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so concurrent writers never expose a partial blob
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        return digest
+
+    def get(self, ref: str) -> str:
+        digest = ref[len(BLOB_PREFIX):]
+        value = self._memory.get(digest)
+        if value is None:
+            value = self._read(digest).decode("utf-8", errors="surrogatepass")
+            self._memory.set(digest, value)
+        return value
+
+    def get_bytes(self, ref: str) -> bytes:
+        digest = ref[len(BLOB_PREFIX):]
+        data = self._memory.get("b:" + digest)
+        if data is None:
+            data = self._read(digest)
+            self._memory.set("b:" + digest, data)
+        return data
+
+    def _read(self, digest: str) -> bytes:
+        path = self._path(digest)
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)  # still referenced; keep it past prune()
+        return data
+
+    def maybe_put(self, value):
+        """Returns a reference for large strings and the value itself otherwise."""
+        if isinstance(value, str) and not is_ref(value) and len(value) >= self.min_bytes:
+            return self.put(value)
+        return value
+
+    def resolve(self, value):
+        """Returns the content behind a reference; other values pass through unchanged."""
+        return self.get(value) if is_ref(value) else value
+
+    def prune(self, max_age: float) -> int:
+        """Deletes blobs that were not written or read for `max_age` seconds."""
+        cutoff = time.time() - max_age
+        removed = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+        if removed:
+            logger.info(f"Blob store: pruned {removed} blob(s) older than {max_age}s")
+        return removed
+
+    def stats(self):
+        return self._memory.stats()
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """Returns the process-wide blob store (old blobs are pruned when it is created)."""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore(Config.BLOB_DIR, Config.BLOB_MIN_BYTES, Config.BLOB_MEMORY_MAX_BYTES)
+        _blob_store.prune(Config.BLOB_MAX_AGE)
+    return _blob_store
+
+
+def maybe_put(value):
+    """Stores large strings out of line when Config.BLOB_STORE_ENABLED; see BlobStore.maybe_put."""
+    return get_blob_store().maybe_put(value) if Config.BLOB_STORE_ENABLED else value
+
+
+def resolve(value):
+    """Resolves a blob reference (always, so refs from earlier runs keep working)."""
+    return get_blob_store().resolve(value) if is_ref(value) else value
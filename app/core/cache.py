@@ -0,0 +1,338 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+from loguru import logger
+from config import Config
+
+
+def make_key(*parts: str) -> str:
+    """Content-addressed cache key (SHA-256 over the NUL-joined parts)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8", errors="replace"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SQLiteCache:
+    """
+    Persistent key/value cache on SQLite.
+    Entries expire after `ttl` seconds and the least recently used ones are evicted
+    once a namespace grows past `max_bytes`.
+    """
+
+    def __init__(self, path: str, namespace: str, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            if row and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def contains(self, key: str) -> bool:
+        """Whether `key` has a live entry; unlike get() it counts no hit and leaves recency alone."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+        return row is not None and (self.ttl is None or time.time() - row[0] <= self.ttl)
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        size = len(value.encode("utf-8", errors="replace"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, value, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        if self.ttl is not None:
+            self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND created_at < ?",
+                (self.namespace, now - self.ttl)
+            )
+        if self.max_bytes is None:
+            return
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM cache WHERE namespace = ? ORDER BY accessed_at ASC", (self.namespace,)
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+class MemoryLRUCache:
+    """
+    In-process key/value cache with the same interface as SQLiteCache.
+    Evicts least recently used entries past `max_bytes`; entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, namespace: str = "memory", ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, size, created_at)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self.ttl is not None and time.time() - entry[2] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is not None and (self.ttl is None or time.time() - entry[2] <= self.ttl)
+
+    def set(self, key: str, value):
+        size = len(value) if isinstance(value, bytes) else len(value.encode("utf-8", errors="replace"))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.time())
+            self._size += size
+            while self.max_bytes is not None and self._size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._size}
+
+
+class LLMResponseCache(BaseCache):
+    """
+    LangChain cache for chat completions, keyed on the whitespace-normalized prompt
+    and the model's parameter string (model name, temperature, ...).
+
+    Cached replies come back with zeroed token usage and `response_metadata["cache_hit"]`
+    set, so per-session token counts only include tokens actually spent.
+    """
+
+    _WHITESPACE = re.compile(r'(?:\\[ntr]|\s)+')
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.bytes_saved = 0
+
+    @classmethod
+    def normalize(cls, prompt: str) -> str:
+        # Prompts are JSON-serialized messages, so newlines appear as escaped "\n"
+        return cls._WHITESPACE.sub(' ', prompt).strip()
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return make_key("llm", self.normalize(prompt), llm_string)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        try:
+            value = self.backend.get(self._key(prompt, llm_string))
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            return None
+        if value is None:
+            return None
+        self.bytes_saved += len(value.encode("utf-8", errors="replace"))
+        usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        return [
+            ChatGeneration(
+                message=AIMessage(content=item["content"], usage_metadata=usage,
+                                  response_metadata={"cache_hit": True}),
+                generation_info=item.get("generation_info"),
+            )
+            for item in json.loads(value)
+        ]
+
+    def contains(self, prompt: str, llm_string: str) -> bool:
+        """Whether lookup() would hit, without counting it."""
+        try:
+            return self.backend.contains(self._key(prompt, llm_string))
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            return False
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]):
+        items = []
+        for generation in return_val:
+            message = getattr(generation, "message", None)
+            items.append({
+                "content": message.content if message is not None else generation.text,
+                "generation_info": generation.generation_info,
+            })
+        try:
+            self.backend.set(self._key(prompt, llm_string), json.dumps(items))
+        except (sqlite3.Error, TypeError) as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def clear(self, **kwargs):
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.backend.stats(), "bytes_saved": self.bytes_saved}
+
+
+class ExplorationCache:
+    """
+    Caches `node_explore` results keyed by the cleaned DOM, model name and prompt version,
+    so byte-identical pages skip the exploration LLM call.
+    """
+
+    def __init__(self, backend: SQLiteCache):
+        self.backend = backend
+
+    @staticmethod
+    def key(clean_dom: str, model_name: str, prompt_version: str) -> str:
+        return make_key("exploration", clean_dom, model_name, prompt_version)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = self.backend.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Exploration cache read failed: {e}")
+            return None
+        return json.loads(value) if value else None
+
+    def set(self, key: str, result: Dict[str, Any]):
+        try:
+            self.backend.set(key, json.dumps(result))
+        except sqlite3.Error as e:
+            logger.warning(f"Exploration cache write failed: {e}")
+
+
+_exploration_cache: Optional[ExplorationCache] = None
+
+
+def get_exploration_cache() -> Optional[ExplorationCache]:
+    """Returns the process-wide exploration cache, or None when disabled."""
+    global _exploration_cache
+    if not Config.EXPLORE_CACHE_ENABLED:
+        return None
+    if _exploration_cache is None:
+        _exploration_cache = ExplorationCache(SQLiteCache(
+            os.path.join(Config.CACHE_DIR, "cache.sqlite3"),
+            namespace="exploration",
+            ttl=Config.EXPLORE_CACHE_TTL,
+            max_bytes=Config.EXPLORE_CACHE_MAX_BYTES
+        ))
+    return _exploration_cache
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Returns the process-wide LLM response cache, or None when LLM_CACHE_BACKEND is "none"."""
+    global _llm_cache
+    backend_name = Config.LLM_CACHE_BACKEND
+    if backend_name == "none":
+        return None
+    if _llm_cache is None:
+        if backend_name == "sqlite":
+            backend = SQLiteCache(
+                os.path.join(Config.CACHE_DIR, "cache.sqlite3"), namespace="llm",
+                ttl=Config.LLM_CACHE_TTL, max_bytes=Config.LLM_CACHE_MAX_BYTES
+            )
+        elif backend_name == "memory":
+            backend = MemoryLRUCache("llm", ttl=Config.LLM_CACHE_TTL, max_bytes=Config.LLM_CACHE_MAX_BYTES)
+        else:
+            raise ValueError(f"Unknown LLM cache backend: {backend_name}")
+        _llm_cache = LLMResponseCache(backend)
+    return _llm_cache
+
+
+def llm_cache_stats() -> Dict[str, Any]:
+    """Process-wide LLM cache statistics (empty when the cache is disabled or unused)."""
+    return _llm_cache.stats() if _llm_cache else {}
@@ -0,0 +1,214 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from loguru import logger
+from config import Config
+
+# Non-builtin types stored in AgentState that checkpoints may deserialize
+_STATE_TYPES = [("app.core.metrics", "MetricsTracker")]
+
+
+def state_serializer() -> JsonPlusSerializer:
+    return JsonPlusSerializer(allowed_msgpack_modules=_STATE_TYPES)
+
+
+class DurableSqliteSaver(SqliteSaver):
+    """
+    SQLite checkpointer usable from async graphs, with retention.
+
+    The async methods run the synchronous SqliteSaver in a worker thread (the saver
+    serializes access with its own lock), so the saver is not bound to one event loop.
+    `compact()` enforces the retention policy:
+      * threads idle for more than `max_age` seconds are deleted,
+      * only the `max_threads` most recently active threads are kept,
+      * each thread keeps only its newest `keep_last` checkpoints (and their writes).
+    `start_compaction()` runs it periodically on a daemon thread.
+    """
+
+    def __init__(self, path: str, max_threads: Optional[int] = None, max_age: Optional[float] = None,
+                 keep_last: Optional[int] = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        # Lets compaction hand freed pages back to the OS (only effective on new files)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        super().__init__(conn, serde=state_serializer())
+        self.path = path
+        self.max_threads = max_threads
+        self.max_age = max_age
+        self.keep_last = keep_last
+        self._stop = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS thread_activity (
+                thread_id TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self.conn.commit()
+
+    # --- Writes also record thread activity for the retention policy ---
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        result = super().put(config, checkpoint, metadata, new_versions)
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)",
+                (str(config["configurable"]["thread_id"]), time.time())
+            )
+        return result
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    # --- Async API (the base SqliteSaver only implements the sync one) ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aget_delta_channel_history(self, *, config: RunnableConfig, channels: Sequence[str]):
+        return await asyncio.to_thread(
+            lambda: self.get_delta_channel_history(config=config, channels=channels)
+        )
+
+    # --- Retention ---
+
+    def compact(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Applies the retention policy once. Returns counts of deleted threads and checkpoints."""
+        now = time.time() if now is None else now
+        stale = set()
+        with self.cursor() as cur:
+            if self.max_age is not None:
+                stale.update(row[0] for row in cur.execute(
+                    "SELECT thread_id FROM thread_activity WHERE updated_at < ?", (now - self.max_age,)
+                ))
+            if self.max_threads is not None:
+                stale.update(row[0] for row in cur.execute(
+                    "SELECT thread_id FROM thread_activity ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                    (self.max_threads,)
+                ))
+            for thread_id in stale:
+                cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                cur.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+                cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (thread_id,))
+
+            pruned = 0
+            if self.keep_last is not None:
+                # checkpoint_id is a time-ordered UUIDv6, so it sorts newest-last
+                cur.execute(
+                    """CREATE TEMP TABLE IF NOT EXISTS pruned_checkpoints AS
+                       SELECT thread_id, checkpoint_ns, checkpoint_id FROM checkpoints WHERE 0"""
+                )
+                cur.execute("DELETE FROM pruned_checkpoints")
+                cur.execute(
+                    """INSERT INTO pruned_checkpoints
+                       SELECT thread_id, checkpoint_ns, checkpoint_id FROM (
+                           SELECT thread_id, checkpoint_ns, checkpoint_id,
+                                  ROW_NUMBER() OVER (PARTITION BY thread_id, checkpoint_ns
+                                                     ORDER BY checkpoint_id DESC) AS age
+                           FROM checkpoints
+                       ) WHERE age > ?""",
+                    (max(1, self.keep_last),)
+                )
+                for table in ("writes", "checkpoints"):
+                    cur.execute(
+                        f"""DELETE FROM {table} WHERE (thread_id, checkpoint_ns, checkpoint_id) IN
+                            (SELECT thread_id, checkpoint_ns, checkpoint_id FROM pruned_checkpoints)"""
+                    )
+                    if table == "checkpoints":
+                        pruned = cur.rowcount
+        with self.cursor() as cur:
+            cur.execute("PRAGMA incremental_vacuum")
+            cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if stale or pruned:
+            logger.info(f"Checkpoint compaction: removed {len(stale)} thread(s), {pruned} old checkpoint(s)")
+        return {"threads": len(stale), "checkpoints": pruned}
+
+    def start_compaction(self, interval: float):
+        """Runs `compact()` every `interval` seconds on a daemon thread (idempotent)."""
+        if self._compactor is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.compact()
+                except sqlite3.Error as e:
+                    logger.warning(f"Checkpoint compaction failed: {e}")
+
+        self._compactor = threading.Thread(target=loop, name="checkpoint-compaction", daemon=True)
+        self._compactor.start()
+
+    def stats(self) -> Dict[str, int]:
+        with self.cursor(transaction=False) as cur:
+            threads = cur.execute("SELECT COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()[0]
+            checkpoints = cur.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+            writes = cur.execute("SELECT COUNT(*) FROM writes").fetchone()[0]
+        return {"threads": threads, "checkpoints": checkpoints, "writes": writes}
+
+    def close(self):
+        self._stop.set()
+        self.conn.close()
+
+
+_checkpointer: Optional[BaseCheckpointSaver] = None
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """
+    Returns the process-wide checkpointer for Config.CHECKPOINT_BACKEND:
+    "sqlite" (durable, bounded by the CHECKPOINT_* retention settings) or "memory".
+    """
+    global _checkpointer
+    if _checkpointer is None:
+        backend = Config.CHECKPOINT_BACKEND
+        if backend == "sqlite":
+            saver = DurableSqliteSaver(
+                Config.CHECKPOINT_PATH,
+                max_threads=Config.CHECKPOINT_MAX_THREADS,
+                max_age=Config.CHECKPOINT_MAX_AGE,
+                keep_last=Config.CHECKPOINT_KEEP_LAST
+            )
+            saver.compact()
+            saver.start_compaction(Config.CHECKPOINT_COMPACT_INTERVAL)
+            _checkpointer = saver
+        elif backend == "memory":
+            _checkpointer = MemorySaver(serde=state_serializer())
+        else:
+            raise ValueError(f"Unknown checkpoint backend: {backend}")
+    return _checkpointer
@@ -0,0 +1,116 @@
+"""
+Deterministic stand-in for the Gemini chat model (Config.LLM_PROVIDER = "fake").
+
+Used by the offline benchmarks and tests: no API key or network, and the same prompt
+always gets the same reply. It recognises the three prompts the graph sends:
+exploration gets a short page summary built from the DOM it was given, design gets a
+three-scenario plan, and implementation gets a runnable Playwright script that opens
+the page, checks it rendered and prints "TEST PASSED". Token usage is estimated at
+4 characters per token so prompt-size metrics still mean something.
+"""
+import asyncio
+import re
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+_URL = re.compile(r"^\s*URL: (?P<url>\S+)", re.MULTILINE)
+_SCENARIO = re.compile(r"^\s*Test Scenario: (?P<title>.*)$", re.MULTILINE)
+_HEADING = re.compile(r"<h[1-3][^>]*>(?P<text>[^<]{1,80})<", re.IGNORECASE)
+_CONTROL = re.compile(r"<(?P<tag>button|a|input|select|textarea)\b", re.IGNORECASE)
+
+PLAN = """Test Plan:
+Scenario 1: Verify page loads
+1. Open the page and check that the title is not empty.
+Scenario 2: Check main navigation
+1. Check that the page has at least one link.
+Scenario 3: Check interactive elements
+1. Check that the body is visible and contains text."""
+
+SCRIPT = """import asyncio
+from playwright.async_api import async_playwright
+
+
+async def main():
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        try:
+            await page.goto({url!r}, wait_until="domcontentloaded")
+            # {scenario}
+            await page.locator("body").wait_for(state="visible", timeout=10000)
+            if {check}:
+                print("TEST PASSED")
+            else:
+                print("TEST FAILED")
+        finally:
+            await browser.close()
+
+
+asyncio.run(main())
+"""
+
+CHECKS = {
+    "Scenario 1": "await page.title() != ''",
+    "Scenario 2": "await page.locator('a').count() > 0",
+}
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model returning canned, prompt-dependent replies after `latency` seconds."""
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-qa-agent"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": "fake", "latency": self.latency}
+
+    def reply(self, prompt: str) -> str:
+        """The canned reply for `prompt`."""
+        if "Test Scenario:" in prompt:
+            url = _URL.search(prompt)
+            scenario = _SCENARIO.search(prompt)
+            title = scenario.group("title").strip() if scenario else ""
+            check = next((c for key, c in CHECKS.items() if title.startswith(key)),
+                         "len(await page.inner_text('body')) > 0")
+            return SCRIPT.format(url=url.group("url") if url else "about:blank", scenario=title, check=check)
+        if "propose a Test Plan" in prompt:
+            return PLAN
+        headings = [m.group("text").strip() for m in _HEADING.finditer(prompt)][:5]
+        controls = {}
+        for match in _CONTROL.finditer(prompt):
+            tag = match.group("tag").lower()
+            controls[tag] = controls.get(tag, 0) + 1
+        return ("Page purpose: " + (", ".join(headings) or "unknown") + "\n"
+                "Interactive elements: " + (", ".join(f"{n} x <{t}>" for t, n in sorted(controls.items())) or "none"))
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+        content = self.reply(prompt)
+        usage = {"input_tokens": _estimate_tokens(prompt), "output_tokens": _estimate_tokens(content)}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        message = AIMessage(content=content, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages)
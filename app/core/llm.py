@@ -1,24 +1,374 @@
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, List, Optional
+from langchain_core.load import dumps
 from langchain_google_genai import ChatGoogleGenerativeAI
+from loguru import logger
 from config import Config
+from app.core.metrics import REGISTRY
+from app.core.tokens import count_tokens, warm_token_counter
+from app.core.cache import LLMResponseCache, get_llm_cache
 from app.core.tracing import get_langfuse_callback
+from app.core.profiling import ProfilingCallbackHandler
+from app.core.fake_llm import FakeChatModel
+from app.core.mock_llm import MockChatModel
 
-def get_llm():
+def get_llm(node: str = None, cache: bool = True):
     """
     Returns the configured Gemini Free Tier model with optional Tracing.
+
+    The client is built once per model name and shared by all nodes and sessions,
+    so its HTTP connections are reused. Call it with `await llm.ainvoke(...)`
+    inside async nodes to avoid blocking the event loop.
+
+    Responses are served from the prompt-level LLM cache unless `cache=False`
+    or `node` is listed in Config.LLM_CACHE_DISABLED_NODES.
+
+    With Config.LLM_PROVIDER = "fake" a deterministic offline model is returned
+    instead (see app.core.fake_llm), and with "mock" a client for the local mock
+    server at Config.MOCK_LLM_URL (see app.core.mock_llm); neither needs an API key.
+
+    Gemini and mock calls go through the process-wide LLMScheduler (RPM/TPM token
+    buckets, priority queue, retries on throttling) unless LLM_SCHEDULER_ENABLED is off.
     """
-    if not Config.GOOGLE_API_KEY:
+    use_cache = cache and node not in Config.LLM_CACHE_DISABLED_NODES
+    if Config.LLM_PROVIDER == "fake":
+        return _build_fake_llm(Config.FAKE_LLM_LATENCY, use_cache)
+    if Config.LLM_PROVIDER == "mock":
+        llm = _build_mock_llm(Config.MOCK_LLM_URL, use_cache)
+    elif Config.LLM_PROVIDER != "gemini":
+        raise ValueError(f"Unknown LLM provider: {Config.LLM_PROVIDER}")
+    elif not Config.GOOGLE_API_KEY:
         raise ValueError("Google API Key is missing. Check .env file.")
-    
-    # Setup callbacks (Langfuse)
+    else:
+        llm = _build_llm(Config.MODEL_NAME, use_cache)
+    return _scheduled(llm) if Config.LLM_SCHEDULER_ENABLED else llm
+
+def model_id() -> str:
+    """Identifies the configured model in cache keys, so fake replies never mix with real ones."""
+    return Config.MODEL_NAME if Config.LLM_PROVIDER == "gemini" else Config.LLM_PROVIDER
+
+def _callbacks() -> list:
     callbacks = []
     lf_handler = get_langfuse_callback()
     if lf_handler:
         callbacks.append(lf_handler)
+    # Records "llm" spans when a profiling trace is active (no-op otherwise)
+    callbacks.append(ProfilingCallbackHandler())
+    return callbacks
+
+@lru_cache(maxsize=None)
+def _build_fake_llm(latency: float, use_cache: bool):
+    llm_cache = get_llm_cache() if use_cache else None
+    return FakeChatModel(latency=latency, callbacks=_callbacks(),
+                         cache=llm_cache if llm_cache is not None else False)
+
+@lru_cache(maxsize=None)
+def _build_mock_llm(base_url: str, use_cache: bool):
+    llm_cache = get_llm_cache() if use_cache else None
+    return MockChatModel(base_url=base_url, callbacks=_callbacks(),
+                         cache=llm_cache if llm_cache is not None else False)
+
+@lru_cache(maxsize=None)
+def _build_llm(model_name: str, use_cache: bool):
+    # Setup callbacks (Langfuse, profiling)
+    callbacks = _callbacks()
+
+    llm_cache = get_llm_cache() if use_cache else None
         
     return ChatGoogleGenerativeAI(
-        model=Config.MODEL_NAME,
+        model=model_name,
         google_api_key=Config.GOOGLE_API_KEY,
         temperature=0.1, # Low temperature for more deterministic code generation
         convert_system_message_to_human=True,
-        callbacks=callbacks
-    )
\ No newline at end of file
+        callbacks=callbacks,
+        cache=llm_cache if llm_cache is not None else False,
+        # Throttling is retried by the scheduler, which also slows every other caller down
+        max_retries=0 if Config.LLM_SCHEDULER_ENABLED else 6
+    )
+
+
+# --- Rate limiting and scheduling ---
+
+# Lower value = served first; Chainlit sessions and the CLI are interactive
+PRIORITIES = {"interactive": 0, "batch": 1}
+_priority: ContextVar[str] = ContextVar("qa_agent_llm_priority", default="interactive")
+
+_RETRY_AFTER = re.compile(r"retry(?:[_ ]?delay\W+| in )(?P<seconds>\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+_THROTTLED = re.compile(r"\b429\b|RESOURCE_EXHAUSTED|rate limit", re.IGNORECASE)
+_TRANSIENT = re.compile(r"\b(?:500|502|503|504) (?:INTERNAL|UNAVAILABLE|Internal Server Error|Service Unavailable|"
+                        r"Bad Gateway|Gateway Timeout)\b|\bUNAVAILABLE\b")
+
+
+@contextmanager
+def llm_priority(name: str):
+    """LLM calls made inside the block (and tasks it starts) are queued with this priority."""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {name}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Budget of `limit` units per minute. Holds at most `burst` units and refills at
+    (limit - burst) per minute, so no 60-second window admits more than `limit`.
+    The level may go negative (a debt) when a call turns out bigger than estimated.
+    `limit` <= 0 disables the bucket.
+    """
+
+    def __init__(self, limit: float, burst_fraction: float, clock: Callable[[], float] = time.monotonic):
+        self.limit = limit
+        self.capacity = max(1.0, limit * burst_fraction) if limit > 0 else 0.0
+        self.rate = max(limit - self.capacity, limit * 0.5) / 60 if limit > 0 else 0.0
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, cost: float) -> float:
+        """Seconds until `cost` units can be taken (requests larger than the burst need a full bucket)."""
+        if self.limit <= 0:
+            return 0.0
+        self._refill()
+        missing = min(cost, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, cost: float):
+        if self.limit > 0:
+            self._refill()
+            self.level -= cost
+
+    def adjust(self, delta: float):
+        """Gives back (positive) or charges (negative) units after the fact."""
+        if self.limit > 0:
+            self._refill()
+            self.level = min(self.capacity, self.level + delta)
+
+    def pause(self, seconds: float):
+        """Admits nothing for `seconds` (used when the provider throttles anyway)."""
+        if self.limit > 0:
+            self._refill()
+            self.level = min(self.level, 0.0) - seconds * self.rate
+
+
+def _throttle_info(error: Exception):
+    """(kind, retry_after) for retryable errors: kind is "throttled" or "transient"; None otherwise."""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(error, "status_code", None) or getattr(error, "code", None)
+    text = str(error)
+    retry_after = None
+    headers = getattr(response, "headers", None)
+    if headers is not None and headers.get("Retry-After"):
+        try:
+            retry_after = float(headers["Retry-After"])
+        except ValueError:
+            pass
+    match = _RETRY_AFTER.search(text)
+    if retry_after is None and match:
+        retry_after = float(match.group("seconds"))
+    if status == 429 or _THROTTLED.search(text):
+        return "throttled", retry_after
+    if status in (500, 502, 503, 504) or _TRANSIENT.search(text):
+        return "transient", retry_after
+    return None
+
+
+class LLMScheduler:
+    """
+    Process-wide gate in front of the model. Each call estimates its tokens, waits in
+    a priority queue (interactive before batch, FIFO within a priority) until both
+    the requests-per-minute and tokens-per-minute buckets can pay for it, then runs.
+    Actual usage is reconciled afterwards and cache hits are refunded. Throttled
+    (429) calls pause the request bucket for the backoff so every caller slows
+    down, and are retried with jittered exponential backoff like transient 5xx errors.
+    """
+
+    def __init__(self, rpm: float, tpm: float, burst_fraction: float = 0.1, max_retries: int = 5,
+                 backoff_base: float = 2.0, backoff_max: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.requests = TokenBucket(rpm, burst_fraction, clock)
+        self.tokens = TokenBucket(tpm, burst_fraction, clock)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._clock = clock
+        self._queue: List[list] = []  # heap of [priority, seq, cost]
+        self._seq = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self._loop = None
+
+    @classmethod
+    def from_config(cls) -> "LLMScheduler":
+        return cls(Config.LLM_RPM, Config.LLM_TPM, Config.LLM_BURST_FRACTION, Config.LLM_MAX_RETRIES,
+                   Config.LLM_BACKOFF_BASE, Config.LLM_BACKOFF_MAX)
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Waiters of a previous (finished) event loop cannot be woken any more
+            self._loop, self._changed, self._queue = loop, asyncio.Event(), []
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _report_depth(self):
+        for name, value in PRIORITIES.items():
+            REGISTRY.set_gauge("qa_agent_llm_queue_depth", sum(1 for e in self._queue if e[0] == value), priority=name)
+
+    async def acquire(self, cost: float, priority: str = "interactive"):
+        """Waits for this call's turn and budget, then charges one request and `cost` tokens."""
+        self._bind()
+        entry = [PRIORITIES[priority], next(self._seq), cost]
+        heapq.heappush(self._queue, entry)
+        self._report_depth()
+        started = self._clock()
+        try:
+            while True:
+                timeout = None
+                if self._queue[0] is entry:
+                    timeout = max(self.requests.wait_time(1), self.tokens.wait_time(cost))
+                    if timeout <= 0:
+                        heapq.heappop(self._queue)
+                        break
+                changed = self._changed
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+            self._notify()
+            self._report_depth()
+            raise
+        self.requests.take(1)
+        self.tokens.take(cost)
+        self._notify()  # the next waiter becomes head
+        self._report_depth()
+        REGISTRY.observe("qa_agent_llm_queue_wait_seconds", self._clock() - started, priority=priority)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        # "Equal jitter": at least half the backoff, so retries spread out but still wait
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        return max(delay, retry_after or 0.0)
+
+    async def call(self, invoke: Callable[[], Awaitable[Any]], estimated_tokens: float, priority: str = None):
+        """Runs `invoke()` (a model call) under the budgets, retrying throttled/transient failures."""
+        priority = priority or _priority.get()
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(estimated_tokens, priority)
+            try:
+                response = await invoke()
+            except Exception as e:
+                info = _throttle_info(e)
+                if info is None or attempt == self.max_retries:
+                    raise
+                kind, retry_after = info
+                delay = self._backoff(attempt, retry_after)
+                REGISTRY.inc("qa_agent_llm_retries_total", reason=kind)
+                logger.warning(f"LLM call {kind} ({e.__class__.__name__}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                self.tokens.adjust(estimated_tokens)  # nothing was generated
+                if kind == "throttled":
+                    REGISTRY.inc("qa_agent_llm_throttled_total", priority=priority)
+                if kind == "throttled" and self.requests.limit > 0:
+                    # Holds back every queued call, this retry included (acquire waits out the pause)
+                    self.requests.pause(delay)
+                    self._notify()
+                else:
+                    # Transient error, or no request budget to pause (LLM_RPM = 0)
+                    await asyncio.sleep(delay)
+                continue
+            self._reconcile(response, estimated_tokens)
+            return response
+
+    def _reconcile(self, response, estimated_tokens: float):
+        metadata = getattr(response, "response_metadata", None) or {}
+        if metadata.get("cache_hit"):
+            # Served locally: nothing was spent
+            self.requests.adjust(1)
+            self.tokens.adjust(estimated_tokens)
+        else:
+            usage = getattr(response, "usage_metadata", None) or {}
+            actual = usage.get("total_tokens") or estimated_tokens
+            self.tokens.adjust(estimated_tokens - actual)
+        self._notify()
+
+
+def estimate_tokens(messages) -> int:
+    """Prompt size (memoized, so free for prompts built by fit_prompt) plus Config.LLM_OUTPUT_TOKENS_ESTIMATE."""
+    if isinstance(messages, str):
+        text = messages
+    else:
+        text = "".join(str(getattr(m, "content", m)) for m in messages)
+    return count_tokens(text) + Config.LLM_OUTPUT_TOKENS_ESTIMATE
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_scheduler() -> LLMScheduler:
+    """Returns the process-wide scheduler built from Config.LLM_* limits."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler.from_config()
+    return _scheduler
+
+
+class ScheduledLLM:
+    """
+    Routes `ainvoke` through the scheduler; every other attribute is the wrapped model's.
+    Prompts already in the response cache skip the queue, as they never reach the API.
+    """
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    def _cached(self, input, stop=None, **kwargs) -> bool:
+        cache = self.llm.cache
+        if not isinstance(cache, LLMResponseCache):
+            return False
+        # Same prompt and parameter strings LangChain looks the response up with
+        messages = [m.model_copy(update={"id": None}) if getattr(m, "id", None) is not None else m
+                    for m in self.llm._convert_input(input).to_messages()]
+        return cache.contains(dumps(messages), self.llm._get_llm_string(stop=stop, **kwargs))
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        if self._cached(input, **kwargs):
+            return await self.llm.ainvoke(input, config, **kwargs)
+        await warm_token_counter()
+        return await get_scheduler().call(lambda: self.llm.ainvoke(input, config, **kwargs), estimate_tokens(input))
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+_wrappers = {}
+
+
+def _scheduled(llm) -> ScheduledLLM:
+    # One wrapper per shared client, so get_llm() keeps returning the same object
+    wrapper = _wrappers.get(id(llm))
+    if wrapper is None or wrapper.llm is not llm:
+        wrapper = _wrappers[id(llm)] = ScheduledLLM(llm)
+    return wrapper
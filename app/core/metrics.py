@@ -1,40 +1,334 @@
+import bisect
+import json
+import math
+import threading
 import time
+from collections import deque
 from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, List, Dict, Any, Optional, Sequence, Tuple
+from loguru import logger
+from app.core.cache import llm_cache_stats
+from app.core.profiling import span
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of the values; 0.0 when empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+# --- Process-wide registry (aggregates every session) ---
+
+# Seconds; covers sub-second cache hits up to multi-minute test runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Prompt sizes in tokens
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+# Recent observations kept per series for p50/p95/p99
+RESERVOIR_SIZE = 2048
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    """Cumulative buckets for Prometheus plus a bounded reservoir for percentiles."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent: Deque[float] = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        values = list(self.recent)
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters, gauges and histograms shared by all sessions in the process.
+    Collectors registered with `register_collector` are called at export time to
+    report gauges that live elsewhere (e.g. browser pool usage).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._buckets: Dict[str, Sequence[float]] = {}
+        self._collectors: List[Callable[["MetricsRegistry"], None]] = []
+
+    def describe(self, name: str, help_text: str, buckets: Sequence[float] = None):
+        """Sets the help text and, for histograms not measured in seconds, the buckets."""
+        self._help[name] = help_text
+        if buckets:
+            self._buckets[name] = buckets
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _labels(labels)
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _labels(labels)
+            if key not in series:
+                series[key] = Histogram(self._buckets.get(name, DEFAULT_BUCKETS))
+            series[key].observe(value)
+
+    def register_collector(self, collector: Callable[["MetricsRegistry"], None]):
+        self._collectors.append(collector)
+
+    def _collect(self):
+        for collector in list(self._collectors):
+            try:
+                collector(self)
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly view: counters, gauges and histogram count/sum/p50/p95/p99."""
+        self._collect()
+        with self._lock:
+            def flat(series: Dict[Labels, Any], convert=lambda v: v):
+                return {_format_labels(k) or "": convert(v) for k, v in series.items()}
+            return {
+                "counters": {n: flat(s) for n, s in self._counters.items()},
+                "gauges": {n: flat(s) for n, s in self._gauges.items()},
+                "histograms": {n: flat(s, Histogram.summary) for n, s in self._histograms.items()},
+            }
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        self._collect()
+        lines: List[str] = []
+        with self._lock:
+            for kind, families in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted(families):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for labels, value in sorted(families[name].items()):
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name in sorted(self._histograms):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, (('le', repr(float(bound))),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("qa_agent_node_duration_seconds", "Wall time of each graph node.")
+REGISTRY.describe("qa_agent_llm_queue_depth", "LLM calls waiting for the rate limiter, by priority.")
+REGISTRY.describe("qa_agent_llm_queue_wait_seconds", "Time LLM calls spent queued for RPM/TPM budget, by priority.")
+REGISTRY.describe("qa_agent_llm_retries_total", "LLM calls retried after throttling or a transient error.")
+REGISTRY.describe("qa_agent_llm_throttled_total", "LLM calls the provider rejected with 429.")
+REGISTRY.describe("qa_agent_llm_tokens_total", "LLM tokens by node and type (prompt/completion).")
+REGISTRY.describe("qa_agent_prompt_tokens", "Prompt size of each LLM call after budgeting, by node.", TOKEN_BUCKETS)
+REGISTRY.describe("qa_agent_prompt_truncations_total", "Prompt sections cut to fit a node's token budget.")
+REGISTRY.describe("qa_agent_crawl_pages_total", "Pages fetched in crawl mode by status (explored/duplicate/error).")
+REGISTRY.describe("qa_agent_cache_requests_total", "Cache lookups by cache and result (hit/miss).")
+REGISTRY.describe("qa_agent_timing_seconds", "Named sub-step durations (readiness wait, scenario, ...).")
+REGISTRY.describe("qa_agent_test_run_seconds", "Generated test execution time by execution mode.")
+REGISTRY.describe("qa_agent_test_early_stops_total", "Test runs ended early by a verification stop rule.")
+REGISTRY.describe("qa_agent_test_aborts_total", "Test runs killed by a resource limit or crash, by outcome.")
+REGISTRY.describe("qa_agent_browser_pool_contexts", "Browser context pool usage by state.")
+REGISTRY.describe("qa_agent_browser_pool_events_total", "Browser contexts created, recycled and evicted by the pools.")
+
+
+def timed_node(name: str, func):
+    """
+    Wraps an async graph node so its wall time lands in qa_agent_node_duration_seconds
+    (and in a "node.<name>" profiling span when a trace is active).
+    """
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            with span(f"node.{name}", "node"):
+                result = await func(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            REGISTRY.observe("qa_agent_node_duration_seconds", time.perf_counter() - started,
+                             node=name, outcome=outcome)
+    return wrapper
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = REGISTRY.render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/metrics.json":
+            body = json.dumps(REGISTRY.snapshot()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are not worth a log line each
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serves /metrics (Prometheus) and /metrics.json from a daemon thread; idempotent."""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Metrics endpoint on http://{host}:{_server.server_address[1]}/metrics")
+    return _server
+
+
+# --- Per-session tracker (lives in AgentState) ---
+
+# Wall-clock time of perf_counter() == 0 in this process
+_WALL_ANCHOR = time.time() - time.perf_counter()
+
+
+def _now() -> float:
+    """Wall-clock seconds that advance with the monotonic clock (no NTP jumps within a process)."""
+    return _WALL_ANCHOR + time.perf_counter()
+
 
 @dataclass
 class MetricsTracker:
     """
-    Tracks 'Agent's Brain' metrics (Tokens & Time).
+    Tracks 'Agent's Brain' metrics (Tokens & Time) for one session.
+    Everything recorded here is also aggregated into the process-wide REGISTRY.
     """
     total_tokens: int = 0
-    start_time: float = field(default_factory=time.time)
-    # NEW: Tracks the completion time of the previous step to calculate deltas
-    last_time: float = field(default_factory=time.time) 
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Wall-clock timestamps (see _now), so they stay valid when a checkpointed
+    # session is resumed in another process
+    start_time: float = field(default_factory=_now)
+    # Tracks the completion time of the previous step to calculate deltas
+    last_time: float = field(default_factory=_now)
     step_times: List[Dict[str, Any]] = field(default_factory=list)
+    # Cache hit/miss counters keyed by cache name (e.g. "exploration")
+    cache_stats: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # Named sub-step durations in seconds (e.g. "readiness_wait")
+    timings: Dict[str, List[float]] = field(default_factory=dict)
 
     def __post_init__(self):
         # Ensure last_time is synchronized with start_time upon creation
         self.last_time = self.start_time
 
+    def reset(self):
+        """Starts a new session in place (the same object stays in the UI session)."""
+        fresh = MetricsTracker()
+        self.__dict__.update(fresh.__dict__)
+
     def add_tokens(self, count: int):
         """Updates total token consumption."""
         if count:
             self.total_tokens += count
 
+    def add_usage(self, usage: Optional[Dict[str, int]], node: str):
+        """Records an LLM response's usage_metadata (prompt vs completion tokens)."""
+        usage = usage or {}
+        prompt = usage.get("input_tokens", 0) or 0
+        completion = usage.get("output_tokens", 0) or 0
+        self.add_tokens(usage.get("total_tokens", 0) or prompt + completion)
+        self.prompt_tokens += prompt
+        self.completion_tokens += completion
+        if prompt:
+            REGISTRY.inc("qa_agent_llm_tokens_total", prompt, node=node, type="prompt")
+        if completion:
+            REGISTRY.inc("qa_agent_llm_tokens_total", completion, node=node, type="completion")
+
+    def record_cache(self, name: str, hit: bool):
+        """Counts a hit or miss for the named cache."""
+        counters = self.cache_stats.setdefault(name, {"hits": 0, "misses": 0})
+        counters["hits" if hit else "misses"] += 1
+        REGISTRY.inc("qa_agent_cache_requests_total", cache=name, result="hit" if hit else "miss")
+
+    def record_timing(self, name: str, seconds: float):
+        """Records the duration of a named sub-step."""
+        self.timings.setdefault(name, []).append(round(seconds, 3))
+        REGISTRY.observe("qa_agent_timing_seconds", seconds, step=name)
+
     def log_step(self, step_name: str):
         """Logs the timing of a specific workflow step."""
-        current = time.time()
-        
-        # Existing logic: Cumulative time from start
+        current = _now()
+
+        # Cumulative time from start
         cumulative = current - self.start_time
-        
-        # NEW LOGIC: Delta time (duration of just this specific step)
+
+        # Delta time (duration of just this specific step)
         step_duration = current - self.last_time
         self.last_time = current # Update last_time for the next step
-        
+
         self.step_times.append({
-            "step": step_name, 
+            "step": step_name,
             "timestamp": current,
             "cumulative_duration": round(cumulative, 2),
             "step_duration": round(step_duration, 2) # Saving the specific speed
@@ -44,6 +338,11 @@ class MetricsTracker:
         """Returns formatted stats for the UI."""
         return {
             "tokens": self.total_tokens,
-            "duration": round(time.time() - self.start_time, 2),
-            "steps": self.step_times # Expose steps so UI can read them
-        }
\ No newline at end of file
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "duration": round(_now() - self.start_time, 2),
+            "steps": self.step_times, # Expose steps so UI can read them
+            "cache": self.cache_stats,
+            "timings": self.timings,
+            "llm_cache": llm_cache_stats() # Process-wide (shared by all sessions)
+        }
@@ -0,0 +1,122 @@
+"""
+Chat model client for the local mock LLM server (Config.LLM_PROVIDER = "mock").
+
+Talks to `benchmarks.mock_llm_server` (or anything speaking the same minimal
+OpenAI-style protocol) at Config.MOCK_LLM_URL, so load tests exercise real HTTP,
+streaming and error paths without spending Gemini quota. Error responses raise
+`httpx.HTTPStatusError` (429 carries the server's Retry-After header).
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+_ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+def _payload(messages: List[BaseMessage], stream: bool) -> dict:
+    return {
+        "model": "mock",
+        "stream": stream,
+        "messages": [{"role": _ROLES.get(m.type, "user"), "content": m.content} for m in messages],
+    }
+
+
+def _usage(body: dict) -> Optional[UsageMetadata]:
+    usage = body.get("usage")
+    if not usage:
+        return None
+    return UsageMetadata(input_tokens=usage["prompt_tokens"], output_tokens=usage["completion_tokens"],
+                         total_tokens=usage["total_tokens"])
+
+
+def _events(lines) -> Iterator[dict]:
+    for line in lines:
+        if not line.startswith("data: "):
+            continue
+        data = line[len("data: "):]
+        if data == "[DONE]":
+            return
+        yield json.loads(data)
+
+
+def _chunk(event: dict) -> ChatGenerationChunk:
+    delta = event["choices"][0].get("delta", {}) if event.get("choices") else {}
+    return ChatGenerationChunk(message=AIMessageChunk(content=delta.get("content", ""), usage_metadata=_usage(event)))
+
+
+class MockChatModel(BaseChatModel):
+    """Chat model backed by the mock server; supports ainvoke and token streaming."""
+
+    base_url: str
+    timeout: float = 120.0
+    _client: Optional[httpx.AsyncClient] = PrivateAttr(default=None)
+    _loop: Any = PrivateAttr(default=None)
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock-server"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": "mock", "base_url": self.base_url}
+
+    @property
+    def _endpoint(self) -> str:
+        return self.base_url.rstrip("/") + "/v1/chat/completions"
+
+    def _async_client(self) -> httpx.AsyncClient:
+        # One pooled client per model instance and event loop (get_llm shares the instance)
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(max_connections=None))
+            self._loop = loop
+        return self._client
+
+    @staticmethod
+    def _result(body: dict) -> ChatResult:
+        content = body["choices"][0]["message"]["content"]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content, usage_metadata=_usage(body)))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs) -> ChatResult:
+        response = httpx.post(self._endpoint, json=_payload(messages, False), timeout=self.timeout)
+        response.raise_for_status()
+        return self._result(response.json())
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs) -> ChatResult:
+        response = await self._async_client().post(self._endpoint, json=_payload(messages, False))
+        response.raise_for_status()
+        return self._result(response.json())
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        with httpx.stream("POST", self._endpoint, json=_payload(messages, True), timeout=self.timeout) as response:
+            response.raise_for_status()
+            for event in _events(response.iter_lines()):
+                chunk = _chunk(event)
+                if run_manager and chunk.text:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        async with self._async_client().stream("POST", self._endpoint, json=_payload(messages, True)) as response:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line == "data: [DONE]":
+                    break
+                for event in _events([line]):
+                    chunk = _chunk(event)
+                    if run_manager and chunk.text:
+                        await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                    yield chunk
@@ -0,0 +1,230 @@
+"""
+Fine-grained profiling spans with Chrome trace-event export.
+
+Wrap work in `with span("browser.goto"):` or decorate functions with `@profiled("dom.clean")`.
+Spans are only recorded inside an active trace (see `profile_run`), so instrumented code
+costs one ContextVar lookup when profiling is off. Spans nest per asyncio task; each task
+gets its own lane (tid) in the exported JSON, which loads in Perfetto / chrome://tracing.
+
+Spans named in Config.PROFILE_CPROFILE_SPANS additionally take a cProfile snapshot,
+written next to the trace as `<trace>-<span>-<n>.prof` (open with pstats or snakeviz).
+"""
+import asyncio
+import cProfile
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from loguru import logger
+from config import Config
+
+_active_trace: ContextVar[Optional["Trace"]] = ContextVar("qa_agent_trace", default=None)
+# Only one cProfile profiler may run per process at a time
+_cprofile_lock = threading.Lock()
+
+
+class Trace:
+    """Collects completed spans of one run as Chrome trace events."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+        self.profiles: List[str] = []
+        self._lanes: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._profile_ids = itertools.count(1)
+
+    def _lane(self) -> int:
+        try:
+            owner = id(asyncio.current_task())
+        except RuntimeError:
+            owner = threading.get_ident()
+        with self._lock:
+            return self._lanes.setdefault(owner, len(self._lanes) + 1)
+
+    def now_us(self) -> float:
+        return (time.perf_counter() - self.started) * 1e6
+
+    def add(self, name: str, cat: str, start_us: float, end_us: float, lane: int, args: Dict[str, Any]):
+        event = {
+            "name": name, "cat": cat or "app", "ph": "X",
+            "ts": round(start_us, 3), "dur": round(end_us - start_us, 3),
+            "pid": os.getpid(), "tid": lane,
+        }
+        if args:
+            event["args"] = {k: v if isinstance(v, (int, float, bool)) else str(v) for k, v in args.items()}
+        with self._lock:
+            self.events.append(event)
+
+    def to_chrome(self) -> Dict[str, Any]:
+        with self._lock:
+            events = sorted(self.events, key=lambda e: (e["ts"], -e["dur"]))
+            lanes = list(self._lanes.values())
+        metadata = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": self.name}}]
+        metadata += [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": lane, "args": {"name": f"task {lane}"}}
+            for lane in lanes
+        ]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str) -> str:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f)
+        return path
+
+
+@contextmanager
+def _record(trace: Trace, name: str, cat: str, args: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    lane = trace._lane()
+    profiler = None
+    if name in Config.PROFILE_CPROFILE_SPANS and _cprofile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = trace.now_us()
+    try:
+        yield args
+    finally:
+        end = trace.now_us()
+        if profiler:
+            profiler.disable()
+            _cprofile_lock.release()
+            args["cprofile"] = _dump_profile(trace, name, profiler)
+        trace.add(name, cat, start, end, lane, args)
+
+
+def _dump_profile(trace: Trace, name: str, profiler: cProfile.Profile) -> str:
+    path = os.path.join(Config.PROFILE_DIR, f"{_slug(trace.name)}-{_slug(name)}-{next(trace._profile_ids)}.prof")
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(path)
+    trace.profiles.append(path)
+    return path
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *args):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, cat: str = "", /, **args):
+    """
+    Context manager timing a block as a nested span. Yields a dict; keys added to it
+    end up in the event's args. A no-op when no trace is active.
+    """
+    trace = _active_trace.get()
+    if trace is None:
+        return _NOOP
+    return _record(trace, name, cat, args)
+
+
+def profiled(name: str = None, cat: str = ""):
+    """Decorator form of `span` for sync and async functions."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _active_trace.get() is None:
+                    return await func(*args, **kwargs)
+                with span(span_name, cat):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace() -> Optional[Trace]:
+    return _active_trace.get()
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", text).strip("_")[:80] or "run"
+
+
+@contextmanager
+def profile_run(name: str, enabled: bool = None) -> Iterator[Optional[Trace]]:
+    """
+    Activates a trace for the enclosed run (including tasks it spawns) and, when
+    profiling is enabled, writes `<PROFILE_DIR>/<name>-<timestamp>.trace.json` on exit.
+    Yields None when profiling is disabled.
+    """
+    enabled = Config.PROFILING_ENABLED if enabled is None else enabled
+    if not enabled or _active_trace.get() is not None:
+        yield _active_trace.get()
+        return
+    trace = Trace(name)
+    token = _active_trace.set(trace)
+    try:
+        with span("run", "run", label=name):
+            yield trace
+    finally:
+        _active_trace.reset(token)
+        path = os.path.join(Config.PROFILE_DIR, f"{_slug(name)}-{int(time.time() * 1000)}.trace.json")
+        try:
+            trace.export(path)
+            logger.info(f"Profile trace written to {path} ({len(trace.events)} spans)")
+        except OSError as e:
+            logger.warning(f"Could not write profile trace: {e}")
+
+
+class ProfilingCallbackHandler(BaseCallbackHandler):
+    """LangChain callback that records every chat model call as an "llm" span."""
+
+    run_inline = True  # keep callbacks in the caller's context so the trace is visible
+
+    def __init__(self):
+        self._open: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        trace = _active_trace.get()
+        if trace is not None:
+            model = (kwargs.get("invocation_params") or {}).get("model") or (serialized or {}).get("name", "")
+            self._open[run_id] = (trace, trace.now_us(), trace._lane(), model)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        entry = self._open.pop(run_id, None)
+        if entry:
+            trace, start, lane, model = entry
+            args: Dict[str, Any] = {"model": model}
+            generations = response.generations[0] if response.generations else []
+            message = getattr(generations[0], "message", None) if generations else None
+            if message is not None:
+                usage = getattr(message, "usage_metadata", None) or {}
+                args.update(
+                    input_tokens=usage.get("input_tokens", 0),
+                    output_tokens=usage.get("output_tokens", 0),
+                    cache_hit=bool(message.response_metadata.get("cache_hit")),
+                )
+            trace.add("llm", "llm", start, trace.now_us(), lane, args)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        entry = self._open.pop(run_id, None)
+        if entry:
+            trace, start, lane, model = entry
+            trace.add("llm", "llm", start, trace.now_us(), lane, {"model": model, "error": type(error).__name__})
@@ -1,4 +1,16 @@
-from typing import TypedDict, Optional, Any
+from typing import TypedDict, Optional, Any, List, Dict, Annotated
+
+
+def merge_scenario_results(current: Optional[Dict[str, dict]], update: Optional[Dict[str, dict]]) -> Dict[str, dict]:
+    """
+    Reducer for parallel scenario branches: merges per-scenario entries.
+    None resets the table; a None entry drops that scenario.
+    """
+    if update is None:
+        return {}
+    merged = {**(current or {}), **update}
+    return {key: value for key, value in merged.items() if value is not None}
+
 
 class AgentState(TypedDict):
     """
@@ -11,19 +23,30 @@ class AgentState(TypedDict):
     metrics: Any  # Instance of MetricsTracker
     
     # Phase 1: Exploration Data
+    extractor: str # "dom" or "a11y" (Config.PAGE_EXTRACTOR when unset); the one actually used after explore
+    # dom_content, clean_dom, generated_code, execution_logs and scenario code/logs may hold
+    # "blob:sha256:..." references when large; read them through app.core.blobs.resolve()
     dom_content: str
     clean_dom: str
-    screenshot_path: Optional[str]
+    capture_screenshot: bool # False when nothing displays the screenshot
+    screenshot: Optional[dict] # {"id", "ref", "mime", "bytes"}; image bytes live in the blob store
     page_summary: str
     element_map: str
+    crawl: dict # crawl mode settings (max_depth, max_pages); empty = only explore `url`
+    site_pages: List[dict] # crawled pages: url, depth, title, summary, duplicate_of, error
+    site_map: str # compact site map of the crawled pages for the design prompt
     
     # Phase 2: Design Data
     test_plan: str
     
     # Phase 3 & 4: Implementation & Verification
+    scenarios: List[dict] # [{"id", "title", "text"}] split from the approved plan
+    scenario_results: Annotated[Dict[str, dict], merge_scenario_results] # scenario id -> code, logs, result
     generated_code: str
+    retrieved_chunks: List[str] # DOM chunk ids given to the implementation prompt
     execution_logs: str
-    test_results: str # "Passed" or "Failed"
+    execution_limits: dict # overrides for ExecutionLimits: wall_time, cpu_time, memory_mb (0 = off)
+    test_results: str # "Passed", "Failed", or "Timeout" / "OOM" / "Crash" when a run was killed
     
     # Refinement Loop State & Human Feedback
     attempt_count: int
@@ -0,0 +1,190 @@
+"""
+Prompt token counting and per-node prompt budgets.
+
+`count_tokens` counts with the tokenizer of Config.MODEL_NAME: Gemini models use the
+local SentencePiece tokenizer shipped with google-genai (needs `sentencepiece`; the
+model file is downloaded once and cached; `warm_token_counter` loads it in a worker
+thread so the event loop never blocks on it), so no API call is made per prompt. The fake
+and mock providers count 4 characters per token, which is exactly what they report as
+usage; Gemini falls back to the same estimate when the tokenizer cannot be loaded.
+Counts are memoized per string.
+
+`fit_prompt` fills a prompt template within the node's budget (Config.PROMPT_BUDGETS).
+Every section owns a share of what the template leaves free; when the prompt is too
+long, sections over their share are cut back in the node's shrink order
+(Config.PROMPT_SECTIONS), each only as far as needed. Sections under their share are
+never cut, so short sections lend their unused room to long ones.
+"""
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+from config import Config
+from app.core.metrics import REGISTRY
+
+# Marker left where a section was cut
+TRUNCATION_MARKER = "\n... [truncated] ...\n"
+_MEMO_SIZE = 4096
+
+
+def _estimate(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class TokenCounter:
+    """Counts tokens with `count`; results are memoized per string (LRU)."""
+
+    def __init__(self, count: Callable[[str], int], name: str, memo_size: int = _MEMO_SIZE):
+        self._count = count
+        self.name = name
+        self._memo: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+        self._memo_size = memo_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        # str caches its hash, so repeated lookups of the same prompt section are O(1)
+        key = (hash(text), len(text))
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self.hits += 1
+                return self._memo[key]
+        tokens = self._count(text)
+        with self._lock:
+            self.misses += 1
+            self._memo[key] = tokens
+            if len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+        return tokens
+
+
+def _gemini_counter(model_name: str) -> Optional[Callable[[str], int]]:
+    try:
+        from google.genai.local_tokenizer import LocalTokenizer
+        tokenizer = LocalTokenizer(model_name=model_name)
+    except Exception as e:  # missing sentencepiece, unknown model or no network for the first download
+        logger.warning(f"Local tokenizer for {model_name} unavailable ({e}); estimating 4 chars per token")
+        return None
+    return lambda text: tokenizer.count_tokens(text).total_tokens
+
+
+_counters: Dict[Tuple[str, str], TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def _counter_for(provider: str, model_name: str) -> TokenCounter:
+    key = (provider, model_name)
+    counter = _counters.get(key)
+    if counter is None:
+        with _counters_lock:
+            counter = _counters.get(key)
+            if counter is None:
+                count = _gemini_counter(model_name) if provider == "gemini" else None
+                counter = TokenCounter(count, model_name) if count else TokenCounter(_estimate, "chars/4")
+                _counters[key] = counter
+    return counter
+
+
+def get_token_counter() -> TokenCounter:
+    """The (cached) counter for the configured provider and model."""
+    return _counter_for(Config.LLM_PROVIDER, Config.MODEL_NAME)
+
+
+async def warm_token_counter() -> TokenCounter:
+    """get_token_counter() for async callers: the first load (and download) runs in a thread."""
+    counter = _counters.get((Config.LLM_PROVIDER, Config.MODEL_NAME))
+    return counter or await asyncio.to_thread(get_token_counter)
+
+
+def count_tokens(text: str) -> int:
+    return get_token_counter().count(text)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """
+    Shortens `text` to at most `max_tokens` tokens (marker included). keep="head" keeps
+    the start, keep="middle" drops the middle and keeps both ends (e.g. logs).
+    """
+    counter = get_token_counter()
+    if counter.count(text) <= max_tokens:
+        return text
+    if max_tokens <= counter.count(TRUNCATION_MARKER):
+        return ""
+
+    def cut(chars: int) -> str:
+        if keep == "middle":
+            head = chars // 2
+            return text[:head] + TRUNCATION_MARKER + text[len(text) - (chars - head):]
+        return text[:chars] + TRUNCATION_MARKER
+
+    # Binary search on the character length; counts are monotonic enough for prefixes
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if counter.count(cut(mid)) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return cut(low)
+
+
+@dataclass
+class FittedPrompt:
+    text: str
+    tokens: int
+    budget: int
+    # Section name -> (tokens before, tokens after) for every section that was cut
+    truncated: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+
+def fit_prompt(node: str, template: str, sections: Dict[str, str]) -> FittedPrompt:
+    """
+    Formats `template` with `sections`, cutting sections (see module docstring) so the
+    prompt stays within Config.PROMPT_BUDGETS[node]. Nodes without a budget are only
+    measured. The final prompt size is recorded as qa_agent_prompt_tokens{node}.
+    """
+    budget = Config.PROMPT_BUDGETS.get(node, 0)
+    specs: List[tuple] = Config.PROMPT_SECTIONS.get(node, [])
+    counter = get_token_counter()
+    sections = dict(sections)
+    truncated: Dict[str, Tuple[int, int]] = {}
+
+    text = template.format(**sections)
+    tokens = counter.count(text)
+    if budget and tokens > budget:
+        available = max(0, budget - counter.count(template.format(**{name: "" for name in sections})))
+        # Token counts are not quite additive across section boundaries, so re-measure the
+        # whole prompt and give back the remainder in another pass
+        for _ in range(3):
+            excess = tokens - budget
+            for name, share, keep in specs:
+                if excess <= 0:
+                    break
+                size = counter.count(sections.get(name, ""))
+                allowed = int(available * share)
+                if size <= allowed:
+                    continue
+                sections[name] = truncate_to_tokens(sections[name], max(allowed, size - excess), keep)
+                after = counter.count(sections[name])
+                truncated[name] = (truncated.get(name, (size,))[0], after)
+                excess -= size - after
+                REGISTRY.inc("qa_agent_prompt_truncations_total", node=node, section=name)
+            text = template.format(**sections)
+            tokens = counter.count(text)
+            if tokens <= budget or excess > 0:
+                break
+        if tokens > budget:
+            logger.warning(f"{node} prompt is {tokens - budget} tokens over its budget of {budget} after shrinking")
+        if truncated:
+            logger.info(f"{node} prompt shrunk to fit {budget} tokens: "
+                        + ", ".join(f"{name} {before}->{after}" for name, (before, after) in truncated.items()))
+
+    REGISTRY.observe("qa_agent_prompt_tokens", tokens, node=node)
+    return FittedPrompt(text=text, tokens=tokens, budget=budget, truncated=truncated)
@@ -0,0 +1,263 @@
+"""
+Compact page representation built from Playwright's accessibility tree.
+
+`Locator.aria_snapshot()` returns the tree as YAML-like lines
+(`- button "Subscribe" [disabled]`, `- textbox "Email": typed value`, `- /url: /cart`).
+`compact_accessibility_tree` turns it into a prompt-sized outline: interactive elements
+first (role, name, value, state and a `get_by_role` locator hint), grouped by the
+landmark they sit in, followed by headings and summarized static text.
+"""
+import json
+import re
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from config import Config
+
+INTERACTIVE_ROLES = {
+    "button", "link", "textbox", "searchbox", "checkbox", "radio", "combobox", "listbox",
+    "menuitem", "menuitemcheckbox", "menuitemradio", "option", "slider", "spinbutton",
+    "switch", "tab", "treeitem",
+}
+LANDMARK_ROLES = {"banner", "navigation", "main", "contentinfo", "complementary", "form", "search",
+                  "region", "dialog", "alertdialog"}
+HEADING_ROLES = {"heading"}
+# Roles whose text is page content rather than structure
+TEXT_ROLES = {"text", "paragraph", "cell", "listitem", "status", "alert", "caption", "blockquote"}
+
+# Interactive elements repeated more often than this (same role and name) are listed once
+MIN_REPEAT = 3
+
+_LINE = re.compile(r"^(?P<indent>\s*)- (?P<body>.*)$")
+_ROLE = re.compile(r"^(?P<role>[a-z][a-z-]*)\s*")
+_ATTR = re.compile(r"\[(?P<key>[a-z-]+)(?:=(?P<value>[^\]]*))?\]\s*")
+_SPACES = re.compile(r"\s+")
+
+
+@dataclass
+class AXNode:
+    """One line of an aria snapshot."""
+    role: str
+    name: str = ""
+    attrs: Dict[str, str] = field(default_factory=dict)
+    text: str = ""  # inline text after ":" (the value, for form controls)
+    props: Dict[str, str] = field(default_factory=dict)  # "/url", "/placeholder", ...
+    depth: int = 0
+    landmark: str = ""  # nearest landmark ancestor, e.g. 'navigation "Main"'
+    parent: Optional["AXNode"] = field(default=None, repr=False)
+    children: List["AXNode"] = field(default_factory=list, repr=False)
+
+
+def _unquote_key(body: str) -> str:
+    """Undoes YAML single-quoting that aria_snapshot applies to keys with special characters."""
+    if not body.startswith("'"):
+        return body
+    i = 1
+    while i < len(body):
+        if body[i] == "'":
+            if body[i + 1:i + 2] == "'":
+                i += 2
+                continue
+            return body[1:i].replace("''", "'") + body[i + 1:]
+        i += 1
+    return body
+
+
+def _read_string(body: str):
+    """Reads a leading JSON-style quoted string; returns (value, rest) or (None, body)."""
+    if not body.startswith('"'):
+        return None, body
+    i = 1
+    while i < len(body):
+        if body[i] == "\\":
+            i += 2
+            continue
+        if body[i] == '"':
+            try:
+                return json.loads(body[:i + 1]), body[i + 1:].lstrip()
+            except ValueError:
+                return body[1:i], body[i + 1:].lstrip()
+        i += 1
+    return body[1:], ""
+
+
+def _parse_text(text: str) -> str:
+    text = text.strip()
+    value, rest = _read_string(text)
+    return value if value is not None and not rest else text
+
+
+def parse_aria_snapshot(snapshot: str) -> List[AXNode]:
+    """Parses aria_snapshot output into a flat, document-ordered list of nodes (children linked)."""
+    nodes: List[AXNode] = []
+    stack: List[AXNode] = []  # open ancestors
+    for line in snapshot.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        depth = len(match.group("indent")) // 2
+        body = _unquote_key(match.group("body").strip())
+        while stack and stack[-1].depth >= depth:
+            stack.pop()
+        parent = stack[-1] if stack else None
+
+        if body.startswith("/"):
+            # Property of the parent, e.g. "/url: /products"
+            key, _, value = body[1:].partition(":")
+            if parent is not None:
+                parent.props[key.strip()] = _parse_text(value)
+            continue
+
+        role_match = _ROLE.match(body)
+        if not role_match:
+            continue
+        node = AXNode(role=role_match.group("role"), depth=depth)
+        rest = body[role_match.end():]
+        name, rest = _read_string(rest)
+        node.name = _SPACES.sub(" ", name or "").strip()
+        while True:
+            attr = _ATTR.match(rest)
+            if not attr:
+                break
+            node.attrs[attr.group("key")] = attr.group("value") if attr.group("value") is not None else ""
+            rest = rest[attr.end():]
+        if rest.startswith(":"):
+            node.text = _SPACES.sub(" ", _parse_text(rest[1:])).strip()
+
+        if parent is not None:
+            node.parent = parent
+            parent.children.append(node)
+            node.landmark = parent.landmark
+            if parent.role in LANDMARK_ROLES:
+                node.landmark = f'{parent.role} "{parent.name}"' if parent.name else parent.role
+        nodes.append(node)
+        stack.append(node)
+    return nodes
+
+
+def _py_string(value: str) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _describe(node: AXNode, text_chars: int) -> str:
+    line = f"{node.role} {_py_string(node.name)}" if node.name else node.role
+    for key, value in node.attrs.items():
+        line += f" [{key}={value}]" if value else f" [{key}]"
+    if node.text:
+        line += f" value={_py_string(_shorten(node.text, text_chars))}"
+    if node.props.get("url"):
+        line += f" ({_shorten(node.props['url'], text_chars)})"
+    if node.props.get("placeholder") and node.props["placeholder"] != node.name:
+        line += f" placeholder={_py_string(node.props['placeholder'])}"
+    options = [c for c in node.children if c.role == "option"]
+    if options:
+        names = [c.name + ("*" if "selected" in c.attrs else "") for c in options[:8]]
+        more = f", +{len(options) - 8}" if len(options) > 8 else ""
+        line += f" options: {', '.join(names)}{more}"
+    return line
+
+
+def _shorten(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _locator_hints(nodes: List[AXNode]) -> Dict[int, str]:
+    """get_by_role hints, disambiguated with .nth(i) when role and name repeat."""
+    def key(node: AXNode):
+        # An unnamed get_by_role() matches every element of that role
+        if node.name:
+            return node.role, node.name
+        if node.props.get("placeholder"):
+            return "placeholder", node.props["placeholder"]
+        return node.role, None
+
+    totals = Counter(key(n) for n in nodes)
+    totals.update((n.role, None) for n in nodes if n.name or n.props.get("placeholder"))
+    seen: Counter = Counter()
+    hints = {}
+    for node in nodes:
+        if node.name:
+            hint = f'get_by_role("{node.role}", name={_py_string(node.name)}, exact=True)'
+        elif node.props.get("placeholder"):
+            hint = f"get_by_placeholder({_py_string(node.props['placeholder'])})"
+        else:
+            hint = f'get_by_role("{node.role}")'
+        node_key = key(node)
+        if totals[node_key] > 1:
+            hint += f".nth({seen[node_key]})"
+        seen[node_key] += 1
+        if node_key != (node.role, None):
+            seen[(node.role, None)] += 1
+        hints[id(node)] = hint
+    return hints
+
+
+def compact_accessibility_tree(snapshot: str, max_tokens: int = None, text_chars: int = None) -> str:
+    """
+    Builds the compact outline from an aria snapshot within `max_tokens`
+    (1 token approx 4 chars). Interactive elements are emitted first, then headings
+    and static text; repeated text lines are collapsed into one line with a count.
+    """
+    max_tokens = max_tokens or Config.A11Y_MAX_TOKENS
+    text_chars = text_chars or Config.A11Y_TEXT_CHARS
+    limit = max_tokens * 4
+    nodes = parse_aria_snapshot(snapshot)
+
+    # Options are listed on their combobox/listbox line instead of on their own
+    interactive = [n for n in nodes if n.role in INTERACTIVE_ROLES
+                   and not (n.role == "option" and n.parent and n.parent.role in ("combobox", "listbox"))]
+    hints = _locator_hints(interactive)
+    repeats = Counter((n.role, n.name) for n in interactive if n.name)
+    sections: "OrderedDict[str, List[str]]" = OrderedDict()
+    listed = set()
+    for node in interactive:
+        key = (node.role, node.name)
+        if repeats[key] > MIN_REPEAT:
+            # A control repeated on every card/row is listed once
+            if key in listed:
+                continue
+            listed.add(key)
+            count = repeats[key]
+            hint = hints[id(node)].replace(".nth(0)", ".nth(i)")
+            line = f"- {_describe(node, text_chars)} (x{count}) -> {hint}"
+        else:
+            line = f"- {_describe(node, text_chars)} -> {hints[id(node)]}"
+        sections.setdefault(node.landmark or "page", []).append(line)
+
+    # (line, repeated text) in document order; repeated static text ("Rs. 500" on
+    # every card) is kept once with a count
+    outline: List[tuple] = []
+    text_counts: Counter = Counter()
+    for node in nodes:
+        if node.role in HEADING_ROLES:
+            outline.append((f"- {_describe(node, text_chars)}", None))
+        elif node.role in TEXT_ROLES and (node.text or node.name) and not node.children:
+            text = _shorten(node.text or node.name, text_chars)
+            if text_counts[text] == 0:
+                outline.append((f"- {node.role}: {text}", text))
+            text_counts[text] += 1
+
+    lines = [f"# Interactive elements ({len(interactive)})"]
+    for landmark, items in sections.items():
+        lines.append(f"## {landmark}")
+        lines.extend(items)
+    lines.append("# Page outline")
+    lines.extend(line + (f" (x{text_counts[text]})" if text and text_counts[text] > 1 else "")
+                 for line, text in outline)
+
+    out: List[str] = []
+    size = 0
+    for i, line in enumerate(lines):
+        if size + len(line) + 1 > limit:
+            out.append(f"... ({len(lines) - i} more lines omitted)")
+            break
+        out.append(line)
+        size += len(line) + 1
+    return "\n".join(out)
+
+
+async def extract_accessibility_tree(page, max_tokens: int = None) -> str:
+    """Snapshots the page's accessibility tree and returns the compact outline."""
+    snapshot = await page.locator("body").aria_snapshot(timeout=Config.TIMEOUT)
+    return compact_accessibility_tree(snapshot, max_tokens)
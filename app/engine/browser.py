@@ -1,77 +1,204 @@
 import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from loguru import logger
 from playwright.async_api import async_playwright
 from config import Config
+from app.core.metrics import REGISTRY
+from app.core.profiling import span
+from app.engine.context_pool import ContextPool, PooledContext
+from app.engine.executor import (
+    ExecutionLimits, RunOutcome, TestWorkerPool, collect_output, stream_output, stream_subprocess,
+)
+from app.engine.screenshots import capture_screenshot
+from app.engine.a11y_extractor import extract_accessibility_tree
+from app.engine.readiness import (
+    MUTATION_OBSERVER_SCRIPT, NetworkTracker, ReadinessResult, select_mode, wait_until_ready
+)
+
+# Open managers; the pool gauges report their sum (one collector for the process)
+_managers: "weakref.WeakSet[BrowserManager]" = weakref.WeakSet()
+
+
+def _collect_pool_metrics(registry):
+    totals = {"in_use": 0, "idle": 0, "max_size": 0}
+    for manager in list(_managers):
+        stats = manager.pool.stats()
+        for state in totals:
+            totals[state] += stats[state]
+    for state, value in totals.items():
+        registry.set_gauge("qa_agent_browser_pool_contexts", value, state=state)
+
+
+REGISTRY.register_collector(_collect_pool_metrics)
+
 
 class BrowserManager:
     """
     Manages the Playwright browser instance.
+
+    One Chromium process is kept warm; concurrent sessions lease isolated
+    contexts from a bounded ContextPool via `async with browser.lease() as page`.
+    `self.page` remains available as a default page for single-user callers.
     """
-    def __init__(self):
+    def __init__(self, max_contexts: int = None, idle_timeout: float = None):
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
+        self._lock = asyncio.Lock()
+        self.pool = ContextPool(
+            self._new_context,
+            max_size=max_contexts or Config.BROWSER_POOL_SIZE,
+            idle_timeout=idle_timeout or Config.BROWSER_POOL_IDLE_TIMEOUT
+        )
+        self.executor = None  # TestWorkerPool, created on first verification
+        _managers.add(self)
 
     async def start(self):
+        async with self._lock:
+            await self._ensure_browser()
+            if not self.page or self.page.is_closed():
+                self.context = await self._create_context(self.browser)
+                self.page = await self.context.new_page()
+
+    async def _ensure_browser(self):
+        """Launches Chromium once, and again only if the process went away."""
         if not self.playwright:
             self.playwright = await async_playwright().start()
+        if not self.browser or not self.browser.is_connected():
             self.browser = await self.playwright.chromium.launch(
-                headless=Config.HEADLESS, 
+                headless=Config.HEADLESS,
                 args=["--start-maximized"]
             )
-            self.context = await self.browser.new_context(no_viewport=True)
-            self.page = await self.context.new_page()
 
-    async def navigate(self, url: str):
-        if not self.page:
-            await self.start()
+    @staticmethod
+    async def _create_context(browser):
+        context = await browser.new_context(no_viewport=True)
+        # Lets readiness detection see DOM mutations from the first byte
+        await context.add_init_script(MUTATION_OBSERVER_SCRIPT)
+        return context
+
+    async def _new_context(self) -> PooledContext:
+        async with self._lock:
+            await self._ensure_browser()
+            browser = self.browser
+        context = await self._create_context(browser)
+        page = await context.new_page()
+        return PooledContext(context=context, page=page)
+
+    @asynccontextmanager
+    async def lease(self):
+        """Leases an isolated page from the context pool for the duration of the block."""
+        with span("browser.lease", "browser"):
+            entry = await self.pool.acquire()
+        healthy = True
         try:
-            await self.page.goto(url, timeout=Config.TIMEOUT)
-            await self.page.wait_for_load_state("domcontentloaded")
-            await asyncio.sleep(2) 
+            yield entry.page
+        except BaseException:
+            healthy = False
+            raise
+        finally:
+            await self.pool.release(entry, healthy=healthy)
+
+    async def navigate(self, url: str, page=None, mode: str = None) -> ReadinessResult:
+        """
+        Navigates and waits until the page is ready (see app.engine.readiness).
+        `mode` overrides the per-URL choice from Config.READINESS_RULES.
+        """
+        if page is None:
+            if not self.page:
+                await self.start()
+            page = self.page
+        mode = mode or select_mode(url)
+        started = time.monotonic()
+        tracker = NetworkTracker(page).attach()
+        try:
+            with span("browser.goto", "browser", url=url):
+                await page.goto(url, timeout=Config.TIMEOUT, wait_until="domcontentloaded")
+            with span("browser.readiness", "browser", mode=mode) as args:
+                result = await wait_until_ready(page, tracker, mode, started)
+                args["reason"] = result.reason
         except Exception as e:
-            return f"Error navigating: {str(e)}"
+            result = ReadinessResult(mode, time.monotonic() - started, "error", f"Error navigating: {str(e)}")
+        finally:
+            tracker.detach()
+        logger.debug(f"Page ready in {result.waited:.2f}s ({result.mode}, {result.reason}): {url}")
+        return result
 
-    async def get_content(self):
-        if self.page:
-            return await self.page.content()
+    async def get_content(self, page=None):
+        page = page or self.page
+        if page:
+            with span("browser.content", "browser"):
+                return await page.content()
         return ""
 
-    async def take_screenshot(self, path="screenshot.png"):
-        if self.page:
+    async def get_accessibility_tree(self, page=None, max_tokens: int = None) -> str:
+        """Compact accessibility-tree outline of the page (see app.engine.a11y_extractor); "" on failure."""
+        page = page or self.page
+        if page:
             try:
-                await self.page.screenshot(path=path, timeout=Config.TIMEOUT)
-                return path
-            except Exception:
-                return None
+                with span("browser.a11y", "browser"):
+                    return await extract_accessibility_tree(page, max_tokens)
+            except Exception as e:
+                logger.warning(f"Accessibility snapshot failed: {e}")
+        return ""
+
+    async def take_screenshot(self, page=None, **options):
+        """
+        Captures the page into the blob store (see app.engine.screenshots).
+        Returns the screenshot artifact dict, or None.
+        """
+        page = page or self.page
+        if page:
+            return await capture_screenshot(page, **options)
         return None
 
-    async def execute_generated_test(self, code: str):
+    async def stream_generated_test(self, code: str, limits: ExecutionLimits = None,
+                                    outcome: RunOutcome = None):
         """
-        Executes generated Python code in a subprocess.
+        Executes generated Python code, yielding (stream, line) as it prints.
+
+        In "pool" mode (default) the code runs on a warm worker from TestWorkerPool;
+        in "subprocess" mode a fresh interpreter runs it from a unique temp file, and
+        "sandbox" mode adds the CPU/memory rlimits from `limits`. Every mode enforces
+        the wall-clock limit and Config.VERIFY_STOP_PATTERNS (see executor.stream_output).
+        How the run ended is recorded in `outcome`.
         """
-        filename = "generated_test_runner.py"
-        
-        # Write code to file
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(code)
-            
-        # Run in a separate process
-        proc = await asyncio.create_subprocess_exec(
-            "python", filename,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        stdout, stderr = await proc.communicate()
-        
-        output = ""
-        if stdout: output += stdout.decode(errors='replace')
-        if stderr: output += "\nERROR:\n" + stderr.decode(errors='replace')
-        
-        return output
+        mode = Config.TEST_EXECUTION_MODE
+        limits = limits or ExecutionLimits.from_config()
+        outcome = outcome if outcome is not None else RunOutcome()
+        started = time.perf_counter()
+        if mode == "pool":
+            if self.executor is None:
+                self.executor = TestWorkerPool()
+            source = self.executor.stream(code, outcome)
+        elif mode == "sandbox":
+            source = stream_subprocess(code, limits, outcome)
+        else:
+            source = stream_subprocess(code, ExecutionLimits(), outcome)
+        output = stream_output(source, wall_time=limits.wall_time, outcome=outcome)
+        try:
+            with span("executor.run", "executor", mode=mode):
+                async for stream, line in output:
+                    yield stream, line
+        finally:
+            await output.aclose()
+            if outcome.status == "stopped":
+                REGISTRY.inc("qa_agent_test_early_stops_total", mode=mode)
+            elif outcome.status != "completed":
+                REGISTRY.inc("qa_agent_test_aborts_total", mode=mode, status=outcome.status)
+            REGISTRY.observe("qa_agent_test_run_seconds", time.perf_counter() - started, mode=mode)
+
+    async def execute_generated_test(self, code: str, limits: ExecutionLimits = None) -> str:
+        """Executes generated Python code and returns its (capped) combined output."""
+        return await collect_output(self.stream_generated_test(code, limits))
 
     async def close(self):
+        _managers.discard(self)
+        await self.pool.close()
+        if self.executor: await self.executor.close()
         if self.context: await self.context.close()
         if self.browser: await self.browser.close()
-        if self.playwright: await self.playwright.stop()
\ No newline at end of file
+        if self.playwright: await self.playwright.stop()
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+from app.core.metrics import REGISTRY
+
+
+@dataclass
+class PooledContext:
+    """A browser context with its single page, as handed out by ContextPool."""
+    context: Any
+    page: Any
+    created_at: float = field(default_factory=time.monotonic)
+    released_at: float = field(default_factory=time.monotonic)
+    uses: int = 0
+    crashed: bool = False
+
+
+class ContextPool:
+    """
+    Bounded pool of isolated browser contexts on top of one warm browser process.
+
+    - `acquire()` waits while `max_size` contexts are leased, reuses an idle context
+      when one passes the health check, and otherwise creates a new one.
+    - `release()` resets the context (cookies cleared, page blanked) and returns it
+      to the idle list; crashed or failed contexts are closed instead.
+    - Idle contexts older than `idle_timeout` seconds are evicted on every acquire/release.
+    """
+
+    HEALTH_CHECK_TIMEOUT = 2.0
+
+    def __init__(self, factory: Callable[[], Awaitable[PooledContext]], max_size: int = 4,
+                 idle_timeout: float = 300.0):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle: List[PooledContext] = []
+        self._in_use = 0
+        self._semaphore = asyncio.Semaphore(max_size)
+        self.created = 0
+        self.recycled = 0
+        self.evicted = 0
+
+    def _count(self, event: str):
+        """Lifecycle events, per pool and as the process-wide qa_agent_browser_pool_events_total."""
+        setattr(self, event, getattr(self, event) + 1)
+        REGISTRY.inc("qa_agent_browser_pool_events_total", event=event)
+
+    async def acquire(self) -> PooledContext:
+        await self._semaphore.acquire()
+        try:
+            await self._evict_idle()
+            while self._idle:
+                entry = self._idle.pop()
+                if await self._is_healthy(entry):
+                    break
+                self._count("recycled")
+                await self._close(entry)
+            else:
+                entry = await self.factory()
+                self._count("created")
+                entry.page.on("crash", lambda *_: setattr(entry, "crashed", True))
+        except BaseException:
+            self._semaphore.release()
+            raise
+        entry.uses += 1
+        self._in_use += 1
+        return entry
+
+    async def release(self, entry: PooledContext, healthy: bool = True):
+        self._in_use -= 1
+        try:
+            if healthy and not entry.crashed:
+                try:
+                    await entry.context.clear_cookies()
+                    await entry.page.goto("about:blank")
+                    entry.released_at = time.monotonic()
+                    self._idle.append(entry)
+                    return
+                except Exception as e:
+                    logger.warning(f"Browser context reset failed, recycling it: {e}")
+            self._count("recycled")
+            await self._close(entry)
+        finally:
+            self._semaphore.release()
+            await self._evict_idle()
+
+    async def _is_healthy(self, entry: PooledContext) -> bool:
+        if entry.crashed or entry.page.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(entry.page.evaluate("1"), self.HEALTH_CHECK_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def _evict_idle(self):
+        now = time.monotonic()
+        expired = [e for e in self._idle if now - e.released_at > self.idle_timeout]
+        if not expired:
+            return
+        self._idle = [e for e in self._idle if e not in expired]
+        for entry in expired:
+            self._count("evicted")
+            await self._close(entry)
+
+    @staticmethod
+    async def _close(entry: PooledContext):
+        try:
+            await entry.context.close()
+        except Exception:
+            pass
+
+    async def close(self):
+        """Closes all idle contexts (leased ones are closed by their holders' release)."""
+        idle, self._idle = self._idle, []
+        for entry in idle:
+            await self._close(entry)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_size": self.max_size,
+            "in_use": self._in_use,
+            "idle": len(self._idle),
+            "created": self.created,
+            "recycled": self.recycled,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,260 @@
+"""
+Same-origin crawl from the start page (crawl mode of the explore phase).
+
+Pages are fetched by `concurrency` workers, each on its own leased browser context,
+breadth-first up to `max_depth` link hops and `max_pages` pages. URLs are normalized
+before deduplication (scheme/host case, default ports, fragments, tracking parameters,
+query order, trailing slashes), and pages whose cleaned DOM is within
+`duplicate_distance` bits (SimHash) of an already crawled page are kept as duplicates
+but not followed or summarized. A level is fetched in parallel, so the crawl takes
+about as long as the slowest page of each level rather than the sum of all pages.
+"""
+import asyncio
+import hashlib
+import re
+import time
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from loguru import logger
+from app.core.metrics import REGISTRY
+from app.engine.dom_cleaner import DOMCleaner
+
+# Query parameters that never change the page content
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|msclkid|mc_cid|mc_eid|ref|sessionid|phpsessid|jsessionid)$",
+                             re.IGNORECASE)
+# Links to files rather than pages
+SKIP_EXTENSIONS = {
+    ".pdf", ".zip", ".gz", ".tar", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico",
+    ".mp3", ".mp4", ".webm", ".avi", ".css", ".js", ".json", ".xml", ".csv", ".xlsx", ".docx", ".exe", ".dmg",
+}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_TOKEN = re.compile(r"<[a-z0-9]+|[\w-]+")
+
+
+def normalize_url(url: str, base: str = None) -> Optional[str]:
+    """Canonical form of `url` (resolved against `base`), or None for non-HTTP links."""
+    url = (url or "").strip()
+    if not url:
+        return None
+    if base:
+        url = urljoin(base, url)
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+    netloc = host if port in (None, _DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TRACKING_PARAMS.match(k)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def same_origin(a: str, b: str) -> bool:
+    pa, pb = urlsplit(a), urlsplit(b)
+    return (pa.scheme, pa.netloc) == (pb.scheme, pb.netloc)
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.base: Optional[str] = None
+        self.hrefs: List[str] = []
+        self.title_parts: List[str] = []
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "base" and attrs.get("href") and self.base is None:
+            self.base = attrs["href"]
+        elif tag in ("a", "area") and attrs.get("href") and "download" not in attrs:
+            if "nofollow" not in (attrs.get("rel") or "").lower():
+                self.hrefs.append(attrs["href"])
+        elif tag == "title":
+            self._in_title = True
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title_parts.append(data)
+
+
+def parse_page(html: str, page_url: str) -> tuple:
+    """Returns (title, links): the page title and its same-origin page links, normalized, in order."""
+    parser = _LinkParser()
+    parser.feed(html or "")
+    parser.close()
+    base = urljoin(page_url, parser.base) if parser.base else page_url
+    links, seen = [], set()
+    for href in parser.hrefs:
+        url = normalize_url(href, base)
+        if not url or url in seen or not same_origin(url, page_url):
+            continue
+        path = urlsplit(url).path.lower()
+        if any(path.endswith(ext) for ext in SKIP_EXTENSIONS):
+            continue
+        seen.add(url)
+        links.append(url)
+    title = " ".join("".join(parser.title_parts).split())
+    return title, links
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """64-bit SimHash over token shingles (tags and words); similar pages differ in few bits."""
+    tokens = _TOKEN.findall(text.lower())
+    if len(tokens) < shingle:
+        tokens = tokens + [""] * (shingle - len(tokens))
+    weights = [0] * 64
+    for i in range(len(tokens) - shingle + 1):
+        digest = hashlib.blake2b(" ".join(tokens[i:i + shingle]).encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+@dataclass
+class CrawledPage:
+    url: str
+    depth: int
+    title: str = ""
+    clean_dom: str = ""
+    fingerprint: int = 0
+    links: List[str] = field(default_factory=list)  # same-origin links found on the page
+    duplicate_of: Optional[str] = None  # url of the near-identical page crawled first
+    error: Optional[str] = None
+    summary: str = ""  # filled in by the explore phase
+
+    @property
+    def explored(self) -> bool:
+        return not self.error and not self.duplicate_of
+
+
+class SiteCrawler:
+    """Concurrent same-origin crawler on top of a BrowserManager's context pool."""
+
+    def __init__(self, browser, max_depth: int, max_pages: int, concurrency: int, duplicate_distance: int = 3,
+                 clean: Callable[[str], str] = None):
+        self.browser = browser
+        self.max_depth = max(0, max_depth)
+        self.max_pages = max(1, max_pages)
+        self.concurrency = max(1, concurrency)
+        self.duplicate_distance = duplicate_distance
+        self.clean = clean or DOMCleaner.clean_dom
+
+    async def crawl(self, start_url: str, start_html: str = None,
+                    on_page: Callable[[CrawledPage], None] = None) -> List[CrawledPage]:
+        """
+        Crawls from `start_url` (whose HTML may be passed in to skip fetching it again) and
+        returns the pages in discovery order. `on_page` is called as each explored page
+        arrives, so callers can start working on it while the crawl continues.
+        """
+        started = time.perf_counter()
+        start_url = normalize_url(start_url) or start_url
+        pages: Dict[str, CrawledPage] = {}
+        order: List[str] = []
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def schedule(url: str, depth: int):
+            if url not in pages and len(pages) < self.max_pages:
+                pages[url] = CrawledPage(url=url, depth=depth)
+                order.append(url)
+                queue.put_nowait(pages[url])
+
+        async def visit(page: CrawledPage):
+            html = start_html if page.url == start_url and start_html is not None else None
+            if html is None:
+                async with self.browser.lease() as tab:
+                    readiness = await self.browser.navigate(page.url, page=tab)
+                    if readiness.reason == "error":
+                        page.error = readiness.error or "navigation failed"
+                        return
+                    html = await self.browser.get_content(page=tab)
+            page.title, page.links = parse_page(html, page.url)
+            page.clean_dom = self.clean(html)
+            page.fingerprint = simhash(page.clean_dom)
+            for other in pages.values():
+                if other is not page and other.explored and other.clean_dom \
+                        and hamming(other.fingerprint, page.fingerprint) <= self.duplicate_distance:
+                    page.duplicate_of = other.url
+                    return
+            if on_page:
+                on_page(page)
+            if page.depth < self.max_depth:
+                for link in page.links:
+                    schedule(link, page.depth + 1)
+
+        async def worker():
+            while True:
+                page = await queue.get()
+                try:
+                    await visit(page)
+                except Exception as e:
+                    page.error = f"{type(e).__name__}: {e}"
+                finally:
+                    status = "error" if page.error else "duplicate" if page.duplicate_of else "explored"
+                    REGISTRY.inc("qa_agent_crawl_pages_total", status=status)
+                    queue.task_done()
+
+        schedule(start_url, 0)
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        result = [pages[url] for url in order]
+        logger.info(f"Crawled {len(result)} page(s) from {start_url} in {time.perf_counter() - started:.2f}s "
+                    f"({sum(p.explored for p in result)} explored, {sum(bool(p.duplicate_of) for p in result)} "
+                    f"near-duplicate, {sum(bool(p.error) for p in result)} failed)")
+        return result
+
+
+def format_site_map(pages: List[CrawledPage]) -> str:
+    """
+    Compact site map for the design prompt: one line per page with its id, path, depth,
+    title and outgoing links (as ids), followed by its summary. Duplicates and failed
+    pages are listed on one line so the model knows they exist.
+    """
+    if not pages:
+        return ""
+    ids = {page.url: f"P{i}" for i, page in enumerate(pages, 1)}
+    origin = "{0.scheme}://{0.netloc}".format(urlsplit(pages[0].url))
+    lines = [f"Site map of {origin} ({len(pages)} pages):"]
+    for page in pages:
+        parts = urlsplit(page.url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        head = f"[{ids[page.url]}] {path} (depth {page.depth})"
+        if page.title:
+            head += f' "{page.title}"'
+        if page.duplicate_of:
+            lines.append(f"{head} - same layout as {ids[page.duplicate_of]}")
+            continue
+        if page.error:
+            lines.append(f"{head} - not loaded")
+            continue
+        targets = [ids[url] for url in page.links if url in ids and url != page.url]
+        if targets:
+            head += " -> " + ", ".join(targets)
+        lines.append(head)
+        if page.summary:
+            lines.extend(f"    {line}" for line in page.summary.strip().splitlines() if line.strip())
+    return "\n".join(lines)
@@ -1,29 +1,66 @@
 from bs4 import BeautifulSoup, Comment
 import re
+from app.engine.stream_cleaner import StreamingDOMCleaner
+from app.engine.dom_compactor import DOMCompactor
+from app.core.profiling import profiled
 
 class DOMCleaner:
     """
     Cleaning logic to produce a token-efficient, structural representation of the page.
     """
-    
+
     ALLOWED_ATTRS = {
-        'id', 'name', 'class', 'type', 'placeholder', 'aria-label', 
-        'role', 'href', 'title', 'value', 'data-test', 'data-testid', 
+        'id', 'name', 'class', 'type', 'placeholder', 'aria-label',
+        'role', 'href', 'title', 'value', 'data-test', 'data-testid',
         'alt', 'for'
     }
 
+    REMOVE_TAGS = {
+        "script", "style", "noscript", "meta", "head", "svg", "path",
+        "link", "iframe", "img", "video"
+    }
+
     @staticmethod
-    def clean_dom(html_content: str, max_tokens: int = 8000) -> str:
+    @profiled("dom.clean", "dom")
+    def clean_dom(html_content: str, max_tokens: int = 8000, engine: str = "stream",
+                  mode: str = "truncate") -> str:
         """
         Parses HTML, removes noise, and returns a simplified HTML string.
+
+        engine="stream" uses the single-pass StreamingDOMCleaner (default);
+        engine="soup" uses the original multi-pass BeautifulSoup pipeline.
+        mode="truncate" cuts the page at the budget (default);
+        mode="compact" keeps interactive elements first (see DOMCompactor).
         """
         if not html_content:
             return ""
 
+        # Coarse cut on characters (1 token approx 4 chars); nodes fit the prompt to the
+        # exact token budget afterwards (app.core.tokens.fit_prompt)
+        limit = max_tokens * 4
+
+        if mode == "compact":
+            return DOMCompactor.compact(
+                html_content, DOMCleaner.ALLOWED_ATTRS, DOMCleaner.REMOVE_TAGS, limit
+            )
+        if mode != "truncate":
+            raise ValueError(f"Unknown DOM cleaner mode: {mode}")
+
+        if engine == "stream":
+            return StreamingDOMCleaner.clean_text(
+                html_content, DOMCleaner.ALLOWED_ATTRS, DOMCleaner.REMOVE_TAGS, limit
+            )
+        if engine == "soup":
+            return DOMCleaner._clean_dom_soup(html_content, limit)
+        raise ValueError(f"Unknown DOM cleaner engine: {engine}")
+
+    @staticmethod
+    def _clean_dom_soup(html_content: str, limit: int) -> str:
+        """Original BeautifulSoup pipeline, kept as the reference implementation."""
         soup = BeautifulSoup(html_content, 'html.parser')
 
         # 1. Remove specific noisy tags completely
-        for tag in soup(["script", "style", "noscript", "meta", "head", "svg", "path", "link", "iframe", "img", "video"]):
+        for tag in soup(list(DOMCleaner.REMOVE_TAGS)):
             tag.decompose()
 
         # 2. Remove comments
@@ -36,21 +73,19 @@ class DOMCleaner:
             tag.attrs = {k: v for k, v in current_attrs.items() if k in DOMCleaner.ALLOWED_ATTRS}
 
         cleaned_html = str(soup)
-        
+
         # 4. Collapse Whitespace
         cleaned_html = re.sub(r'\n\s*\n', '\n', cleaned_html)
         cleaned_html = re.sub(r'\s+', ' ', cleaned_html)
-        
+
         # 5. Safety Truncation
-        # Limit roughly based on char count (1 token approx 4 chars)
-        limit = max_tokens * 4
         if len(cleaned_html) > limit:
             cleaned_html = cleaned_html[:limit]
-            
+
             # Basic repair: remove incomplete tag at the end
             last_open = cleaned_html.rfind('<')
             last_close = cleaned_html.rfind('>')
             if last_open > last_close:
                 cleaned_html = cleaned_html[:last_open]
 
-        return cleaned_html
\ No newline at end of file
+        return cleaned_html
@@ -0,0 +1,289 @@
+import re
+import sys
+from typing import Dict, List, Optional, Set, Union
+
+from app.engine.stream_cleaner import StreamingDOMCleaner, _WHITESPACE
+
+# Priority of an element by what it contributes to test generation
+INTERACTIVE_PRIORITY = 5   # form controls and anything with a test id
+NAVIGATION_PRIORITY = 4    # links, labels, ARIA roles
+HEADING_PRIORITY = 3       # headings give the LLM the page outline
+TEXT_PRIORITY = 1          # any other element with visible text
+
+_CONTROL_TAGS = {'input', 'button', 'select', 'textarea', 'form'}
+_NAVIGATION_TAGS = {'a', 'label', 'option'}
+_HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'legend', 'th', 'caption'}
+# Interactive elements whose descendants carry their visible name
+_SUBTREE_TAGS = {'a', 'button', 'label', 'option', 'select', 'textarea'}
+_SUBTREE_MAX_CHARS = 400
+
+# Sibling runs shorter than this, or made of tiny items (menus), are kept as-is
+MIN_REPEAT = 3
+MIN_REPEAT_ITEM_CHARS = 80
+
+_CLASS_ATTR = re.compile(r' class=["\']([^"\']*)["\']')
+# Attributes that identify an element to a test; siblings differing in them are never merged
+_IDENTITY_ATTRS = re.compile(r' (data-testid|data-test|name|id|href)=["\']([^"\']*)["\']')
+
+
+class DOMNode:
+    """Element of the light tree built by DOMTreeBuilder (text children are escaped strings)."""
+    __slots__ = ('tag', 'attrs', 'parent', 'children', 'void', 'index',
+                 'priority', 'repeat', 'mode')
+
+    def __init__(self, tag: Optional[str], attrs: str, parent: Optional["DOMNode"], void: bool = False):
+        self.tag = tag
+        self.attrs = attrs
+        self.parent = parent
+        self.children: List[Union["DOMNode", str]] = []
+        self.void = void
+        self.index = 0
+        self.priority = 0
+        self.repeat = 0
+        # None = dropped, "path" = tags only, "full" = tags and text
+        self.mode: Optional[str] = None
+
+    def open_markup(self) -> str:
+        if self.void:
+            return f"<{self.tag}{self.attrs}/>"
+        return f"<{self.tag}{self.attrs}>"
+
+    def close_markup(self) -> str:
+        return "" if self.void else f"</{self.tag}>"
+
+    def repeat_markup(self) -> str:
+        if not self.repeat:
+            return ""
+        match = _CLASS_ATTR.search(self.attrs)
+        selector = self.tag + ("." + ".".join(match.group(1).split()) if match else "")
+        return f"<!-- +{self.repeat} similar {selector} -->"
+
+    def tag_cost(self) -> int:
+        return len(self.open_markup()) + len(self.close_markup()) + len(self.repeat_markup())
+
+    def text_cost(self) -> int:
+        return sum(len(child) for child in self.children if isinstance(child, str))
+
+
+class DOMTreeBuilder(StreamingDOMCleaner):
+    """Runs the streaming cleaner rules but builds a light tree instead of a string."""
+
+    def __init__(self, allowed_attrs: Set[str], remove_tags: Set[str]):
+        super().__init__(allowed_attrs, remove_tags, sys.maxsize)
+        self.root = DOMNode(None, "", None)
+        self._current = self.root
+
+    def _on_open(self, tag: str, attrs: str):
+        node = DOMNode(tag, attrs, self._current)
+        self._current.children.append(node)
+        self._current = node
+
+    def _on_close(self, tag: str):
+        if self._current.parent is not None:
+            self._current = self._current.parent
+
+    def _on_void(self, tag: str, attrs: str):
+        self._current.children.append(DOMNode(tag, attrs, self._current, void=True))
+
+    def _on_text(self, text: str):
+        text = _WHITESPACE.sub(' ', self._escape(text))
+        children = self._current.children
+        if children and isinstance(children[-1], str):
+            children[-1] = _WHITESPACE.sub(' ', children[-1] + text)
+        else:
+            children.append(text)
+
+    def _on_markup(self, markup: str):
+        # Doctype / processing instructions carry no test-relevant content
+        pass
+
+
+class DOMCompactor:
+    """
+    Priority-aware compaction: instead of cutting the cleaned page at the budget,
+    keeps interactive elements (and their ancestor paths) first, collapses repeated
+    sibling structures such as product grids into one example plus a count (only
+    when the page is over budget, and never across differing test ids, names, ids
+    or links), and fills the remaining budget with headings and text by priority.
+    """
+
+    @staticmethod
+    def compact(html_content: str, allowed_attrs: Set[str], remove_tags: Set[str], max_chars: int) -> str:
+        builder = DOMTreeBuilder(allowed_attrs, remove_tags)
+        size = StreamingDOMCleaner.CHUNK_SIZE
+        builder.clean(html_content[i:i + size] for i in range(0, len(html_content), size))
+
+        nodes = DOMCompactor._index(builder.root)
+        DOMCompactor._collapse_repeats(nodes, max_chars)
+        nodes = DOMCompactor._index(builder.root)
+        DOMCompactor._select(nodes, max_chars)
+        return DOMCompactor._serialize(builder.root, max_chars)
+
+    # --- Tree passes (iterative: malformed pages can nest thousands deep) ---
+
+    @staticmethod
+    def _index(root: DOMNode) -> List[DOMNode]:
+        """Returns elements in document order and assigns index and priority."""
+        nodes = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.tag is not None:
+                node.index = len(nodes)
+                node.priority = DOMCompactor._priority(node)
+                nodes.append(node)
+            stack.extend(reversed([c for c in node.children if isinstance(c, DOMNode)]))
+        return nodes
+
+    @staticmethod
+    def _priority(node: DOMNode) -> int:
+        attrs = node.attrs
+        if node.tag in _CONTROL_TAGS or ' data-testid=' in attrs or ' data-test=' in attrs:
+            return INTERACTIVE_PRIORITY
+        if node.tag in _NAVIGATION_TAGS or ' role=' in attrs:
+            return NAVIGATION_PRIORITY
+        if node.tag in _HEADING_TAGS:
+            return HEADING_PRIORITY
+        if any(isinstance(c, str) and c.strip() for c in node.children):
+            return TEXT_PRIORITY
+        return 0
+
+    @staticmethod
+    def _collapse_repeats(nodes: List[DOMNode], max_chars: int):
+        """
+        Replaces runs of structurally identical siblings with the first one plus a count,
+        unless the whole page fits in `max_chars`. Identifying attribute values are part
+        of the signature, so distinct form fields or navigation links are never merged.
+        """
+        signatures: Dict[int, int] = {}
+        sizes: Dict[int, int] = {}
+        # Reverse document order visits children before their parents
+        for node in reversed(nodes):
+            children = [c for c in node.children if isinstance(c, DOMNode)]
+            match = _CLASS_ATTR.search(node.attrs)
+            signatures[id(node)] = hash((
+                node.tag, match.group(1) if match else None, tuple(_IDENTITY_ATTRS.findall(node.attrs)),
+                tuple(signatures[id(c)] for c in children)
+            ))
+            sizes[id(node)] = node.tag_cost() + node.text_cost() + sum(sizes[id(c)] for c in children)
+
+        if sum(sizes[id(n)] for n in nodes if n.parent is not None and n.parent.tag is None) <= max_chars:
+            return
+
+        for node in nodes:
+            children = node.children
+            kept: List[Union[DOMNode, str]] = []
+            i = 0
+            while i < len(children):
+                child = children[i]
+                if isinstance(child, str):
+                    kept.append(child)
+                    i += 1
+                    continue
+
+                # Extend the run over identical siblings, skipping whitespace between them
+                signature = signatures[id(child)]
+                members = 1
+                last = i
+                j = i + 1
+                while j < len(children):
+                    sibling = children[j]
+                    if isinstance(sibling, str):
+                        if sibling.strip():
+                            break
+                    elif signatures[id(sibling)] == signature:
+                        members += 1
+                        last = j
+                    else:
+                        break
+                    j += 1
+
+                if members >= MIN_REPEAT and sizes[id(child)] >= MIN_REPEAT_ITEM_CHARS:
+                    child.repeat = members - 1
+                    kept.append(child)
+                else:
+                    kept.extend(children[i:last + 1])
+                i = last + 1
+            node.children = kept
+
+    @staticmethod
+    def _select(nodes: List[DOMNode], max_chars: int):
+        used = 0
+
+        def add(node: DOMNode, full: bool) -> bool:
+            nonlocal used
+            cost = 0
+            if node.mode is None:
+                cost += node.tag_cost()
+            if full and node.mode != "full":
+                cost += node.text_cost()
+            ancestor = node.parent
+            while ancestor is not None and ancestor.tag is not None and ancestor.mode is None:
+                cost += ancestor.tag_cost()
+                ancestor = ancestor.parent
+            if used + cost > max_chars:
+                return False
+
+            used += cost
+            if node.mode != "full":
+                node.mode = "full" if full else "path"
+            ancestor = node.parent
+            while ancestor is not None and ancestor.tag is not None and ancestor.mode is None:
+                ancestor.mode = "path"
+                ancestor = ancestor.parent
+            return True
+
+        ranked = sorted(
+            (n for n in nodes if n.priority),
+            key=lambda n: (-n.priority, n.index)
+        )
+        for node in ranked:
+            if not add(node, full=True):
+                continue
+            if node.priority >= NAVIGATION_PRIORITY and node.tag in _SUBTREE_TAGS:
+                descendants = DOMCompactor._descendants(node)
+                subtree_cost = sum(
+                    (d.tag_cost() if d.mode is None else 0) + (d.text_cost() if d.mode != "full" else 0)
+                    for d in descendants
+                )
+                if subtree_cost <= _SUBTREE_MAX_CHARS and used + subtree_cost <= max_chars:
+                    for descendant in descendants:
+                        add(descendant, full=True)
+
+    @staticmethod
+    def _descendants(node: DOMNode) -> List[DOMNode]:
+        result = []
+        stack = [c for c in reversed(node.children) if isinstance(c, DOMNode)]
+        while stack:
+            current = stack.pop()
+            result.append(current)
+            stack.extend(c for c in reversed(current.children) if isinstance(c, DOMNode))
+        return result
+
+    @staticmethod
+    def _serialize(root: DOMNode, max_chars: int) -> str:
+        out: List[str] = []
+        # Stack entries are either nodes to open or closing markup strings
+        stack: List[Union[DOMNode, str]] = [c for c in reversed(root.children) if isinstance(c, DOMNode)]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                out.append(item)
+                continue
+            if item.mode is None:
+                continue
+            out.append(item.open_markup())
+            stack.append(item.close_markup() + item.repeat_markup())
+            for child in reversed(item.children):
+                if isinstance(child, DOMNode):
+                    stack.append(child)
+                elif item.mode == "full":
+                    stack.append(child)
+
+        compacted = _WHITESPACE.sub(' ', "".join(out)).strip()
+        if len(compacted) > max_chars:
+            compacted = compacted[:max_chars]
+            last_open = compacted.rfind('<')
+            if last_open > compacted.rfind('>'):
+                compacted = compacted[:last_open]
+        return compacted
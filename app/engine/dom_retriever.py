@@ -0,0 +1,190 @@
+import math
+import re
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import List, Tuple, Union
+
+from app.core.cache import make_key
+from app.engine.dom_compactor import DOMNode, DOMTreeBuilder, _CLASS_ATTR
+from app.engine.stream_cleaner import _WHITESPACE
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_CAMEL = re.compile(r"([a-z])([A-Z])")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "with", "verify", "check", "test",
+    "should", "user", "page", "div", "span", "class", "id"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric terms; camelCase, kebab-case and snake_case are split."""
+    text = _CAMEL.sub(r"\1 \2", text).lower()
+    return [t for t in _TOKEN.findall(text) if t not in _STOPWORDS and len(t) > 1]
+
+
+@dataclass
+class DOMChunk:
+    """A structural slice of the cleaned DOM with the CSS-like path of its container."""
+    id: str
+    path: str
+    html: str
+
+
+class _CommentKeepingBuilder(DOMTreeBuilder):
+    """Keeps comments so compaction markers ("+N similar ...") survive chunking."""
+
+    def handle_comment(self, data):
+        if not self._skip_depth:
+            self._current.children.append(f"<!--{data}-->")
+
+
+def _markup(node: DOMNode) -> str:
+    out: List[str] = []
+    stack: List[Union[DOMNode, str]] = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            out.append(item)
+            continue
+        out.append(item.open_markup())
+        stack.append(item.close_markup() + item.repeat_markup())
+        stack.extend(reversed(item.children))
+    return "".join(out)
+
+
+def _label(node: DOMNode) -> str:
+    label = node.tag
+    match = re.search(r' id=["\']([^"\']*)["\']', node.attrs)
+    if match:
+        return f"{label}#{match.group(1)}"
+    match = _CLASS_ATTR.search(node.attrs)
+    if match and match.group(1).strip():
+        label += "." + match.group(1).split()[0]
+    return label
+
+
+def chunk_dom(clean_dom: str, max_chunk_chars: int = 1200) -> List[DOMChunk]:
+    """
+    Splits cleaned HTML into structural chunks: a subtree that fits in `max_chunk_chars`
+    becomes one chunk, larger ones are split into their children, and consecutive small
+    siblings are grouped together up to the size limit.
+    """
+    from app.engine.dom_cleaner import DOMCleaner  # avoid a circular import at module load
+
+    builder = _CommentKeepingBuilder(DOMCleaner.ALLOWED_ATTRS, DOMCleaner.REMOVE_TAGS)
+    builder.clean([clean_dom])
+
+    chunks = _split(builder.root, "/", max_chunk_chars)
+    for index, chunk in enumerate(chunks):
+        chunk.id = f"c{index}"
+    return chunks
+
+
+def _split(node: DOMNode, path: str, max_chunk_chars: int) -> List[DOMChunk]:
+    """Depth-first split of an oversized subtree (iterative, preserving document order)."""
+    result: List[DOMChunk] = []
+    # Work items: either a node to split or a finished chunk
+    stack: List[Union[Tuple[DOMNode, str], DOMChunk]] = [(node, path)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, DOMChunk):
+            result.append(item)
+            continue
+        current, current_path = item
+        items: List[Union[Tuple[DOMNode, str], DOMChunk]] = []
+        group: List[str] = []
+        group_size = 0
+
+        def flush():
+            nonlocal group, group_size
+            html = _WHITESPACE.sub(' ', "".join(group)).strip()
+            if html:
+                items.append(DOMChunk(id="", path=current_path, html=html))
+            group, group_size = [], 0
+
+        for child in current.children:
+            markup = child if isinstance(child, str) else _markup(child)
+            if len(markup) > max_chunk_chars and isinstance(child, DOMNode) and child.children:
+                flush()
+                child_path = _label(child) if current_path == "/" else f"{current_path} > {_label(child)}"
+                items.append((child, child_path))
+                continue
+            if group_size + len(markup) > max_chunk_chars:
+                flush()
+            group.append(markup)
+            group_size += len(markup)
+        flush()
+        stack.extend(reversed(items))
+    return result
+
+
+class DOMIndex:
+    """BM25 index over the chunks of one cleaned DOM."""
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, chunks: List[DOMChunk]):
+        self.chunks = chunks
+        self._terms = [Counter(tokenize(f"{c.path} {c.html}")) for c in chunks]
+        self._lengths = [sum(t.values()) for t in self._terms]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if chunks else 0.0
+        document_frequency: Counter = Counter()
+        for terms in self._terms:
+            document_frequency.update(terms.keys())
+        n = len(chunks)
+        self._idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        query_terms = set(tokenize(query))
+        scores = []
+        for terms, length in zip(self._terms, self._lengths):
+            score = 0.0
+            norm = self.K1 * (1 - self.B + self.B * length / (self._avg_length or 1))
+            for term in query_terms:
+                tf = terms.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.K1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+    def select(self, query: str, budget_chars: int) -> List[DOMChunk]:
+        """Highest-ranked chunks that fit in `budget_chars`, returned in document order."""
+        scores = self.scores(query)
+        ranked = sorted(range(len(self.chunks)), key=lambda i: (-scores[i], i))
+        chosen, used = [], 0
+        for i in ranked:
+            if scores[i] <= 0 and chosen:
+                break
+            size = len(self.chunks[i].html)
+            if used + size <= budget_chars:
+                chosen.append(i)
+                used += size
+        return [self.chunks[i] for i in sorted(chosen)]
+
+
+_indexes: "OrderedDict[str, DOMIndex]" = OrderedDict()
+_MAX_INDEXES = 32
+
+
+def get_dom_index(clean_dom: str, max_chunk_chars: int = 1200) -> DOMIndex:
+    """Returns the index for a cleaned DOM, building it once per distinct page."""
+    key = make_key(clean_dom, str(max_chunk_chars))
+    index = _indexes.get(key)
+    if index is None:
+        index = DOMIndex(chunk_dom(clean_dom, max_chunk_chars))
+        _indexes[key] = index
+        while len(_indexes) > _MAX_INDEXES:
+            _indexes.popitem(last=False)
+    else:
+        _indexes.move_to_end(key)
+    return index
+
+
+def format_chunks(chunks: List[DOMChunk]) -> str:
+    """Renders selected chunks for the prompt, each labelled with its id and path."""
+    return "\n".join(f"<!-- {c.id}: {c.path} -->\n{c.html}" for c in chunks)
@@ -0,0 +1,568 @@
+import asyncio
+import codecs
+import functools
+import itertools
+import json
+import os
+import re
+import signal
+import sys
+import tempfile
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+from config import Config
+
+try:  # POSIX only; the sandbox runs without rlimits elsewhere
+    import resource
+except ImportError:
+    resource = None
+
+# Root of the repository, so workers can import `app.*`
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+# Protocol lines carry one output line, already capped at Config.VERIFY_LINE_MAX_CHARS
+_STREAM_LIMIT = 1024 * 1024
+# Bytes read from a test's pipes at a time
+_READ_CHUNK = 64 * 1024
+# Lines read ahead of the consumer before the pipes are left to fill up
+_QUEUED_LINES = 256
+# Environment variable tagging every process a run starts (browsers included)
+_RUN_MARKER = "QA_AGENT_RUN_ID"
+# Output still read after the script exits (children may keep the pipes open)
+_DRAIN_SECONDS = 0.5
+
+
+def format_output(stdout: str, stderr: str) -> str:
+    """Combines captured streams the way verification logs have always looked."""
+    output = stdout or ""
+    if stderr:
+        output += "\nERROR:\n" + stderr
+    return output
+
+
+# (stream, line) pairs; stream is "stdout", "stderr" or "system" (executor notices)
+OutputLine = Tuple[str, str]
+
+
+@dataclass
+class ExecutionLimits:
+    """Limits for one generated test run; 0 disables a limit."""
+    wall_time: float = 0  # seconds, every mode
+    cpu_time: int = 0  # seconds of CPU per process (RLIMIT_CPU), "sandbox" mode
+    memory_mb: int = 0  # address space per process (RLIMIT_AS), "sandbox" mode
+
+    @classmethod
+    def from_config(cls, overrides: Optional[dict] = None) -> "ExecutionLimits":
+        """Config.TEST_* defaults, with per-run `overrides` (e.g. AgentState.execution_limits)."""
+        values = {"wall_time": Config.TEST_TIMEOUT, "cpu_time": Config.TEST_CPU_LIMIT,
+                  "memory_mb": Config.TEST_MEMORY_LIMIT_MB}
+        values.update({k: v for k, v in (overrides or {}).items() if k in values and v is not None})
+        return cls(**values)
+
+
+@dataclass
+class RunOutcome:
+    """How a run ended, filled in by the executors while streaming."""
+    status: str = "completed"  # completed | stopped | timeout | oom | crash
+    detail: str = ""
+    returncode: Optional[int] = None
+
+
+def _run_marker() -> str:
+    return uuid.uuid4().hex
+
+
+def _marked_pids(marker: str) -> List[int]:
+    """Processes whose environment carries `marker` (Linux /proc; empty elsewhere)."""
+    needle = f"{_RUN_MARKER}={marker}".encode()
+    pids = []
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return pids
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/environ", "rb") as f:
+                if needle in f.read().split(b"\0"):
+                    pids.append(int(entry))
+        except OSError:
+            continue
+    return pids
+
+
+def kill_process_tree(proc: asyncio.subprocess.Process, marker: Optional[str] = None):
+    """
+    SIGKILLs a run and everything it spawned: the process itself, its process group
+    (it is started in its own session on POSIX) and any process tagged with the run
+    `marker`, which also reaches browsers that moved to a session of their own.
+    """
+    if proc.returncode is None:
+        proc.kill()
+    if os.name == "posix":
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    for target in _marked_pids(marker) if marker else []:
+        try:
+            os.kill(target, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def _marked_env(marker: str) -> dict:
+    return {**os.environ, _RUN_MARKER: marker}
+
+
+def _apply_rlimits(limits: ExecutionLimits):
+    """Runs in the child before exec; limits are inherited by the browser it launches."""
+    if limits.cpu_time:
+        # SIGXCPU at the soft limit, SIGKILL a second later
+        resource.setrlimit(resource.RLIMIT_CPU, (int(limits.cpu_time), int(limits.cpu_time) + 1))
+    if limits.memory_mb:
+        size = int(limits.memory_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (size, size))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def classify_exit(returncode: Optional[int], limits: Optional[ExecutionLimits]) -> Tuple[str, str]:
+    """
+    Maps a subprocess exit code to (status, detail). Only SIGXCPU (sent by the kernel at
+    the RLIMIT_CPU soft limit) counts as a CPU timeout; any other SIGKILL is most likely
+    the kernel OOM killer, whether or not a CPU limit was set.
+    """
+    if returncode is None or returncode >= 0:
+        return "completed", ""
+    sig = -returncode
+    if sig == getattr(signal, "SIGXCPU", None):
+        return "timeout", f"CPU time limit ({limits.cpu_time if limits and limits.cpu_time else '?'}s) exceeded"
+    if sig == signal.SIGKILL:
+        return "oom", "killed by SIGKILL (likely out of memory)"
+    try:
+        name = signal.Signals(sig).name
+    except ValueError:
+        name = str(sig)
+    return "crash", f"terminated by signal {name}"
+
+
+class LogBuffer:
+    """
+    Collects streamed output into the `format_output` layout with bounded memory:
+    per stream, the first and last `max_chars / 2` characters are kept and the
+    middle is replaced by a "[... N lines omitted ...]" marker.
+    """
+
+    def __init__(self, max_chars: int = None):
+        self.max_chars = max_chars or Config.VERIFY_LOG_MAX_CHARS
+        self._streams = {"stdout": _CappedLines(self.max_chars), "stderr": _CappedLines(self.max_chars)}
+
+    def add(self, stream: str, line: str):
+        self._streams["stdout" if stream == "stdout" else "stderr"].add(line)
+
+    def text(self) -> str:
+        return format_output(self._streams["stdout"].text(), self._streams["stderr"].text())
+
+
+class _CappedLines:
+    def __init__(self, max_chars: int):
+        self.budget = max_chars // 2
+        self.head: List[str] = []
+        self.head_size = 0
+        self.tail: deque = deque()
+        self.tail_size = 0
+        self.omitted = 0
+
+    def add(self, line: str):
+        if self.head_size + len(line) <= self.budget and not self.tail:
+            self.head.append(line)
+            self.head_size += len(line) + 1
+            return
+        self.tail.append(line)
+        self.tail_size += len(line) + 1
+        while self.tail_size > self.budget and len(self.tail) > 1:
+            self.tail_size -= len(self.tail.popleft()) + 1
+            self.omitted += 1
+
+    def text(self) -> str:
+        lines = self.head + ([f"[... {self.omitted} lines omitted ...]"] if self.omitted else []) + list(self.tail)
+        return "".join(line + "\n" for line in lines)
+
+
+def compile_stop_rules(patterns: Sequence[str] = None) -> List[re.Pattern]:
+    return [re.compile(p) for p in (Config.VERIFY_STOP_PATTERNS if patterns is None else patterns)]
+
+
+def _note_truncation(line: str, dropped: int) -> str:
+    return line + f" [... {dropped} chars truncated]" if dropped else line
+
+
+async def read_lines(reader: asyncio.StreamReader, max_line: int = None) -> AsyncIterator[str]:
+    """
+    Yields the lines of `reader` as they arrive, without line endings. Each line is cut to
+    `max_line` characters (default: Config.VERIFY_LINE_MAX_CHARS) while it is read, so a
+    script printing one huge line never has more than that buffered.
+    """
+    max_line = max_line or Config.VERIFY_LINE_MAX_CHARS
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    head, dropped = "", 0
+    while True:
+        chunk = await reader.read(_READ_CHUNK)
+        text = decoder.decode(chunk, final=not chunk)
+        start = 0
+        while True:
+            end = text.find("\n", start)
+            piece = text[start:] if end < 0 else text[start:end]
+            room = max(0, max_line - len(head))
+            head += piece[:room]
+            dropped += max(0, len(piece) - room)
+            if end < 0:
+                break
+            yield _note_truncation(head.rstrip("\r"), dropped)
+            head, dropped = "", 0
+            start = end + 1
+        if not chunk:
+            if head or dropped:
+                yield _note_truncation(head, dropped)
+            return
+
+
+async def stream_output(source: AsyncIterator[OutputLine], rules: Sequence[re.Pattern] = None,
+                        grace: float = None, wall_time: float = None,
+                        outcome: RunOutcome = None) -> AsyncIterator[OutputLine]:
+    """
+    Relays (stream, line) pairs from a running test with early termination.
+
+    Once a line matches one of the stop `rules` (default: Config.VERIFY_STOP_PATTERNS),
+    output is still read for `grace` seconds (so the error details arrive), then the
+    source is closed, which kills the run, and a ("system", notice) line is yielded.
+    A run still going after `wall_time` seconds is killed the same way. `outcome` is
+    updated to "stopped" / "timeout" (or "oom" when the script died of a MemoryError).
+    Sources cap each line at Config.VERIFY_LINE_MAX_CHARS as it is read.
+    """
+    rules = compile_stop_rules() if rules is None else rules
+    grace = Config.VERIFY_STOP_GRACE if grace is None else grace
+    outcome = outcome if outcome is not None else RunOutcome()
+    loop = asyncio.get_running_loop()
+    hard_deadline = loop.time() + wall_time if wall_time else None
+    iterator = source.__aiter__()
+    deadline = reason = None
+    memory_error = False
+    try:
+        while True:
+            pending = [d for d in (deadline, hard_deadline) if d is not None]
+            timeout = max(0.0, min(pending) - loop.time()) if pending else None
+            try:
+                stream, line = await asyncio.wait_for(iterator.__anext__(), timeout)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                if deadline is not None and (hard_deadline is None or deadline <= hard_deadline):
+                    outcome.status, outcome.detail = "stopped", f"matched {reason!r}"
+                    yield "system", f"[verification stopped early: matched {reason!r}]"
+                else:
+                    outcome.status, outcome.detail = "timeout", f"wall-clock limit ({wall_time}s) exceeded"
+                    yield "system", f"[verification timed out: {outcome.detail}]"
+                break
+            yield stream, line
+            memory_error = memory_error or line.startswith("MemoryError")
+            if deadline is None:
+                match = next((rule.pattern for rule in rules if rule.search(line)), None)
+                if match:
+                    reason, deadline = match, loop.time() + grace
+                    logger.info(f"Verification stop rule {match!r} matched; stopping in {grace}s")
+    finally:
+        await iterator.aclose()
+    if outcome.status == "completed" and memory_error:
+        outcome.status, outcome.detail = "oom", "MemoryError (address-space limit)"
+
+
+async def collect_output(source: AsyncIterator[OutputLine], max_chars: int = None) -> str:
+    buffer = LogBuffer(max_chars)
+    async for stream, line in source:
+        buffer.add(stream, line)
+    return buffer.text()
+
+
+class WorkerCrashed(Exception):
+    """The worker process died or broke the protocol while running a job."""
+
+
+class _WorkerProcess:
+    """Parent-side handle for one `app.engine.executor_worker` process."""
+
+    def __init__(self, proc: asyncio.subprocess.Process, marker: str):
+        self.proc = proc
+        self.marker = marker  # tags the worker's browser processes too
+        self.runs = 0
+        self.result: Optional[dict] = None  # final message of the last job
+
+    @classmethod
+    async def spawn(cls, headless: bool) -> "_WorkerProcess":
+        args = [sys.executable, "-m", "app.engine.executor_worker"]
+        if headless:
+            args.append("--headless")
+        marker = _run_marker()
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            cwd=_PROJECT_ROOT,
+            env=_marked_env(marker),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=_STREAM_LIMIT,
+            start_new_session=os.name == "posix"
+        )
+        worker = cls(proc, marker)
+        hello = await worker._read()
+        if not hello.get("browser"):
+            logger.warning("Test worker started without a warm browser; it will launch on first use.")
+        return worker
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.returncode is None
+
+    async def _read(self) -> dict:
+        line = await self.proc.stdout.readline()
+        if not line:
+            raise WorkerCrashed(f"worker exited with code {await self.proc.wait()}")
+        return json.loads(line)
+
+    async def stream(self, job_id: int, code: str) -> AsyncIterator[OutputLine]:
+        """
+        Runs one job, yielding its output lines as the worker prints them. The final
+        result message is left in `self.result`. Closing the generator before the job
+        finishes kills the worker (it is replaced by the pool).
+        """
+        self.runs += 1
+        self.result = None
+        job = {"id": job_id, "code": code, "max_line": Config.VERIFY_LINE_MAX_CHARS}
+        self.proc.stdin.write((json.dumps(job) + "\n").encode("utf-8"))
+        await self.proc.stdin.drain()
+        try:
+            while True:
+                message = await self._read()
+                if message.get("id") != job_id:
+                    raise WorkerCrashed("worker protocol out of sync")
+                if "line" not in message:
+                    self.result = message
+                    return
+                yield message["stream"], message["line"]
+        finally:
+            if self.result is None and self.alive:
+                self.kill()
+
+    def kill(self):
+        """Kills the worker together with its browser."""
+        kill_process_tree(self.proc, self.marker)
+
+    async def stop(self):
+        if not self.alive:
+            return
+        try:
+            self.proc.stdin.close()
+            await asyncio.wait_for(self.proc.wait(), 5)
+        except Exception:
+            self.kill()
+            await self.proc.wait()
+
+
+class TestWorkerPool:
+    """
+    Pool of long-lived worker processes with Playwright imported and Chromium launched.
+
+    Each `stream()` (or `run()`) borrows an idle worker (spawning one if fewer than
+    `size` exist), executes the code in a fresh namespace and browser context, and
+    streams (or returns) the output. Workers are replaced after `max_runs` jobs, when
+    they crash, or when a job is abandoned before it finished.
+    """
+
+    __test__ = False  # not a pytest test class
+
+    def __init__(self, size: int = None, max_runs: int = None, headless: bool = None):
+        self.size = size or Config.TEST_WORKERS
+        self.max_runs = max_runs or Config.TEST_WORKER_MAX_RUNS
+        self.headless = Config.HEADLESS if headless is None else headless
+        self._idle: List[_WorkerProcess] = []
+        self._count = 0
+        self._available: Optional[asyncio.Condition] = None
+        self._job_ids = itertools.count(1)
+
+    def _condition(self) -> asyncio.Condition:
+        if self._available is None:
+            self._available = asyncio.Condition()
+        return self._available
+
+    async def _acquire(self) -> _WorkerProcess:
+        condition = self._condition()
+        async with condition:
+            while not self._idle and self._count >= self.size:
+                await condition.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._count += 1
+        try:
+            return await _WorkerProcess.spawn(self.headless)
+        except BaseException:
+            await self._forget()
+            raise
+
+    async def _forget(self):
+        condition = self._condition()
+        async with condition:
+            self._count -= 1
+            condition.notify()
+
+    async def _release(self, worker: _WorkerProcess, recycle: bool):
+        if recycle or not worker.alive or worker.runs >= self.max_runs:
+            await worker.stop()
+            await self._forget()
+            return
+        condition = self._condition()
+        async with condition:
+            self._idle.append(worker)
+            condition.notify()
+
+    async def stream(self, code: str, outcome: RunOutcome = None) -> AsyncIterator[OutputLine]:
+        """
+        Runs the code on a warm worker, yielding (stream, line) as output arrives.
+        A worker that dies mid-job marks `outcome` as "crash". Workers are shared, so
+        rlimits do not apply here; wall-clock limits come from `stream_output`.
+        """
+        worker = await self._acquire()
+        job = worker.stream(next(self._job_ids), code)
+        recycle = True
+        try:
+            async for item in job:
+                yield item
+            recycle = bool(worker.result.get("recycle"))
+        except WorkerCrashed as e:
+            if outcome is not None:
+                outcome.status, outcome.detail = "crash", str(e)
+                outcome.returncode = worker.proc.returncode
+            yield "stderr", f"Test worker crashed: {e}"
+        finally:
+            # Stopped before the job finished: the worker is killed and replaced
+            await job.aclose()
+            await self._release(worker, recycle)
+
+    async def run(self, code: str) -> str:
+        return await collect_output(self.stream(code))
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for worker in idle:
+            await worker.stop()
+            self._count -= 1
+
+
+async def _exit_status(proc: asyncio.subprocess.Process, interval: float = 0.05) -> int:
+    while proc.returncode is None:
+        await asyncio.sleep(interval)
+    return proc.returncode
+
+
+async def _discard(reader: asyncio.StreamReader):
+    while await reader.read(_READ_CHUNK):
+        pass
+
+
+async def stream_subprocess(code: str, limits: ExecutionLimits = None,
+                            outcome: RunOutcome = None) -> AsyncIterator[OutputLine]:
+    """
+    Runs the code in a fresh interpreter from a unique temporary file, yielding
+    stdout/stderr lines as they are printed.
+
+    The interpreter leads its own process group and every process it starts carries a
+    per-run environment marker; when the generator finishes or is closed the whole tree
+    is killed, including browsers the script left running. With `limits`, CPU time and
+    address space are capped via rlimits (POSIX) and the exit is classified into
+    `outcome` (timeout / oom / crash).
+    """
+    fd, filename = tempfile.mkstemp(prefix="generated_test_", suffix=".py")
+    marker = _run_marker()
+    preexec = None
+    if limits is not None and resource is not None and (limits.cpu_time or limits.memory_mb):
+        preexec = functools.partial(_apply_rlimits, limits)
+    proc = None
+    pumps = []
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(code)
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-u", filename,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=_marked_env(marker),
+            start_new_session=os.name == "posix",
+            preexec_fn=preexec
+        )
+        lines: asyncio.Queue = asyncio.Queue(_QUEUED_LINES)
+
+        async def pump(reader: asyncio.StreamReader, stream: str):
+            async for line in read_lines(reader):
+                await lines.put((stream, line))
+            await lines.put((stream, None))
+
+        pumps = [asyncio.create_task(pump(proc.stdout, "stdout")),
+                 asyncio.create_task(pump(proc.stderr, "stderr"))]
+        open_streams = len(pumps)
+        # proc.wait() only returns once the pipes close, so watch the exit status instead
+        exited = asyncio.ensure_future(_exit_status(proc))
+        drain_until = getter = None
+        loop = asyncio.get_running_loop()
+        try:
+            while open_streams:
+                if getter is None:
+                    getter = asyncio.ensure_future(lines.get())
+                if drain_until is None:
+                    await asyncio.wait([getter, exited], return_when=asyncio.FIRST_COMPLETED)
+                    if not getter.done():
+                        # The script exited; children may still hold the pipes open
+                        drain_until = loop.time() + _DRAIN_SECONDS
+                        continue
+                else:
+                    await asyncio.wait([getter], timeout=max(0.0, drain_until - loop.time()))
+                    if not getter.done():
+                        break
+                stream, line = getter.result()
+                getter = None
+                if line is None:
+                    open_streams -= 1
+                    continue
+                yield stream, line
+            await exited
+        finally:
+            exited.cancel()
+            if getter is not None:
+                getter.cancel()
+        if outcome is not None:
+            outcome.returncode = proc.returncode
+            status, detail = classify_exit(proc.returncode, limits)
+            if status != "completed":
+                outcome.status, outcome.detail = status, detail
+                yield "system", f"[test process {status}: {detail}]"
+    finally:
+        for task in pumps:
+            task.cancel()
+        if proc is not None:
+            # Also reaps browsers the script launched and never closed
+            kill_process_tree(proc, marker)
+            # A stopped script may have filled the pipes, leaving them paused short of EOF;
+            # proc.wait() would wait for that EOF, so drain them (bounded) and poll the exit
+            try:
+                await asyncio.wait_for(asyncio.gather(_discard(proc.stdout), _discard(proc.stderr)),
+                                       _DRAIN_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning("Test output pipes still open after the run was killed; not waiting for them")
+            await _exit_status(proc)
+        os.remove(filename)
+
+
+async def run_in_subprocess(code: str, limits: ExecutionLimits = None) -> str:
+    """Runs the code in a fresh interpreter and returns its combined output."""
+    return await collect_output(stream_subprocess(code, limits))
@@ -0,0 +1,251 @@
+"""
+Long-lived worker process for executing generated Playwright tests.
+
+Started by `TestWorkerPool` as `python -m app.engine.executor_worker [--headless]`.
+Playwright is imported and Chromium launched once; each job then runs the submitted
+code in a fresh namespace, with `async_playwright()` patched so that `chromium.launch()`
+hands out fresh contexts on the warm browser instead of starting a new one.
+
+Protocol: one JSON object per line. Jobs arrive on stdin as {"id", "code", "max_line"}.
+While a job runs, each line it prints is sent as {"id", "stream", "line"}, cut to
+`max_line` characters as it is written; the job ends with
+{"id", "duration", "recycle"}. All of it goes to the original stdout.
+File descriptor 1 is redirected to stderr so stray output (e.g. from Chromium) cannot
+corrupt the protocol stream.
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+
+import playwright.async_api as playwright_api
+
+_real_async_playwright = playwright_api.async_playwright
+
+
+class _BrowserShim:
+    """Stands in for a launched Browser; everything it creates is closed after the job."""
+
+    def __init__(self, browser):
+        self._browser = browser
+        self._contexts = []
+
+    async def new_context(self, **kwargs):
+        context = await self._browser.new_context(**kwargs)
+        self._contexts.append(context)
+        return context
+
+    async def new_page(self, **kwargs):
+        context = await self.new_context(**kwargs)
+        page = await context.new_page()
+        return page
+
+    @property
+    def contexts(self):
+        return list(self._contexts)
+
+    async def close(self, **kwargs):
+        contexts, self._contexts = self._contexts, []
+        for context in contexts:
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+
+class _ChromiumShim:
+    def __init__(self, worker):
+        self._worker = worker
+
+    async def launch(self, **kwargs):
+        browser = await self._worker.ensure_browser(**kwargs)
+        shim = _BrowserShim(browser)
+        self._worker.open_shims.append(shim)
+        return shim
+
+    def __getattr__(self, name):
+        return getattr(self._worker.playwright.chromium, name)
+
+
+class _PlaywrightShim:
+    """Replacement for the object returned by `async_playwright()`."""
+
+    def __init__(self, worker):
+        self._worker = worker
+        self.chromium = _ChromiumShim(worker)
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._worker.playwright, name)
+
+
+class _LineWriter(io.TextIOBase):
+    """Text stream that forwards each complete line (cut to `max_line` chars) as it is written."""
+
+    def __init__(self, send, stream: str, max_line: int):
+        self._send = send
+        self._stream = stream
+        self._max_line = max_line
+        self._pending = ""
+        self._dropped = 0  # characters of the current line beyond max_line
+
+    def writable(self):
+        return True
+
+    def write(self, text: str) -> int:
+        start = 0
+        while True:
+            end = text.find("\n", start)
+            piece = text[start:] if end < 0 else text[start:end]
+            room = max(0, self._max_line - len(self._pending))
+            self._pending += piece[:room]
+            self._dropped += max(0, len(piece) - room)
+            if end < 0:
+                return len(text)
+            self._flush()
+            start = end + 1
+
+    def _flush(self):
+        line = self._pending.rstrip("\r")
+        if self._dropped:
+            line += f" [... {self._dropped} chars truncated]"
+        self._send(self._stream, line)
+        self._pending, self._dropped = "", 0
+
+    def close_line(self):
+        if self._pending or self._dropped:
+            self._flush()
+
+
+class Worker:
+    def __init__(self, headless: bool):
+        self.headless = headless
+        self.loop = asyncio.new_event_loop()
+        self.playwright = None
+        self.browser = None
+        self.open_shims = []
+
+    async def ensure_browser(self, **launch_kwargs):
+        if self.playwright is None:
+            self.playwright = await _real_async_playwright().start()
+        if self.browser is None or not self.browser.is_connected():
+            # The warm browser uses the worker's headless setting, not the script's
+            launch_kwargs = {k: v for k, v in launch_kwargs.items() if k not in ("headless", "args")}
+            self.browser = await self.playwright.chromium.launch(headless=self.headless, **launch_kwargs)
+        return self.browser
+
+    def warm_up(self) -> bool:
+        try:
+            self.loop.run_until_complete(self.ensure_browser())
+            return True
+        except Exception as e:
+            # Launch lazily on first use instead; the job will surface the error
+            print(f"executor_worker: browser warm-up failed: {e}", file=sys.stderr)
+            return False
+
+    @contextmanager
+    def _patched(self):
+        original_run = asyncio.run
+        original_factory = playwright_api.async_playwright
+        asyncio.run = lambda main, **kwargs: self.loop.run_until_complete(main)
+        playwright_api.async_playwright = lambda: _PlaywrightShim(self)
+        try:
+            yield
+        finally:
+            asyncio.run = original_run
+            playwright_api.async_playwright = original_factory
+
+    def _cleanup(self):
+        shims, self.open_shims = self.open_shims, []
+        for shim in shims:
+            try:
+                self.loop.run_until_complete(shim.close())
+            except Exception:
+                pass
+
+    def run(self, code: str, send, max_line: int) -> dict:
+        """Runs one job; `send(stream, line)` receives its output line by line."""
+        stdout, stderr = _LineWriter(send, "stdout", max_line), _LineWriter(send, "stderr", max_line)
+        namespace = {"__name__": "__main__", "__file__": "generated_test_runner.py"}
+        started = time.perf_counter()
+        with redirect_stdout(stdout), redirect_stderr(stderr), self._patched():
+            try:
+                exec(compile(code, "generated_test_runner.py", "exec"), namespace)
+            except SystemExit:
+                pass
+            except BaseException:
+                traceback.print_exc()
+        stdout.close_line()
+        stderr.close_line()
+        self._cleanup()
+        return {
+            "duration": time.perf_counter() - started,
+            # Ask to be replaced if the warm browser died during the job
+            "recycle": self.browser is not None and not self.browser.is_connected(),
+        }
+
+    def close(self):
+        try:
+            if self.browser:
+                self.loop.run_until_complete(self.browser.close())
+            if self.playwright:
+                self.loop.run_until_complete(self.playwright.stop())
+        except Exception:
+            pass
+        self.loop.close()
+
+
+def main():
+    # Keep the protocol on a private copy of stdout; everything else goes to stderr
+    protocol = os.fdopen(os.dup(1), "w", buffering=1, encoding="utf-8")
+    os.dup2(2, 1)
+
+    worker = Worker(headless="--headless" in sys.argv)
+    warm = worker.warm_up()
+    protocol.write(json.dumps({"ready": True, "browser": warm}) + "\n")
+
+    lock = threading.Lock()  # scripts may print from their own threads
+
+    def send(message: dict):
+        with lock:
+            protocol.write(json.dumps(message) + "\n")
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        result = worker.run(job["code"], lambda stream, text: send({"id": job["id"], "stream": stream, "line": text}),
+                            job["max_line"])
+        result["id"] = job["id"]
+        send(result)
+
+    worker.close()
+
+
+if __name__ == "__main__":
+    main()
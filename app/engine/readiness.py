@@ -0,0 +1,136 @@
+import asyncio
+import fnmatch
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from config import Config
+
+# Records the time of the last DOM mutation in window.__qaLastMutation.
+# Installed as a context init script so it observes the page from the first byte.
+MUTATION_OBSERVER_SCRIPT = """
+(() => {
+  if (window.__qaMutationObserver) return;
+  window.__qaLastMutation = performance.now();
+  window.__qaMutationObserver = new MutationObserver(() => {
+    window.__qaLastMutation = performance.now();
+  });
+  window.__qaMutationObserver.observe(document, {
+    subtree: true, childList: true, attributes: true, characterData: true
+  });
+})();
+"""
+
+_DOM_QUIET_FOR = """
+() => {
+  if (window.__qaLastMutation === undefined) return null;
+  return performance.now() - window.__qaLastMutation;
+}
+"""
+
+READINESS_MODES = ("fixed", "load", "networkidle", "mutation", "adaptive")
+
+
+@dataclass
+class ReadinessResult:
+    """Outcome of a navigation: which mode was used, how long we waited and why we stopped."""
+    mode: str
+    waited: float = 0.0
+    reason: str = "settled"  # settled | cap | fixed | error
+    error: Optional[str] = None
+
+
+class NetworkTracker:
+    """Counts in-flight requests on a page and remembers the last network activity."""
+
+    def __init__(self, page):
+        self.page = page
+        self.inflight = 0
+        self.last_activity = time.monotonic()
+
+    def _on_request(self, request):
+        self.inflight += 1
+        self.last_activity = time.monotonic()
+
+    def _on_done(self, request):
+        self.inflight = max(0, self.inflight - 1)
+        self.last_activity = time.monotonic()
+
+    def attach(self):
+        self.page.on("request", self._on_request)
+        self.page.on("requestfinished", self._on_done)
+        self.page.on("requestfailed", self._on_done)
+        return self
+
+    def detach(self):
+        self.page.remove_listener("request", self._on_request)
+        self.page.remove_listener("requestfinished", self._on_done)
+        self.page.remove_listener("requestfailed", self._on_done)
+
+    def idle_for(self, max_inflight: int) -> float:
+        """Seconds the page has had at most `max_inflight` requests pending (0 if busy)."""
+        if self.inflight > max_inflight:
+            return 0.0
+        return time.monotonic() - self.last_activity
+
+
+def select_mode(url: str) -> str:
+    """Picks the readiness mode for a URL from Config.READINESS_RULES (first glob match wins)."""
+    for pattern, mode in Config.READINESS_RULES:
+        if fnmatch.fnmatch(url, pattern):
+            return mode
+    return Config.READINESS_MODE
+
+
+async def wait_until_ready(page, tracker: NetworkTracker, mode: str, started: float) -> ReadinessResult:
+    """
+    Waits after `domcontentloaded` until the page is settled according to `mode`:
+    - fixed: sleep READINESS_FIXED_DELAY (legacy behaviour)
+    - load: wait for the `load` event
+    - networkidle: no requests for READINESS_NETWORK_IDLE_MS
+    - mutation: no DOM mutations for READINESS_DOM_QUIET_MS
+    - adaptive: both of the above (tolerating a few long-lived requests)
+    All modes except fixed are bounded by READINESS_MAX_WAIT.
+    """
+    if mode not in READINESS_MODES:
+        raise ValueError(f"Unknown readiness mode: {mode}")
+
+    if mode == "fixed":
+        await asyncio.sleep(Config.READINESS_FIXED_DELAY)
+        return ReadinessResult(mode, time.monotonic() - started, "fixed")
+
+    deadline = started + Config.READINESS_MAX_WAIT
+    if mode == "load":
+        try:
+            await page.wait_for_load_state("load", timeout=max(0.0, deadline - time.monotonic()) * 1000)
+            return ReadinessResult(mode, time.monotonic() - started)
+        except Exception:
+            return ReadinessResult(mode, time.monotonic() - started, "cap")
+
+    network_idle = Config.READINESS_NETWORK_IDLE_MS / 1000
+    dom_quiet = Config.READINESS_DOM_QUIET_MS / 1000
+    # Analytics beacons and websockets never finish; adaptive mode tolerates a couple
+    max_inflight = Config.READINESS_MAX_INFLIGHT if mode == "adaptive" else 0
+
+    while time.monotonic() < deadline:
+        network_ok = mode == "mutation" or tracker.idle_for(max_inflight) >= network_idle
+        dom_ok = True
+        if network_ok and mode in ("mutation", "adaptive"):
+            try:
+                quiet_ms = await page.evaluate(_DOM_QUIET_FOR)
+            except Exception:
+                quiet_ms = None  # page navigated mid-check; try again
+            if quiet_ms is None:
+                # Observer missing (context created without the init script): install it now
+                try:
+                    await page.evaluate(MUTATION_OBSERVER_SCRIPT)
+                except Exception:
+                    pass
+                dom_ok = False
+            else:
+                dom_ok = quiet_ms / 1000 >= dom_quiet
+        if network_ok and dom_ok:
+            return ReadinessResult(mode, time.monotonic() - started)
+        await asyncio.sleep(Config.READINESS_POLL_INTERVAL)
+
+    return ReadinessResult(mode, time.monotonic() - started, "cap")
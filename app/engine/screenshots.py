@@ -0,0 +1,81 @@
+import asyncio
+import io
+import uuid
+from typing import Optional
+
+from loguru import logger
+from config import Config
+from app.core.blobs import get_blob_store
+from app.core.profiling import span
+
+try:  # Optional: WebP output and downscaling
+    from PIL import Image
+except ImportError:
+    Image = None
+
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+_warned = set()
+
+
+def _warn_once(message: str):
+    if message not in _warned:
+        _warned.add(message)
+        logger.warning(message)
+
+
+def _transcode(data: bytes, fmt: str, quality: int, max_width: int) -> bytes:
+    """Downscales to `max_width` and re-encodes with Pillow."""
+    with Image.open(io.BytesIO(data)) as img:
+        if max_width and img.width > max_width:
+            img = img.resize((max_width, round(img.height * max_width / img.width)), Image.LANCZOS)
+        if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        options = {"quality": quality} if fmt in ("jpeg", "webp") else {"optimize": True}
+        img.save(out, format=fmt.upper(), **options)
+        return out.getvalue()
+
+
+async def capture_screenshot(page, fmt: str = None, quality: int = None, max_width: int = None,
+                             full_page: bool = None, timeout: float = None) -> Optional[dict]:
+    """
+    Captures the page to bytes and stores them in the blob store.
+
+    Returns an artifact dict `{"id", "ref", "mime", "bytes"}` with a unique id per capture
+    (read the image with `get_blob_store().get_bytes(ref)`), or None on failure.
+    PNG and JPEG are encoded by the browser; WebP and downscaling need Pillow and run in
+    a worker thread. Without Pillow, WebP falls back to JPEG and images keep their size.
+    """
+    fmt = (fmt or Config.SCREENSHOT_FORMAT).lower()
+    quality = quality or Config.SCREENSHOT_QUALITY
+    max_width = Config.SCREENSHOT_MAX_WIDTH if max_width is None else max_width
+    full_page = Config.SCREENSHOT_FULL_PAGE if full_page is None else full_page
+    if fmt not in MIME_TYPES:
+        raise ValueError(f"Unknown screenshot format: {fmt}")
+
+    transcode = Image is not None and (fmt == "webp" or max_width > 0)
+    if Image is None:
+        if fmt == "webp":
+            _warn_once("Pillow is not installed; saving screenshots as JPEG instead of WebP")
+            fmt = "jpeg"
+        if max_width:
+            _warn_once("Pillow is not installed; screenshots are not downscaled")
+
+    # Downscaling re-encodes anyway, so capture losslessly first in that case
+    native = "png" if transcode else fmt
+    options = {"type": native, "full_page": full_page, "scale": "css", "timeout": timeout or Config.SCREENSHOT_TIMEOUT}
+    if native == "jpeg":
+        options["quality"] = quality
+    try:
+        with span("browser.screenshot", "browser", format=fmt, full_page=full_page):
+            data = await page.screenshot(**options)
+    except Exception as e:
+        logger.warning(f"Screenshot failed: {e}")
+        return None
+
+    if transcode:
+        with span("screenshot.encode", "browser", format=fmt):
+            data = await asyncio.to_thread(_transcode, data, fmt, quality, max_width)
+
+    ref = await asyncio.to_thread(get_blob_store().put_bytes, data)
+    return {"id": f"screenshot-{uuid.uuid4().hex[:12]}", "ref": ref, "mime": MIME_TYPES[fmt], "bytes": len(data)}
@@ -0,0 +1,201 @@
+import re
+from html.parser import HTMLParser
+from typing import Iterable, List, Optional, Set, Tuple
+
+# Elements that never have content (serialized as <tag/>)
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+}
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class _BudgetReached(Exception):
+    """Raised internally to abort parsing once the output budget is full."""
+
+
+class StreamingDOMCleaner(HTMLParser):
+    """
+    Single-pass cleaner: strips noisy tags, comments and disallowed attributes
+    and collapses whitespace while the HTML is being tokenized.
+
+    Memory is bounded by the output budget (plus the parser's lookahead buffer),
+    and parsing stops as soon as the budget is reached.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, allowed_attrs: Set[str], remove_tags: Set[str], max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.allowed_attrs = allowed_attrs
+        self.remove_tags = remove_tags
+        self.max_chars = max_chars
+
+        self._out: List[str] = []
+        self._length = 0
+        self._last_space = False
+        self._truncated = False
+        # Open elements as (tag, skipped) pairs, mirroring the tree builder
+        self._stack: List[Tuple[str, bool]] = []
+        self._skip_depth = 0
+
+    # --- Public API ---
+
+    def clean(self, chunks: Iterable[str]) -> str:
+        """Feeds HTML chunks through the parser and returns the cleaned string."""
+        try:
+            for chunk in chunks:
+                self.feed(chunk)
+            self.close()
+            # Close any element left open, like the tree serializer does
+            while self._stack:
+                tag, skipped = self._stack.pop()
+                if not skipped and not self._skip_depth:
+                    self._on_close(tag)
+                elif skipped:
+                    self._skip_depth -= 1
+        except _BudgetReached:
+            pass
+        return "".join(self._out)
+
+    @classmethod
+    def clean_text(cls, html_content: str, allowed_attrs: Set[str],
+                   remove_tags: Set[str], max_chars: int) -> str:
+        """Convenience wrapper that streams a complete HTML string in fixed-size chunks."""
+        cleaner = cls(allowed_attrs, remove_tags, max_chars)
+        size = cls.CHUNK_SIZE
+        chunks = (html_content[i:i + size] for i in range(0, len(html_content), size))
+        return cleaner.clean(chunks)
+
+    @property
+    def truncated(self) -> bool:
+        return self._truncated
+
+    # --- Output ---
+
+    def _emit(self, text: str, atomic: bool = False):
+        """
+        Appends collapsed text to the output. Tags are atomic: if one does not fit
+        it is dropped entirely; text is cut at the budget boundary.
+        """
+        text = _WHITESPACE.sub(' ', text)
+        if self._last_space and text.startswith(' '):
+            text = text[1:]
+        if not text:
+            return
+
+        remaining = self.max_chars - self._length
+        if len(text) > remaining:
+            self._truncated = True
+            if not atomic and remaining > 0:
+                self._out.append(text[:remaining])
+                self._length += remaining
+            raise _BudgetReached()
+
+        self._out.append(text)
+        self._length += len(text)
+        self._last_space = text.endswith(' ')
+
+    @staticmethod
+    def _escape(text: str) -> str:
+        return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+    def _format_attrs(self, attrs: List[Tuple[str, Optional[str]]]) -> str:
+        kept = {}
+        for key, value in attrs:
+            if key in self.allowed_attrs:
+                kept[key] = value
+        if not kept:
+            return ""
+
+        # Attributes are emitted in sorted order, like BeautifulSoup's default formatter
+        parts = []
+        for key, value in sorted(kept.items()):
+            value = self._escape(value or "")
+            quote = '"'
+            if '"' in value:
+                if "'" in value:
+                    value = value.replace('"', '&quot;')
+                else:
+                    quote = "'"
+            parts.append(f" {key}={quote}{value}{quote}")
+        return "".join(parts)
+
+    # --- Output hooks (overridden by tree builders) ---
+
+    def _on_open(self, tag: str, attrs: str):
+        self._emit(f"<{tag}{attrs}>", atomic=True)
+
+    def _on_close(self, tag: str):
+        self._emit(f"</{tag}>", atomic=True)
+
+    def _on_void(self, tag: str, attrs: str):
+        self._emit(f"<{tag}{attrs}/>", atomic=True)
+
+    def _on_text(self, text: str):
+        self._emit(self._escape(text))
+
+    def _on_markup(self, markup: str):
+        self._emit(markup, atomic=True)
+
+    # --- Parser callbacks ---
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.remove_tags:
+            if tag not in VOID_TAGS:
+                self._stack.append((tag, True))
+                self._skip_depth += 1
+            return
+        if tag in VOID_TAGS:
+            if not self._skip_depth:
+                self._on_void(tag, self._format_attrs(attrs))
+            return
+        self._stack.append((tag, False))
+        if not self._skip_depth:
+            self._on_open(tag, self._format_attrs(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in self.remove_tags:
+            return  # self-closing, so there is no content to skip
+        if tag in VOID_TAGS:
+            self.handle_starttag(tag, attrs)
+            return
+        if not self._skip_depth:
+            self._on_open(tag, self._format_attrs(attrs))
+            self._on_close(tag)
+
+    def handle_endtag(self, tag):
+        # Unmatched end tags are ignored; matched ones close everything above them
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                break
+        else:
+            return
+        while len(self._stack) > index:
+            name, skipped = self._stack.pop()
+            if skipped:
+                self._skip_depth -= 1
+            elif not self._skip_depth:
+                self._on_close(name)
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._on_text(data)
+
+    def handle_decl(self, decl):
+        if not self._skip_depth:
+            self._on_markup(f"<!{decl}>")
+            self._on_text("\n")
+
+    def handle_pi(self, data):
+        if not self._skip_depth:
+            self._on_markup(f"<?{data}>")
+
+    def unknown_decl(self, data):
+        if not self._skip_depth and data.startswith("CDATA["):
+            self._on_markup(f"<![CDATA[{data[6:]}]]>")
+
+    def handle_comment(self, data):
+        # Comments are dropped
+        pass
@@ -1,6 +1,5 @@
 import sys
 import os
-import time
 import uuid
 
 # Ensure root path is accessible
@@ -8,13 +7,24 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")
 
 import chainlit as cl
 from app.agent.graph import build_graph
-from app.core.metrics import MetricsTracker
+from app.core.blobs import get_blob_store, resolve
+from app.core.metrics import MetricsTracker, start_metrics_server
+from app.core.profiling import profile_run
 from app.core.state import AgentState
 from app.core.tracing import langfuse  # [Integration] Import robust tracing
+from config import Config
 
 # Initialize graph with persistence
 app_graph = build_graph()
 
+if Config.METRICS_PORT:
+    start_metrics_server(Config.METRICS_PORT)
+
+def strip_crawl_prefix(text: str) -> str:
+    """The URL of a "crawl <url>" message (or the stripped message itself)."""
+    text = text.strip()
+    return text[len("crawl "):].strip() if text.lower().startswith("crawl ") else text
+
 @cl.on_chat_start
 async def start():
     cl.user_session.set("metrics", MetricsTracker())
@@ -23,7 +33,26 @@ async def start():
     cl.user_session.set("previous_urls", [])
     cl.user_session.set("trace", None) # [Integration] Initialize trace storage
     
-    await cl.Message(content="**🚀 QA Testing Agent**\n\nFeatures:\n- 🌊 Streaming Tokens\n- 🤝 Human-in-the-Loop Reviews\n- 🔄 Multi-URL Testing\n- 🔍 **Langfuse Tracing Active**\n\nEnter a **URL** to begin.").send()
+    await cl.Message(content="**🚀 QA Testing Agent**\n\nFeatures:\n- 🌊 Streaming Tokens\n- 🤝 Human-in-the-Loop Reviews\n- 🔄 Multi-URL Testing (`crawl <url>` follows same-origin links)\n- 🔍 **Langfuse Tracing Active**\n\nEnter a **URL** to begin.").send()
+
+@cl.on_chat_resume
+async def resume(thread):
+    """
+    Reattaches a resumed Chainlit thread (requires a Chainlit data layer) to its
+    workflow thread. With the SQLite checkpointer, a review that was paused before
+    'implement' or 'human_approval' continues where it stopped, even after a restart.
+    """
+    metadata = thread.get("metadata") or {}
+    thread_id = metadata.get("thread_id") or str(uuid.uuid4())
+    cl.user_session.set("metrics", MetricsTracker())
+    cl.user_session.set("thread_id", thread_id)
+    cl.user_session.set("workflow_complete", metadata.get("workflow_complete", False))
+    cl.user_session.set("previous_urls", metadata.get("previous_urls", []))
+    cl.user_session.set("trace", None)
+
+    snapshot = await app_graph.aget_state({"configurable": {"thread_id": thread_id}})
+    if snapshot.next:
+        await cl.Message(content=f"⏯️ **Resumed paused review** (waiting before `{snapshot.next[0]}`). Type 'approve' or your feedback.").send()
 
 @cl.on_message
 async def main(message: cl.Message):
@@ -46,7 +75,7 @@ async def main(message: cl.Message):
 
     # Helper function to detect if message is a URL
     def is_url(text: str) -> bool:
-        text = text.strip()
+        text = strip_crawl_prefix(text)
         return text.startswith(('http://', 'https://', 'www.')) or '.' in text and ' ' not in text
 
     # --- SCENARIO A: NEW URL (Initial or after workflow completion) ---
@@ -62,17 +91,17 @@ async def main(message: cl.Message):
         
         # Reset workflow status
         cl.user_session.set("workflow_complete", False)
-        metrics.start_time = time.time()
-        metrics.last_time = metrics.start_time
-        metrics.total_tokens = 0
-        metrics.step_times = []
+        metrics.reset()
         
-        url = message.content
+        url = strip_crawl_prefix(message.content)
+        # "crawl <url>" also explores the same-origin pages linked from it
+        crawl = dict(Config.CRAWL_DEFAULTS) if url != message.content.strip() else {}
         inputs = AgentState(
             url=url, 
-            metrics=metrics,
-            dom_content="", clean_dom="", screenshot_path="", page_summary="",
-            element_map="", test_plan="", generated_code="", execution_logs="",
+            metrics=metrics, extractor=Config.PAGE_EXTRACTOR,
+            dom_content="", clean_dom="", capture_screenshot=True, screenshot=None, page_summary="",
+            element_map="", crawl=crawl, site_pages=[], site_map="", test_plan="", scenarios=[], scenario_results={}, generated_code="",
+            retrieved_chunks=[], execution_logs="", execution_limits={},
             test_results="Pending", attempt_count=0, error_feedback="", 
             user_feedback="", approved=False
         )
@@ -82,7 +111,7 @@ async def main(message: cl.Message):
         trace = langfuse.trace(
             name="chainlit-qa-run", 
             session_id=thread_id,
-            metadata={"url": url, "interface": "chainlit"}
+            metadata={"url": url, "crawl": bool(crawl), "interface": "chainlit"}
         )
         cl.user_session.set("trace", trace)
     
@@ -125,6 +154,10 @@ async def main(message: cl.Message):
 
     # 2. RUN THE GRAPH
     current_msg = None
+    crawl_msg = None  # crawl summaries run concurrently, so their tokens are not streamed
+    scenario_msgs = {}  # run_id -> message for parallel scenario branches
+    live_output = {}  # scenario id -> message receiving its test output as it runs
+    scenario_results = {}  # scenario id -> result, for the verification table
 
     # [Integration] Wrap the execution loop in a Span
     if not trace:
@@ -134,66 +167,122 @@ async def main(message: cl.Message):
 
     span = trace.span(name=step_name, input=message.content)
     try:
-        async for event in app_graph.astream_events(inputs, config, version="v1"):
-            kind = event["event"]
-            name = event["name"]
+        # With QA_AGENT_PROFILE=1 each turn is written as one Chrome trace
+        with profile_run(f"{thread_id}-{step_name}"):
+            async for event in app_graph.astream_events(inputs, config, version="v2"):
+                kind = event["event"]
+                name = event["name"]
             
-            if kind == "on_chain_start" and name in ["explore", "design", "implement", "verify"]:
-                if name == "explore":
-                    current_msg = cl.Message(content="**🔎 Exploring Page...**\n")
-                elif name == "design":
-                    current_msg = cl.Message(content="**📝 Designing Test Plan...**\n")
-                elif name == "implement":
-                    current_msg = cl.Message(content="**💻 Implementing Code...**\n```python\n")
-                elif name == "verify":
-                    current_msg = cl.Message(content="**🧪 Verifying Tests...**\n")
+                if kind == "on_chain_start" and name in ["explore", "design", "implement", "verify"]:
+                    if name == "explore":
+                        current_msg = cl.Message(content="**🔎 Exploring Page...**\n")
+                    elif name == "design":
+                        current_msg = cl.Message(content="**📝 Designing Test Plan...**\n")
+                    elif name == "implement":
+                        current_msg = cl.Message(content="**💻 Splitting Test Plan into Scenarios...**\n")
+                    elif name == "verify":
+                        current_msg = cl.Message(content="**🧪 Verifying Tests...**\n")
                 
-                if current_msg: await current_msg.send()
+                    if current_msg: await current_msg.send()
+
+                elif kind == "on_chain_start" and name == "crawl":
+                    crawl_msg = cl.Message(content="**🕸️ Crawling linked pages...**\n")
+                    await crawl_msg.send()
+                    current_msg = None
+
+                elif kind == "on_chain_end" and name == "crawl" and crawl_msg:
+                    output = event["data"].get("output") or {}
+                    pages = output.get("site_pages", [])
+                    explored = sum(1 for p in pages if not p["duplicate_of"] and not p["error"])
+                    crawl_msg.content = (f"**✅ Crawled {len(pages)} Page(s)** ({explored} explored)\n"
+                                         f"```\n{output.get('site_map', '')}\n```")
+                    await crawl_msg.update()
 
-            elif kind == "on_chat_model_stream" and current_msg:
-                token = event["data"]["chunk"].content
-                if token: await current_msg.stream_token(token)
+                elif kind == "on_chain_start" and name == "scenario":
+                    scenario = (event["data"].get("input") or {}).get("scenario", {})
+                    msg = cl.Message(content=f"**💻 {scenario.get('title', 'Scenario')}** — implementing & verifying...")
+                    scenario_msgs[event["run_id"]] = msg
+                    live_output[scenario.get("id")] = msg
+                    await msg.send()
 
-            elif kind == "on_chain_end" and name in ["explore", "design", "implement", "verify"]:
-                output = event["data"].get("output")
-                if not output: continue
+                elif kind == "on_custom_event" and name == "test_output":
+                    # Test output streamed line by line while the script runs
+                    data = event["data"]
+                    msg = live_output.get(data["scenario"])
+                    if msg:
+                        if "```" not in msg.content:
+                            await msg.stream_token("\n```\n")
+                        prefix = "" if data["stream"] == "stdout" else f"[{data['stream']}] "
+                        await msg.stream_token(f"{prefix}{data['line']}\n")
 
-                if name == "explore":
-                    summary = output.get("page_summary", "")
-                    stats = metrics.get_stats()
-                    explore_time = next((s["step_duration"] for s in stats["steps"] if s["step"] == "Exploration"), 0.0)
+                elif kind == "on_chain_end" and name == "scenario" and event["run_id"] in scenario_msgs:
+                    output = event["data"].get("output") or {}
+                    msg = scenario_msgs.pop(event["run_id"])
+                    scenario_results.update(output.get("scenario_results", {}))
+                    for sid, r in output.get("scenario_results", {}).items():
+                        live_output.pop(sid, None)
+                        status_icon = "✅" if r["result"] == "Passed" else "⚠️"
+                        msg.content = (f"**{status_icon} {r['title']}** — {r['result']} ({r['duration']}s)\n"
+                                       f"```python\n{resolve(r['code'])}\n```")
+                    await msg.update()
+
+                elif kind == "on_chat_model_stream" and current_msg:
+                    token = event["data"]["chunk"].content
+                    if token: await current_msg.stream_token(token)
+
+                elif kind == "on_chain_end" and name in ["explore", "design", "implement", "verify"]:
+                    output = event["data"].get("output")
+                    if not output: continue
+
+                    if name == "explore":
+                        summary = output.get("page_summary", "")
+                        stats = metrics.get_stats()
+                        explore_time = next((s["step_duration"] for s in stats["steps"] if s["step"] == "Exploration"), 0.0)
                     
-                    current_msg.content = f"**✅ Exploration Complete** (Time: {explore_time}s)\n\n{summary}"
-                    if output.get("screenshot_path"):
-                        current_msg.elements = [cl.Image(path=output["screenshot_path"], name="initial_state", display="inline")]
-                    await current_msg.update()
-
-                elif name == "design":
-                    plan = output.get("test_plan", "")
-                    current_msg.content = f"**📝 Test Plan Created**\n\n{plan}"
-                    actions = [
-                        cl.Action(name="approve_plan", value="approve", payload={"value": "approve"}, label="✅ Approve"),
-                        cl.Action(name="reject_plan", value="reject", payload={"value": "reject"}, label="💬 Critique")
-                    ]
-                    current_msg.actions = actions
-                    await current_msg.update()
-                    await cl.Message(content="**Waiting for review:** Type 'approve' to proceed, or type your feedback/changes.").send()
-
-                elif name == "implement":
-                    code = output.get("generated_code", "")
-                    current_msg.content = f"**💻 Code Generated**\n```python\n{code}\n```"
-                    await current_msg.update()
-
-                elif name == "verify":
-                    logs = output.get("execution_logs", "")
-                    result = output.get("test_results", "")
-                    status_icon = "🎉" if result == "Passed" else "⚠️"
-                    current_msg.content = f"**{status_icon} Verification {result}**\n\nLogs:\n```\n{logs}\n```"
-                    await current_msg.update()
+                        current_msg.content = f"**✅ Exploration Complete** (Time: {explore_time}s)\n\n{summary}"
+                        shot = output.get("screenshot")
+                        if shot:
+                            # Served from memory/blob store; no shared file on disk
+                            current_msg.elements = [cl.Image(content=get_blob_store().get_bytes(shot["ref"]), mime=shot["mime"],
+                                                             name=shot["id"], display="inline")]
+                        await current_msg.update()
+
+                    elif name == "design":
+                        plan = output.get("test_plan", "")
+                        current_msg.content = f"**📝 Test Plan Created**\n\n{plan}"
+                        actions = [
+                            cl.Action(name="approve_plan", value="approve", payload={"value": "approve"}, label="✅ Approve"),
+                            cl.Action(name="reject_plan", value="reject", payload={"value": "reject"}, label="💬 Critique")
+                        ]
+                        current_msg.actions = actions
+                        await current_msg.update()
+                        await cl.Message(content="**Waiting for review:** Type 'approve' to proceed, or type your feedback/changes.").send()
+
+                    elif name == "implement":
+                        scenarios = output.get("scenarios", [])
+                        reused = {sid: r for sid, r in (output.get("scenario_results") or {}).items() if r}
+                        scenario_results.update(reused)
+                        titles = "\n".join(f"- {s['title']}" + (" *(unchanged, reusing result)*" if s['id'] in reused else "")
+                                            for s in scenarios)
+                        current_msg.content = f"**💻 Running {len(scenarios) - len(reused)} Scenario(s) in Parallel**\n{titles}"
+                        await current_msg.update()
+                        # Parallel branches get their own messages; don't interleave their tokens here
+                        current_msg = None
+
+                    elif name == "verify":
+                        logs = resolve(output.get("execution_logs", ""))
+                        result = output.get("test_results", "")
+                        status_icon = "🎉" if result == "Passed" else "⚠️"
+                        table = "| Scenario | Result | Time |\n| --- | --- | --- |\n" + "\n".join(
+                            f"| {r['title']} | {r['result']}{' (reused)' if r.get('reused') else ''} | {r['duration']}s |"
+                            for _, r in sorted(scenario_results.items(), key=lambda item: int(item[0][1:]))
+                        )
+                        current_msg.content = f"**{status_icon} Verification {result}**\n\n{table}\n\nLogs:\n```\n{logs}\n```"
+                        await current_msg.update()
                     
-                    stats = metrics.get_stats()
-                    await cl.Message(content=f"--- \n**📊 Total Metrics**: {stats['tokens']} Tokens | {stats['duration']}s").send()
-                    await cl.Message(content="**Review Results:** Type 'approve' to finish, or type feedback to Re-Implement.").send()
+                        stats = metrics.get_stats()
+                        await cl.Message(content=f"--- \n**📊 Total Metrics**: {stats['tokens']} Tokens | {stats['duration']}s").send()
+                        await cl.Message(content="**Review Results:** Type 'approve' to finish, or type feedback to Re-Implement.").send()
     finally:
         span.end()
     
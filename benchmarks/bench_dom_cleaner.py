@@ -0,0 +1,43 @@
+"""
+Throughput benchmark: single-pass StreamingDOMCleaner vs. the BeautifulSoup pipeline.
+
+Usage:
+    python -m benchmarks.bench_dom_cleaner [--repeat 3] [--max-tokens 8000]
+"""
+import argparse
+import time
+
+from app.engine.dom_cleaner import DOMCleaner
+from benchmarks.pages import PAGE_SIZES, make_page
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(repeat: int = 3, max_tokens: int = 8000):
+    print(f"{'page':<8} {'size':>10} {'soup s':>9} {'stream s':>9} {'stream MB/s':>12} {'speedup':>8} {'match':>6}")
+    for name, size in PAGE_SIZES.items():
+        html = make_page(size)
+        soup_out = DOMCleaner.clean_dom(html, max_tokens, engine="soup")
+        stream_out = DOMCleaner.clean_dom(html, max_tokens, engine="stream")
+
+        soup_t = _best_of(lambda: DOMCleaner.clean_dom(html, max_tokens, engine="soup"), repeat)
+        stream_t = _best_of(lambda: DOMCleaner.clean_dom(html, max_tokens, engine="stream"), repeat)
+
+        mb = len(html) / 1e6
+        print(f"{name:<8} {len(html):>10} {soup_t:>9.4f} {stream_t:>9.4f} "
+              f"{mb / stream_t:>12.1f} {soup_t / stream_t:>7.1f}x {str(soup_out == stream_out):>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-tokens", type=int, default=8000)
+    args = parser.parse_args()
+    run(args.repeat, args.max_tokens)
@@ -0,0 +1,82 @@
+"""
+Prompt size (and optionally LLM latency): accessibility-tree outline vs. DOMCleaner.clean_dom.
+
+Both extractors run on the same pages, loaded into headless Chromium with set_content:
+saved HTML files from --pages DIR, or the synthetic pages from benchmarks.pages.
+--llm also sends each representation through the exploration prompt (uncached) and
+reports model latency and prompt tokens; it needs GOOGLE_API_KEY.
+
+Usage:
+    python -m benchmarks.bench_extractors [--pages DIR] [--max-tokens 3000] [--llm]
+"""
+import argparse
+import asyncio
+import glob
+import os
+import time
+
+from langchain_core.messages import HumanMessage
+from playwright.async_api import async_playwright
+
+from config import Config
+from app.engine.a11y_extractor import extract_accessibility_tree
+from app.engine.dom_cleaner import DOMCleaner
+from benchmarks.pages import PAGE_SIZES, make_page
+
+
+def load_pages(directory: str = None) -> dict:
+    if directory:
+        return {
+            os.path.basename(path): open(path, encoding="utf-8", errors="replace").read()
+            for path in sorted(glob.glob(os.path.join(directory, "*.htm*")))
+        }
+    return {name: make_page(size) for name, size in PAGE_SIZES.items() if size <= 1_000_000}
+
+
+async def _llm_call(text: str):
+    from app.agent.nodes import EXPLORE_PROMPT
+    from app.core.llm import get_llm
+    llm = get_llm(node="explore", cache=False)
+    start = time.perf_counter()
+    response = await llm.ainvoke([HumanMessage(content=EXPLORE_PROMPT.format(clean_dom=text))])
+    return time.perf_counter() - start, (response.usage_metadata or {}).get("input_tokens", 0)
+
+
+async def run(pages_dir: str = None, max_tokens: int = 3000, llm: bool = False):
+    pages = load_pages(pages_dir)
+    header = f"{'page':<16} {'html':>9} {'dom chars':>10} {'a11y chars':>11} {'ratio':>6} {'dom s':>7} {'a11y s':>7}"
+    if llm:
+        header += f" {'dom llm s':>10} {'a11y llm s':>11} {'dom tok':>8} {'a11y tok':>9}"
+    print(header)
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        for name, html in pages.items():
+            await page.set_content(html, wait_until="domcontentloaded")
+
+            start = time.perf_counter()
+            content = await page.content()
+            dom = DOMCleaner.clean_dom(content, max_tokens, mode=Config.DOM_MODE)
+            dom_t = time.perf_counter() - start
+
+            start = time.perf_counter()
+            a11y = await extract_accessibility_tree(page, max_tokens)
+            a11y_t = time.perf_counter() - start
+
+            row = (f"{name[:16]:<16} {len(html):>9} {len(dom):>10} {len(a11y):>11} "
+                   f"{len(a11y) / max(1, len(dom)):>6.2f} {dom_t:>7.3f} {a11y_t:>7.3f}")
+            if llm:
+                dom_llm, dom_tokens = await _llm_call(dom)
+                a11y_llm, a11y_tokens = await _llm_call(a11y)
+                row += f" {dom_llm:>10.2f} {a11y_llm:>11.2f} {dom_tokens:>8} {a11y_tokens:>9}"
+            print(row)
+        await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", help="Directory of saved .html pages (default: synthetic pages)")
+    parser.add_argument("--max-tokens", type=int, default=Config.A11Y_MAX_TOKENS)
+    parser.add_argument("--llm", action="store_true", help="Also measure exploration-prompt latency")
+    args = parser.parse_args()
+    asyncio.run(run(args.pages, args.max_tokens, args.llm))
@@ -0,0 +1,177 @@
+"""
+Load driver: N concurrent simulated users pushed through the full graph against the
+local mock LLM server (Config.LLM_PROVIDER = "mock"), reporting throughput and tail latency.
+
+Each user runs `--runs` workflows back to back on pages from benchmarks/fixtures (or
+--pages DIR) served locally, auto-approving the review interrupts. Like the chat UI,
+users consume `astream_events`, so model output is streamed and time to first token
+is measured (--no-stream uses plain ainvoke, like run_agent.py). The mock server is
+started in-process with the given latency/error settings unless --llm-url points at
+a running one. --rpm/--tpm set the LLM scheduler budgets (default: unlimited, so the
+server's capacity is measured). Needs Chromium, as the graph explores and tests real pages.
+
+Usage:
+    python -m benchmarks.load_test [--users 10] [--runs 2] [--ttft 0.4] [--tps 80]
+        [--rate-429 0.05] [--rpm 0] [--tpm 0] [--llm-url URL] [--no-stream]
+        [--output load_results.json]
+"""
+import os
+import tempfile
+
+# Must happen before config is imported (it checks the API key)
+os.environ.setdefault("QA_AGENT_LLM_PROVIDER", "mock")
+os.environ.setdefault("QA_AGENT_CHECKPOINT_BACKEND", "memory")
+os.environ.setdefault("QA_AGENT_CACHE_DIR", tempfile.mkdtemp(prefix="qa_load_cache_"))
+
+import argparse
+import asyncio
+import glob
+import itertools
+import json
+import sys
+import time
+import uuid
+from contextlib import nullcontext
+from typing import List
+
+import httpx
+from loguru import logger
+
+from config import Config
+from app.core.metrics import REGISTRY, MetricsTracker, percentile
+from benchmarks.mock_llm_server import add_settings_arguments, run_server, settings_from_args
+from benchmarks.server import serve_directory
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+async def simulate_user(graph, urls, runs: int, stream: bool, records: List[dict]):
+    """One user: `runs` workflows in sequence, each recorded with latency and outcome."""
+    from run_agent import MAX_INTERRUPTS, approve_pending, initial_state
+
+    for url in itertools.islice(itertools.cycle(urls), runs):
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        metrics = MetricsTracker()
+        record = {"url": url, "ttft": None}
+        started = time.perf_counter()
+        try:
+            payload = initial_state(url, metrics)
+            for _ in range(MAX_INTERRUPTS + 1):
+                if stream:
+                    async for event in graph.astream_events(payload, config, version="v2"):
+                        if event["event"] == "on_chat_model_stream" and record["ttft"] is None:
+                            record["ttft"] = time.perf_counter() - started
+                else:
+                    await graph.ainvoke(payload, config)
+                payload = None
+                if not await approve_pending(graph, config):
+                    break
+            record["result"] = (await graph.aget_state(config)).values.get("test_results")
+        except Exception as e:
+            record["result"] = "Error"
+            record["error"] = f"{type(e).__name__}: {e}"
+        record.update(duration=time.perf_counter() - started, tokens=metrics.total_tokens)
+        records.append(record)
+        logger.info(f"[{len(records)}] {record['result']:<7} {record['duration']:>7.2f}s  {url}")
+
+
+def summarize(records: List[dict], elapsed: float, users: int, server_stats: dict) -> dict:
+    durations = [r["duration"] for r in records]
+    ttfts = [r["ttft"] for r in records if r["ttft"] is not None]
+    outcomes = {}
+    for r in records:
+        outcomes[r["result"]] = outcomes.get(r["result"], 0) + 1
+    histograms = REGISTRY.snapshot()["histograms"]
+    return {
+        "users": users,
+        "workflows": len(records),
+        "wall_seconds": round(elapsed, 3),
+        "throughput_per_min": round(len(records) / elapsed * 60, 3) if elapsed else 0.0,
+        "latency": {f"p{q}": percentile(durations, q) for q in (50, 90, 95, 99)} | {"max": max(durations, default=0)},
+        "ttft": {f"p{q}": percentile(ttfts, q) for q in (50, 95, 99)},
+        "outcomes": outcomes,
+        "tokens": sum(r["tokens"] for r in records),
+        "llm_server": server_stats,
+        "nodes": histograms.get("qa_agent_node_duration_seconds", {}),
+        "llm_queue_wait": histograms.get("qa_agent_llm_queue_wait_seconds", {}),
+        "errors": sorted({r["error"] for r in records if r.get("error")})[:20],
+    }
+
+
+def print_summary(summary: dict):
+    print("\n" + "=" * 30)
+    print("LOAD TEST REPORT")
+    print("=" * 30)
+    print(f"Users: {summary['users']} | Workflows: {summary['workflows']} | Wall time: {summary['wall_seconds']:.2f}s")
+    print(f"Throughput: {summary['throughput_per_min']:.2f} workflows/min")
+    print("Latency (s): " + " | ".join(f"{k}={v:.2f}" for k, v in summary["latency"].items()))
+    print("TTFT (s): " + " | ".join(f"{k}={v:.2f}" for k, v in summary["ttft"].items()))
+    print("Outcomes: " + ", ".join(f"{k}={v}" for k, v in sorted(summary["outcomes"].items(), key=lambda kv: str(kv[0]))))
+    stats = summary["llm_server"]
+    if stats:
+        print(f"LLM server: requests={stats.get('requests')} streamed={stats.get('streamed')} "
+              f"429={stats.get('rate_limited')} 500={stats.get('errors')}")
+    for labels, s in sorted(summary["nodes"].items()):
+        print(f"Node {labels}: n={s['count']} p50={s['p50']:.2f} p95={s['p95']:.2f} p99={s['p99']:.2f}")
+    for labels, s in sorted(summary["llm_queue_wait"].items()):
+        print(f"LLM queue wait {labels}: n={s['count']} p50={s['p50']:.2f} p95={s['p95']:.2f} p99={s['p99']:.2f}")
+    for error in summary["errors"]:
+        print(f"Error: {error}")
+
+
+async def run_load(args) -> dict:
+    from langgraph.checkpoint.memory import MemorySaver
+    from app.agent.graph import build_graph
+    from app.agent.nodes import browser
+
+    Config.HEADLESS = True
+    # Every request should reach the mock server
+    Config.EXPLORE_CACHE_ENABLED = False
+    Config.LLM_CACHE_BACKEND = "none"
+    Config.LLM_RPM, Config.LLM_TPM = args.rpm, args.tpm
+
+    pages = sorted(glob.glob(os.path.join(args.pages or FIXTURES_DIR, "*.htm*")))
+    server_cm = nullcontext(None) if args.llm_url else run_server(settings_from_args(args))
+    with server_cm as server, serve_directory(os.path.dirname(pages[0])) as base_url:
+        Config.MOCK_LLM_URL = args.llm_url or server.url
+        urls = [f"{base_url}/{os.path.basename(p)}" for p in pages]
+        graph = build_graph(checkpointer=MemorySaver())
+        records: List[dict] = []
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(simulate_user(graph, urls[i % len(urls):] + urls[:i % len(urls)], args.runs,
+                                                 not args.no_stream, records) for i in range(args.users)))
+        finally:
+            await browser.close()
+        elapsed = time.perf_counter() - started
+        async with httpx.AsyncClient() as client:
+            try:
+                stats = (await client.get(f"{Config.MOCK_LLM_URL}/stats")).json()
+            except (httpx.HTTPError, ValueError):
+                stats = {}
+    return summarize(records, elapsed, args.users, stats)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users")
+    parser.add_argument("--runs", type=int, default=2, help="Workflows per user")
+    parser.add_argument("--pages", help="Directory of .html pages (default: benchmarks/fixtures)")
+    parser.add_argument("--llm-url", help="Use an already running mock server instead of starting one")
+    parser.add_argument("--rpm", type=int, default=0, help="LLM scheduler requests/minute budget (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=0, help="LLM scheduler tokens/minute budget (0 = unlimited)")
+    parser.add_argument("--no-stream", action="store_true", help="Invoke the graph without streaming events")
+    parser.add_argument("--output", help="Also write the summary as JSON")
+    add_settings_arguments(parser)
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(run_load(args))
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
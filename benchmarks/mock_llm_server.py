@@ -0,0 +1,204 @@
+"""
+Local chat-completion server standing in for Gemini during load tests.
+
+Speaks a minimal OpenAI-style protocol (POST /v1/chat/completions, optionally streamed
+as server-sent events) and is used through Config.LLM_PROVIDER = "mock"
+(see app.core.mock_llm). Replies come from the FakeChatModel templates (exploration
+summary, test plan, Playwright script), delivered with a configurable time to first
+token, token rate and chunk size. A share of requests can be failed with 429
+(Retry-After) or 500 to exercise error handling. GET /stats returns request counters.
+
+Usage:
+    python -m benchmarks.mock_llm_server [--port 8765] [--ttft 0.4] [--tps 80]
+        [--chunk-tokens 4] [--jitter 0.2] [--rate-429 0.05] [--error-rate 0.01]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+from app.core.fake_llm import FakeChatModel
+
+
+@dataclass
+class MockSettings:
+    ttft: float = 0.4  # seconds before the first token
+    tps: float = 80.0  # output tokens per second (0 = instant)
+    chunk_tokens: int = 4  # tokens per streamed chunk
+    jitter: float = 0.2  # +/- fraction applied to ttft and per-chunk delays
+    rate_429: float = 0.0  # share of requests answered with 429
+    error_rate: float = 0.0  # share of requests answered with 500
+    retry_after: float = 1.0  # seconds, sent with 429 responses
+    seed: int = 0
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, settings: MockSettings):
+        super().__init__(address, _Handler)
+        self.settings = settings
+        self.templates = FakeChatModel()
+        self.rng = random.Random(settings.seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "streamed": 0, "rate_limited": 0, "errors": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0}
+
+    def count(self, **deltas):
+        with self.lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def roll(self) -> float:
+        with self.lock:
+            return self.rng.random()
+
+    def delay(self, seconds: float) -> float:
+        jitter = self.settings.jitter
+        return max(0.0, seconds * (1 + jitter * (2 * self.roll() - 1))) if jitter else seconds
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockLLMServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] == "/stats":
+            with self.server.lock:
+                body = {**self.server.stats, "settings": asdict(self.server.settings)}
+            self._json(200, body)
+        else:
+            self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if self.path.split("?", 1)[0] != "/v1/chat/completions":
+            self._json(404, {"error": {"message": "not found"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        settings = self.server.settings
+        self.server.count(requests=1)
+
+        roll = self.server.roll()
+        if roll < settings.rate_429:
+            self.server.count(rate_limited=1)
+            self._json(429, {"error": {"message": "Resource exhausted (mock rate limit)"}},
+                       {"Retry-After": f"{settings.retry_after:g}"})
+            return
+        if roll < settings.rate_429 + settings.error_rate:
+            self.server.count(errors=1)
+            self._json(500, {"error": {"message": "Internal error (mock)"}})
+            return
+
+        prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+        content = self.server.templates.reply(prompt)
+        usage = {"prompt_tokens": _tokens(prompt), "completion_tokens": _tokens(content)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        self.server.count(prompt_tokens=usage["prompt_tokens"], completion_tokens=usage["completion_tokens"])
+
+        time.sleep(self.server.delay(settings.ttft))
+        if request.get("stream"):
+            self.server.count(streamed=1)
+            self._stream(content, usage)
+        else:
+            if settings.tps:
+                time.sleep(self.server.delay(usage["completion_tokens"] / settings.tps))
+            self._json(200, {"object": "chat.completion", "model": "mock",
+                             "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                          "finish_reason": "stop"}],
+                             "usage": usage})
+
+    def _stream(self, content: str, usage: dict):
+        settings = self.server.settings
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        step = max(1, settings.chunk_tokens) * 4
+        try:
+            for start in range(0, len(content), step):
+                piece = content[start:start + step]
+                if start and settings.tps:
+                    time.sleep(self.server.delay(_tokens(piece) / settings.tps))
+                self._event({"choices": [{"index": 0, "delta": {"content": piece}}]})
+            self._event({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away mid-stream
+
+    def _event(self, body: dict):
+        self.wfile.write(b"data: " + json.dumps(body).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+
+@contextmanager
+def run_server(settings: MockSettings = None, host: str = "127.0.0.1", port: int = 0) -> Iterator[MockLLMServer]:
+    """Runs the mock server from a daemon thread; `server.url` is its base URL."""
+    server = MockLLMServer((host, port), settings or MockSettings())
+    server.url = f"http://{host}:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser):
+    defaults = MockSettings()
+    parser.add_argument("--ttft", type=float, default=defaults.ttft, help="Seconds to first token")
+    parser.add_argument("--tps", type=float, default=defaults.tps, help="Output tokens per second (0 = instant)")
+    parser.add_argument("--chunk-tokens", type=int, default=defaults.chunk_tokens, help="Tokens per streamed chunk")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter, help="+/- fraction applied to delays")
+    parser.add_argument("--rate-429", type=float, default=defaults.rate_429, help="Share of requests failed with 429")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Share of requests failed with 500")
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after, help="Retry-After seconds on 429")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def settings_from_args(args) -> MockSettings:
+    return MockSettings(ttft=args.ttft, tps=args.tps, chunk_tokens=args.chunk_tokens, jitter=args.jitter,
+                        rate_429=args.rate_429, error_rate=args.error_rate, retry_after=args.retry_after,
+                        seed=args.seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+    server = MockLLMServer((args.host, args.port), settings_from_args(args))
+    print(f"Mock LLM server on http://{args.host}:{server.server_address[1]} "
+          f"(set QA_AGENT_LLM_PROVIDER=mock QA_AGENT_MOCK_LLM_URL=http://{args.host}:{server.server_address[1]})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
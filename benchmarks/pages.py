@@ -0,0 +1,87 @@
+"""
+Deterministic synthetic e-commerce pages used by the benchmarks.
+"""
+import random
+
+HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8"><title>Shop</title>
+  <link rel="stylesheet" href="/static/main.css">
+  <style>.card{display:flex}.price{color:#c00}</style>
+  <script>window.dataLayer = window.dataLayer || []; function gtag(){dataLayer.push(arguments);}</script>
+</head>
+<body class="home page-template">
+<!-- header -->
+<header id="header" class="site-header" style="background:#fff" data-track="header">
+  <nav role="navigation" aria-label="Main">
+    <a href="/" class="logo"><img src="/logo.png" alt="Shop logo"></a>
+    <ul class="nav navbar-nav">
+      <li><a href="/products" onclick="track('products')">Products</a></li>
+      <li><a href="/view_cart">Cart</a></li>
+      <li><a href="/login" data-testid="login-link">Signup / Login</a></li>
+    </ul>
+  </nav>
+</header>
+<main id="main">
+<div class="features_items"><h2 class="title text-center">Features Items</h2>
+"""
+
+CARD = """
+  <div class="col-sm-4" data-index="{i}" style="padding:4px">
+    <div class="product-image-wrapper"><div class="single-products">
+      <div class="productinfo text-center">
+        <img src="/img/p{i}.jpg" alt="Product {i}">
+        <svg width="16" height="16" viewBox="0 0 16 16"><path d="M0 0h16v16H0z"/></svg>
+        <h2 class="price">Rs. {price}</h2>
+        <p>{name} &amp; friends</p>
+        <a href="#" data-product-id="{i}" class="btn btn-default add-to-cart" onclick="add({i})">Add to cart</a>
+      </div>
+    </div></div>
+    <div class="choose"><ul class="nav nav-pills nav-justified">
+      <li><a href="/product_details/{i}">View Product</a></li>
+    </ul></div>
+  </div>"""
+
+TAIL = """
+</div>
+</main>
+<footer id="footer" class="footer">
+  <form action="/subscribe" method="post" class="searchform">
+    <label for="susbscribe_email">Subscription</label>
+    <input type="email" id="susbscribe_email" name="email" placeholder="Your email address" required>
+    <button type="submit" id="subscribe" class="btn btn-default" data-testid="subscribe-btn">Subscribe</button>
+  </form>
+  <p class="pull-left">Copyright © 2026 All rights reserved.</p>
+  <iframe src="https://ads.example.com/frame"></iframe>
+</footer>
+<noscript>Enable JavaScript</noscript>
+</body>
+</html>
+"""
+
+NAMES = ["Blue Top", "Men Tshirt", "Sleeveless Dress", "Stylish Dress", "Winter Top", "Summer White Top"]
+
+
+def make_page(target_bytes: int, seed: int = 0) -> str:
+    """Builds a product-grid page of roughly `target_bytes` characters."""
+    rng = random.Random(seed)
+    parts = [HEAD]
+    size = len(HEAD) + len(TAIL)
+    i = 0
+    while size < target_bytes:
+        card = CARD.format(i=i, price=rng.randint(100, 5000), name=rng.choice(NAMES))
+        parts.append(card)
+        size += len(card)
+        i += 1
+    parts.append(TAIL)
+    return "".join(parts)
+
+
+# Page sizes used across benchmarks (name -> approximate size in bytes)
+PAGE_SIZES = {
+    "small": 20_000,
+    "medium": 250_000,
+    "large": 1_000_000,
+    "xlarge": 4_000_000,
+}
@@ -0,0 +1,27 @@
+"""
+Local HTTP server for benchmark pages, so navigation is measured without the network.
+"""
+import functools
+import threading
+from contextlib import contextmanager
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass  # One line per request would drown the benchmark output
+
+
+@contextmanager
+def serve_directory(directory: str, host: str = "127.0.0.1") -> Iterator[str]:
+    """Serves `directory` on a free port from a daemon thread; yields the base URL."""
+    handler = functools.partial(_QuietHandler, directory=directory)
+    server = ThreadingHTTPServer((host, 0), handler)
+    thread = threading.Thread(target=server.serve_forever, name="bench-pages", daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,263 @@
+"""
+Offline end-to-end benchmark suite with a regression gate.
+
+Runs against a corpus of saved pages (benchmarks/fixtures plus synthetic product grids
+from 20 KB to 4 MB, or --pages DIR) served from a local HTTP server, with the
+deterministic fake LLM (Config.LLM_PROVIDER = "fake") in place of Gemini, so no
+network or API key is needed. Measures:
+
+  dom.*       DOMCleaner.clean_dom time and throughput per page
+  prompt.*    exploration prompt size per page (characters, and tokens after budgeting)
+  browser.*   navigation + content capture through BrowserManager
+  workflow.*  end-to-end graph runs (auto-approved) per page, with prompt tokens
+  node.*      p50 latency of each graph node over those runs
+
+Browser and workflow sections are skipped (with a warning) when Chromium cannot be
+launched. Results are written as JSON; with --baseline the run fails (exit code 1)
+when a metric is worse than the baseline by more than --threshold.
+
+Usage:
+    python -m benchmarks.suite [--pages DIR] [--repeat 3] [--skip-browser]
+                               [--output bench_results.json] [--baseline FILE]
+                               [--threshold 0.25] [--update-baseline]
+"""
+import os
+import tempfile
+
+# Offline setup; must happen before config is imported (it checks the API key)
+os.environ.setdefault("QA_AGENT_LLM_PROVIDER", "fake")
+os.environ.setdefault("QA_AGENT_CHECKPOINT_BACKEND", "memory")
+os.environ.setdefault("QA_AGENT_CACHE_DIR", tempfile.mkdtemp(prefix="qa_bench_cache_"))
+
+import argparse
+import asyncio
+import glob
+import json
+import platform
+import re
+import shutil
+import sys
+import time
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from config import Config
+from app.core.metrics import REGISTRY, MetricsTracker
+from app.engine.dom_cleaner import DOMCleaner
+from benchmarks.pages import PAGE_SIZES, make_page
+from benchmarks.server import serve_directory
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# Pages above this size are cleaned and measured offline but not run through the graph
+WORKFLOW_MAX_BYTES = 1_000_000
+# Differences below these absolute amounts never count as regressions (timer noise)
+ABS_TOLERANCE = {"s": 0.005, "MB/s": 0.5}
+
+Metrics = Dict[str, dict]
+
+
+def metric(value: float, unit: str, better: str = "lower") -> dict:
+    return {"value": round(value, 6), "unit": unit, "better": better}
+
+
+def build_corpus(workdir: str, pages_dir: str = None) -> Dict[str, int]:
+    """Copies the page corpus into `workdir` (served over HTTP); returns file name -> size."""
+    if pages_dir:
+        sources = sorted(glob.glob(os.path.join(pages_dir, "*.htm*")))
+    else:
+        sources = sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html")))
+    for path in sources:
+        shutil.copy(path, workdir)
+    if not pages_dir:
+        for name, size in PAGE_SIZES.items():
+            with open(os.path.join(workdir, f"{name}.html"), "w", encoding="utf-8") as f:
+                f.write(make_page(size))
+    return {name: os.path.getsize(os.path.join(workdir, name)) for name in sorted(os.listdir(workdir))}
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _page_key(name: str) -> str:
+    return os.path.splitext(name)[0]
+
+
+def bench_dom(workdir: str, pages: Dict[str, int], repeat: int) -> Metrics:
+    """DOM cleaning time/throughput and the resulting exploration prompt size."""
+    from app.agent.nodes import EXPLORE_PROMPT
+    from app.core.tokens import fit_prompt
+    results: Metrics = {}
+    for name in pages:
+        with open(os.path.join(workdir, name), encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        key = _page_key(name)
+        clean = DOMCleaner.clean_dom(html, mode=Config.DOM_MODE)
+        seconds = _best_of(lambda: DOMCleaner.clean_dom(html, mode=Config.DOM_MODE), repeat)
+        results[f"dom.{key}.seconds"] = metric(seconds, "s")
+        results[f"dom.{key}.mb_per_s"] = metric(len(html) / 1e6 / max(seconds, 1e-9), "MB/s", "higher")
+        results[f"prompt.{key}.explore_chars"] = metric(len(EXPLORE_PROMPT.format(clean_dom=clean)), "chars")
+        results[f"prompt.{key}.explore_tokens"] = metric(fit_prompt("explore", EXPLORE_PROMPT, {"clean_dom": clean}).tokens,
+                                                         "tokens")
+    return results
+
+
+async def bench_browser(base_url: str, pages: Dict[str, int], repeat: int) -> Metrics:
+    """Navigation (with readiness wait) plus page.content() per page, best of `repeat`."""
+    from app.agent.nodes import browser
+    results: Metrics = {}
+    for name in pages:
+        best = float("inf")
+        for _ in range(repeat):
+            async with browser.lease() as page:
+                start = time.perf_counter()
+                await browser.navigate(f"{base_url}/{name}", page=page)
+                await browser.get_content(page=page)
+                best = min(best, time.perf_counter() - start)
+        results[f"browser.{_page_key(name)}.load_seconds"] = metric(best, "s")
+    return results
+
+
+async def bench_workflows(base_url: str, pages: Dict[str, int]) -> Metrics:
+    """Runs every page through the full graph and reports per-run and per-node numbers."""
+    from langgraph.checkpoint.memory import MemorySaver
+    from app.agent.graph import build_graph
+    from run_agent import run_workflow
+
+    graph = build_graph(checkpointer=MemorySaver())
+    results: Metrics = {}
+    for name in pages:
+        metrics = MetricsTracker()
+        start = time.perf_counter()
+        final = await run_workflow(graph, f"{base_url}/{name}", metrics)
+        key = _page_key(name)
+        results[f"workflow.{key}.seconds"] = metric(time.perf_counter() - start, "s")
+        results[f"workflow.{key}.prompt_tokens"] = metric(metrics.prompt_tokens, "tokens")
+        if final.get("test_results") != "Passed":
+            logger.warning(f"Workflow for {name} ended with {final.get('test_results')}")
+
+    node_latency = REGISTRY.snapshot()["histograms"].get("qa_agent_node_duration_seconds", {})
+    for labels, summary in sorted(node_latency.items()):
+        node = re.search(r'node="([^"]+)"', labels)
+        if node and 'outcome="ok"' in labels:
+            results[f"node.{node.group(1)}.p50_seconds"] = metric(summary["p50"], "s")
+    return results
+
+
+async def _browser_available() -> bool:
+    from app.agent.nodes import browser
+    try:
+        await browser.start()
+        return True
+    except Exception as e:
+        logger.warning(f"Chromium unavailable, skipping browser and workflow benchmarks: {e}")
+        return False
+
+
+async def run_suite(pages_dir: str = None, repeat: int = 3, skip_browser: bool = False) -> dict:
+    Config.HEADLESS = True
+    # Measure the work itself, not cache hits from a previous page or run
+    Config.EXPLORE_CACHE_ENABLED = False
+    Config.LLM_CACHE_BACKEND = "none"
+
+    workdir = tempfile.mkdtemp(prefix="qa_bench_pages_")
+    try:
+        pages = build_corpus(workdir, pages_dir)
+        metrics = bench_dom(workdir, pages, repeat)
+        skipped: List[str] = []
+        if skip_browser:
+            skipped = ["browser", "workflow", "node"]
+        else:
+            from app.agent.nodes import browser
+            small = {name: size for name, size in pages.items() if size <= WORKFLOW_MAX_BYTES}
+            try:
+                if await _browser_available():
+                    with serve_directory(workdir) as base_url:
+                        metrics.update(await bench_browser(base_url, pages, repeat))
+                        metrics.update(await bench_workflows(base_url, small))
+                else:
+                    skipped = ["browser", "workflow", "node"]
+            finally:
+                await browser.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "llm_provider": Config.LLM_PROVIDER,
+            "dom_mode": Config.DOM_MODE,
+            "pages": pages,
+            "skipped": skipped,
+        },
+        "metrics": metrics,
+    }
+
+
+def compare(current: Metrics, baseline: Metrics, threshold: float) -> List[dict]:
+    """
+    Metrics present in both runs that got worse by more than `threshold` (a fraction
+    of the baseline value) and by more than ABS_TOLERANCE for their unit.
+    """
+    regressions = []
+    for name, base in sorted(baseline.items()):
+        now = current.get(name)
+        if now is None:
+            continue
+        before, after = base["value"], now["value"]
+        worse = after - before if base.get("better", "lower") == "lower" else before - after
+        if worse <= ABS_TOLERANCE.get(base.get("unit"), 0):
+            continue
+        if worse > abs(before) * threshold:
+            change = worse / abs(before) if before else float("inf")
+            regressions.append({"metric": name, "baseline": before, "current": after, "worse_by": change})
+    return regressions
+
+
+def print_report(results: dict, regressions: Optional[List[dict]] = None):
+    for name, m in results["metrics"].items():
+        print(f"{name:<44} {m['value']:>14.4f} {m['unit']}")
+    if results["meta"]["skipped"]:
+        print(f"Skipped: {', '.join(results['meta']['skipped'])}")
+    for r in regressions or []:
+        print(f"REGRESSION {r['metric']}: {r['baseline']} -> {r['current']} ({r['worse_by']:+.0%})")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", help="Directory of saved .html pages (default: fixtures + synthetic pages)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per timing (best is kept)")
+    parser.add_argument("--skip-browser", action="store_true", help="Only run the offline DOM/prompt benchmarks")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the results JSON")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown as a fraction (default: 0.25)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run to --baseline instead of comparing")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_suite(args.pages, max(1, args.repeat), args.skip_browser))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    regressions = []
+    if args.baseline and args.update_baseline:
+        shutil.copy(args.output, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results["metrics"], baseline["metrics"], args.threshold)
+    print_report(results, regressions)
+    print(f"Results written to {args.output}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
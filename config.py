@@ -5,10 +5,131 @@ load_dotenv()
 
 class Config:
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+    # "gemini", "fake" (deterministic offline model for benchmarks/tests) or "mock"
+    # (local mock server for load tests, see benchmarks/mock_llm_server.py); only gemini needs a key
+    LLM_PROVIDER = os.getenv("QA_AGENT_LLM_PROVIDER", "gemini")
+    FAKE_LLM_LATENCY = float(os.getenv("QA_AGENT_FAKE_LLM_LATENCY", "0"))  # seconds per call
+    MOCK_LLM_URL = os.getenv("QA_AGENT_MOCK_LLM_URL", "http://127.0.0.1:8765")
+    # Process-wide LLM scheduler: calls queue by priority (interactive before batch) until the
+    # requests- and tokens-per-minute budgets allow them (free tier of MODEL_NAME; 0 = unlimited)
+    LLM_SCHEDULER_ENABLED = True
+    LLM_RPM = int(os.getenv("QA_AGENT_LLM_RPM", "15"))
+    LLM_TPM = int(os.getenv("QA_AGENT_LLM_TPM", "250000"))
+    LLM_BURST_FRACTION = 0.1  # share of a minute's budget usable at once
+    LLM_OUTPUT_TOKENS_ESTIMATE = 1024  # reply size assumed before the real usage is known
+    LLM_MAX_RETRIES = 5  # on 429 / transient 5xx, with jittered exponential backoff
+    LLM_BACKOFF_BASE = 2.0  # seconds
+    LLM_BACKOFF_MAX = 60.0
     # FIX: Update model name to a fully qualified version tag
     MODEL_NAME = "gemini-2.5-flash-lite" 
     HEADLESS = False  # Set to False to see the browser as required
     TIMEOUT = 60000
+    # Browser context pool shared by concurrent sessions
+    BROWSER_POOL_SIZE = 4
+    BROWSER_POOL_IDLE_TIMEOUT = 300  # seconds before an idle context is closed
+    # Generated test execution: "pool" (warm workers), "subprocess" (fresh interpreter per run)
+    # or "sandbox" (fresh interpreter under CPU/memory rlimits, POSIX)
+    TEST_EXECUTION_MODE = "pool"
+    TEST_WORKERS = 3
+    TEST_WORKER_MAX_RUNS = 20  # jobs before a worker is recycled
+    # Per-run limits (0 disables); overridable per run via AgentState.execution_limits
+    TEST_TIMEOUT = 180  # wall-clock seconds, every mode
+    TEST_CPU_LIMIT = 120  # CPU seconds per process, "sandbox" mode
+    # Address space per process in MB, "sandbox" mode. Off by default: Chromium reserves
+    # far more virtual memory than it uses, so set it generously (e.g. 8192) if at all
+    TEST_MEMORY_LIMIT_MB = 0
+    # Verification output is streamed line by line; a line matching one of these regexes
+    # stops the run VERIFY_STOP_GRACE seconds later (time for the error details to arrive)
+    VERIFY_STOP_PATTERNS = [r"\bTEST FAILED\b", r"^Traceback \(most recent call last\):"]
+    VERIFY_STOP_GRACE = 1.0  # seconds
+    VERIFY_LOG_MAX_CHARS = 200_000  # per stream; the middle of longer output is dropped
+    VERIFY_LINE_MAX_CHARS = 4000
+    # Page readiness after navigation: fixed | load | networkidle | mutation | adaptive
+    READINESS_MODE = "adaptive"
+    READINESS_RULES = []  # [(url glob, mode)], first match wins, e.g. [("*://spa.example.com/*", "mutation")]
+    READINESS_MAX_WAIT = 10.0  # seconds, hard cap for every mode except fixed
+    READINESS_FIXED_DELAY = 2.0  # seconds, used by "fixed"
+    READINESS_NETWORK_IDLE_MS = 500
+    READINESS_DOM_QUIET_MS = 300
+    READINESS_MAX_INFLIGHT = 2  # long-lived requests tolerated by "adaptive"
+    READINESS_POLL_INTERVAL = 0.05  # seconds
+    # Scenarios from the approved plan are implemented and verified in parallel branches
+    SCENARIO_PARALLELISM = 3  # per run (workflow thread); concurrent runs each get their own
+    # After a critique, only re-implement and re-run scenarios whose plan text changed
+    INCREMENTAL_VERIFY = True
+    # Page representation from exploration: "dom" (cleaned HTML) or "a11y" (accessibility
+    # tree outline with locator hints); runs can override it via the `extractor` state field
+    PAGE_EXTRACTOR = "dom"
+    A11Y_MAX_TOKENS = 3000
+    A11Y_TEXT_CHARS = 80  # static text longer than this is shortened
+    # DOM representation sent to the LLM: "compact" (priority-aware) or "truncate"
+    DOM_MODE = "compact"
+    # Implementation prompt gets only the DOM chunks most relevant to the plan (BM25)
+    DOM_RETRIEVAL = True
+    RETRIEVAL_BUDGET_TOKENS = 3000  # DOM context budget; smaller pages are sent whole
+    RETRIEVAL_CHUNK_CHARS = 1200  # target size of one structural chunk
+    # Crawl mode: explore same-origin pages linked from the start URL and give the design
+    # prompt a site map. Off unless a run sets `crawl` (CLI --crawl, chat "crawl <url>");
+    # the run's dict overrides these defaults
+    CRAWL_DEFAULTS = {"max_depth": 2, "max_pages": 10}
+    CRAWL_CONCURRENCY = BROWSER_POOL_SIZE  # pages fetched at once
+    CRAWL_DUPLICATE_DISTANCE = 3  # SimHash bits; closer pages count as near-duplicates
+    CRAWL_SUMMARY_TOKENS = 200  # per-page summary length in the site map
+    # Input-token budget per node, counted with the tokenizer of MODEL_NAME (see app.core.tokens).
+    # Sections are listed in shrink order with their share of the room the template leaves
+    # and the part kept when cut ("head" or "middle"); sections under their share are kept whole
+    PROMPT_BUDGETS = {"explore": 8000, "crawl": 8000, "design": 6000, "implement": 6000}
+    PROMPT_SECTIONS = {
+        "explore": [("clean_dom", 1.0, "head")],
+        "crawl": [("clean_dom", 1.0, "head")],
+        "design": [("previous_plan", 0.15, "head"), ("site_map", 0.35, "head"), ("page_summary", 0.3, "head"),
+                   ("user_feedback", 0.2, "middle")],
+        "implement": [("dom", 0.6, "head"), ("feedback", 0.25, "middle"), ("scenario", 0.15, "head")],
+    }
+    # Exploration screenshot, captured to bytes and kept in the blob store
+    SCREENSHOT_ENABLED = True
+    SCREENSHOT_FORMAT = "jpeg"  # png | jpeg | webp (webp needs Pillow, else falls back to jpeg)
+    SCREENSHOT_QUALITY = 70  # jpeg/webp
+    SCREENSHOT_MAX_WIDTH = 1280  # downscale wider images (needs Pillow); 0 keeps the size
+    SCREENSHOT_FULL_PAGE = False  # viewport only
+    SCREENSHOT_TIMEOUT = 10000  # ms
 
-if not Config.GOOGLE_API_KEY:
+    # Profiling spans (Chrome trace-event JSON per run, viewable in Perfetto)
+    PROFILING_ENABLED = os.getenv("QA_AGENT_PROFILE", "0") == "1"
+    PROFILE_DIR = os.getenv("QA_AGENT_PROFILE_DIR", "profiles")
+    # Span names that also get a cProfile snapshot, e.g. "dom.clean,node.explore"
+    PROFILE_CPROFILE_SPANS = set(filter(None, os.getenv("QA_AGENT_CPROFILE_SPANS", "").split(",")))
+    # Prometheus metrics endpoint (http://127.0.0.1:PORT/metrics); 0 disables it
+    METRICS_PORT = int(os.getenv("QA_AGENT_METRICS_PORT", "0"))
+
+    # On-disk cache (exploration summaries keyed by cleaned DOM + model + prompt version)
+    CACHE_DIR = os.getenv("QA_AGENT_CACHE_DIR", ".cache")
+    EXPLORE_CACHE_ENABLED = True
+    EXPLORE_CACHE_TTL = 24 * 3600  # seconds
+    EXPLORE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+    # Prompt-level LLM response cache: "memory", "sqlite" or "none"
+    LLM_CACHE_BACKEND = "memory"
+    LLM_CACHE_TTL = 24 * 3600  # seconds
+    LLM_CACHE_MAX_BYTES = 20 * 1024 * 1024
+    # Nodes that always call the model ("explore" already has the exploration cache)
+    LLM_CACHE_DISABLED_NODES = {"explore"}
+
+    # Workflow checkpoints: "sqlite" (durable; paused reviews survive restarts) or "memory"
+    CHECKPOINT_BACKEND = os.getenv("QA_AGENT_CHECKPOINT_BACKEND", "sqlite")
+    CHECKPOINT_PATH = os.path.join(CACHE_DIR, "checkpoints.sqlite3")
+    CHECKPOINT_MAX_THREADS = 500  # most recently active threads kept
+    CHECKPOINT_MAX_AGE = 7 * 24 * 3600  # seconds a thread may stay idle
+    CHECKPOINT_KEEP_LAST = 5  # newest checkpoints kept per thread
+    CHECKPOINT_COMPACT_INTERVAL = 600  # seconds between background compactions
+
+    # Content-addressed blob store: large state fields (HTML, DOM, code, logs) are kept
+    # out of checkpoints as "blob:sha256:..." references
+    BLOB_STORE_ENABLED = True
+    BLOB_DIR = os.path.join(CACHE_DIR, "blobs")
+    BLOB_MIN_BYTES = 4096  # smaller values stay inline
+    BLOB_MEMORY_MAX_BYTES = 64 * 1024 * 1024  # in-memory LRU in front of the files
+    BLOB_MAX_AGE = CHECKPOINT_MAX_AGE + 24 * 3600  # unused blobs outlive their checkpoints by a day
+
+if Config.LLM_PROVIDER == "gemini" and not Config.GOOGLE_API_KEY:
     raise ValueError("GOOGLE_API_KEY not found in environment variables.")
\ No newline at end of file
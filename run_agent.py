@@ -1,44 +1,95 @@
+import argparse
 import asyncio
+import json
+import sys
+import time
+import uuid
 from app.agent.graph import build_graph
-from app.core.metrics import MetricsTracker
+from app.core.blobs import resolve
+from app.core.llm import llm_priority
+from app.core.metrics import REGISTRY, MetricsTracker, percentile, start_metrics_server
+from app.core.profiling import profile_run
 from app.core.state import AgentState
+from config import Config
 
-async def run_cli():
+# Safety net against a workflow that keeps pausing (each pause is auto-approved)
+MAX_INTERRUPTS = 10
+
+def initial_state(url: str, metrics: MetricsTracker, extractor: str = None, limits: dict = None,
+                  crawl: dict = None) -> AgentState:
+    """Initialize full state structure"""
+    return AgentState(
+        url=url,
+        metrics=metrics,
+        extractor=extractor or Config.PAGE_EXTRACTOR,
+        dom_content="",
+        clean_dom="",
+        capture_screenshot=False,  # nothing displays it here
+        screenshot=None,
+        page_summary="",
+        element_map="",
+        crawl=crawl or {},
+        site_pages=[],
+        site_map="",
+        test_plan="",
+        scenarios=[],
+        scenario_results={},
+        generated_code="",
+        retrieved_chunks=[],
+        execution_logs="",
+        test_results="Pending",
+        execution_limits=limits or {},
+        attempt_count=0,
+        error_feedback="",
+        user_feedback="",
+        approved=False
+    )
+
+async def run_workflow(graph, url: str, metrics: MetricsTracker, extractor: str = None, limits: dict = None,
+                       crawl: dict = None) -> dict:
+    """
+    Runs one URL through the graph, auto-approving the Human-in-the-Loop
+    interrupts (plan review before 'implement', result review before 'human_approval').
+    """
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    # With QA_AGENT_PROFILE=1 the whole run is written as one Chrome trace
+    with profile_run(url):
+        await graph.ainvoke(initial_state(url, metrics, extractor, limits, crawl), config)
+
+        for _ in range(MAX_INTERRUPTS):
+            if not await approve_pending(graph, config):
+                break
+            await graph.ainvoke(None, config)
+
+    return (await graph.aget_state(config)).values
+
+async def approve_pending(graph, config: dict) -> bool:
+    """Approves the interrupt the thread is paused at; False when the run has finished."""
+    snapshot = await graph.aget_state(config)
+    if not snapshot.next:
+        return False
+    if snapshot.next[0] == "human_approval":
+        await graph.aupdate_state(config, {"approved": True, "user_feedback": ""})
+    else:
+        await graph.aupdate_state(config, {"user_feedback": "", "approved": False})
+    return True
+
+async def run_cli(extractor: str = None, limits: dict = None, crawl: dict = None):
     """
     CLI runner for End-to-End testing without UI.
     """
     print("Initializing Agent...")
     graph = build_graph()
     metrics = MetricsTracker()
-    
+
     url = input("Enter URL to test: ")
     if not url:
         print("No URL provided. Exiting.")
         return
 
-    # Initialize full state structure
-    state = AgentState(
-        url=url, 
-        metrics=metrics,
-        dom_content="", 
-        clean_dom="", 
-        screenshot_path="", 
-        page_summary="",
-        element_map="", 
-        test_plan="", 
-        generated_code="", 
-        execution_logs="", 
-        test_results="Pending", 
-        attempt_count=0, 
-        error_feedback="",
-        user_feedback="",
-        approved=False
-    )
-    
     print("\nRunning Workflow...")
-    # Using ainvoke to run the async graph
-    final_state = await graph.ainvoke(state)
-    
+    final_state = await run_workflow(graph, url, metrics, extractor, limits, crawl)
+
     print("\n" + "="*30)
     print("FINAL REPORT")
     print("="*30)
@@ -46,8 +97,112 @@ async def run_cli():
     print(f"Result: {final_state['test_results']}")
     print(f"Attempts: {final_state['attempt_count']}")
     print(f"Total Tokens: {metrics.total_tokens}")
+    if final_state.get('site_map'):
+        print("\n--- Site Map ---")
+        print(final_state['site_map'])
     print("\n--- Execution Logs ---")
-    print(final_state.get('execution_logs', 'No logs available.'))
+    print(resolve(final_state.get('execution_logs')) or 'No logs available.')
+
+def read_urls(source: str) -> list:
+    """Reads one URL per line from a file or '-' (stdin); blank lines and '#' comments are skipped."""
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        return [line.strip() for line in stream if line.strip() and not line.strip().startswith("#")]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+async def run_batch(urls: list, concurrency: int, output: str, extractor: str = None, limits: dict = None,
+                    crawl: dict = None):
+    """
+    Runs many URLs concurrently (bounded by `concurrency`), writing one JSON line per URL
+    to `output` as results arrive, then prints throughput and latency percentiles.
+    """
+    graph = build_graph()
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    records = []
+
+    async def run_one(url: str, out):
+        async with semaphore:
+            metrics = MetricsTracker()
+            started = time.perf_counter()
+            record = {"url": url}
+            try:
+                final_state = await run_workflow(graph, url, metrics, extractor, limits, crawl)
+                record.update(
+                    result=final_state.get("test_results"),
+                    attempts=final_state.get("attempt_count"),
+                )
+                if crawl:
+                    record["pages"] = [p["url"] for p in final_state.get("site_pages") or []]
+            except Exception as e:
+                record.update(result="Error", attempts=0, error=f"{type(e).__name__}: {e}")
+            record.update(
+                tokens=metrics.total_tokens,
+                prompt_tokens=metrics.prompt_tokens,
+                completion_tokens=metrics.completion_tokens,
+                duration=round(time.perf_counter() - started, 2),
+                steps={s["step"]: s["step_duration"] for s in metrics.step_times},
+            )
+        async with write_lock:
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            records.append(record)
+            print(f"[{len(records)}/{len(urls)}] {str(record['result']):<7} {record['duration']:>7.2f}s  {url}")
+
+    started = time.perf_counter()
+    # Batch calls yield the LLM budget to interactive sessions sharing this process
+    with open(output, "w", encoding="utf-8") as out, llm_priority("batch"):
+        await asyncio.gather(*(run_one(url, out) for url in urls))
+    elapsed = time.perf_counter() - started
+
+    durations = [r["duration"] for r in records]
+    outcomes = {}
+    for r in records:
+        outcomes[r["result"]] = outcomes.get(r["result"], 0) + 1
+
+    print("\n" + "="*30)
+    print("BATCH REPORT")
+    print("="*30)
+    print(f"URLs: {len(records)} | Concurrency: {concurrency} | Wall time: {elapsed:.2f}s")
+    print(f"Throughput: {len(records) / elapsed * 60:.2f} URLs/min" if elapsed else "Throughput: n/a")
+    print("Outcomes: " + ", ".join(f"{k}={v}" for k, v in sorted(outcomes.items(), key=lambda kv: str(kv[0]))))
+    print("Latency (s): " + " | ".join(f"p{q}={percentile(durations, q):.2f}" for q in (50, 90, 95, 99))
+          + f" | max={max(durations, default=0):.2f}")
+    print(f"Total Tokens: {sum(r['tokens'] for r in records)}")
+    node_latency = REGISTRY.snapshot()["histograms"].get("qa_agent_node_duration_seconds", {})
+    for labels, summary in sorted(node_latency.items()):
+        print(f"Node {labels}: n={summary['count']} p50={summary['p50']:.2f} p95={summary['p95']:.2f} p99={summary['p99']:.2f}")
+    print(f"Results written to {output}")
 
 if __name__ == "__main__":
-    asyncio.run(run_cli())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the QA agent from the command line.")
+    parser.add_argument("--batch", metavar="FILE", help="Read URLs (one per line) from FILE, or '-' for stdin, and run them concurrently with auto-approve.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum workflows running at once in batch mode (default: 4).")
+    parser.add_argument("--extractor", choices=["dom", "a11y"], default=Config.PAGE_EXTRACTOR, help="Page representation for the LLM: cleaned HTML or accessibility tree (default: Config.PAGE_EXTRACTOR).")
+    parser.add_argument("--timeout", type=float, help="Wall-clock seconds per generated test run (default: Config.TEST_TIMEOUT, 0 = off).")
+    parser.add_argument("--cpu-limit", type=int, help="CPU seconds per test process in sandbox mode (default: Config.TEST_CPU_LIMIT, 0 = off).")
+    parser.add_argument("--memory-limit", type=int, metavar="MB", help="Address space per test process in sandbox mode (default: Config.TEST_MEMORY_LIMIT_MB, 0 = off).")
+    parser.add_argument("--crawl", action="store_true", help="Also explore same-origin pages linked from each URL and design against the site map.")
+    parser.add_argument("--crawl-depth", type=int, help="Link hops followed in crawl mode (default: Config.CRAWL_DEFAULTS).")
+    parser.add_argument("--crawl-pages", type=int, help="Pages fetched per URL in crawl mode (default: Config.CRAWL_DEFAULTS).")
+    parser.add_argument("--metrics-port", type=int, default=Config.METRICS_PORT, help="Serve Prometheus metrics on this local port (default: QA_AGENT_METRICS_PORT, 0 = off).")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file for per-URL batch results (default: batch_results.jsonl).")
+    args = parser.parse_args()
+    limits = {key: value for key, value in
+              (("wall_time", args.timeout), ("cpu_time", args.cpu_limit), ("memory_mb", args.memory_limit))
+              if value is not None}
+    crawl = {}
+    if args.crawl or args.crawl_depth is not None or args.crawl_pages is not None:
+        crawl = dict(Config.CRAWL_DEFAULTS)
+        crawl.update({key: value for key, value in (("max_depth", args.crawl_depth), ("max_pages", args.crawl_pages))
+                      if value is not None})
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+    if args.batch:
+        asyncio.run(run_batch(read_urls(args.batch), max(1, args.concurrency), args.output, args.extractor, limits, crawl))
+    else:
+        asyncio.run(run_cli(args.extractor, limits, crawl))
@@ -0,0 +1,52 @@
+from app.engine.a11y_extractor import compact_accessibility_tree, parse_aria_snapshot
+
+SNAPSHOT = """\
+- banner:
+  - navigation "Main":
+    - link "Products":
+      - /url: /products
+- main:
+  - heading "Features Items" [level=2]
+  - paragraph: Blue Top & friends
+  - button "Add"
+  - paragraph: Blue Top & friends
+  - button "Add"
+  - textbox "Name": bob
+  - textbox:
+    - /placeholder: Your email address
+  - combobox "Size":
+    - option "S"
+    - option "M" [selected]
+  - checkbox "Remember me" [checked]
+  - 'text: "Price: 500"'
+"""
+
+
+def test_parse_aria_snapshot():
+    nodes = {n.role + n.name: n for n in parse_aria_snapshot(SNAPSHOT)}
+    assert nodes["linkProducts"].props["url"] == "/products"
+    assert nodes["linkProducts"].landmark == 'navigation "Main"'
+    assert nodes["textboxName"].text == "bob"
+    assert nodes["checkboxRemember me"].attrs == {"checked": ""}
+    assert nodes["text"].text == "Price: 500"
+
+
+def test_interactive_first_with_locator_hints():
+    outline = compact_accessibility_tree(SNAPSHOT, max_tokens=1000)
+    lines = outline.splitlines()
+
+    assert lines[0] == "# Interactive elements (7)"
+    assert lines.index("# Page outline") > lines.index(
+        '- textbox "Name" value="bob" -> get_by_role("textbox", name="Name", exact=True)')
+    assert '- button "Add" -> get_by_role("button", name="Add", exact=True).nth(1)' in lines
+    assert '- textbox placeholder="Your email address" -> get_by_placeholder("Your email address")' in lines
+    assert any(line.startswith('- combobox "Size" options: S, M*') for line in lines)
+    assert "- paragraph: Blue Top & friends (x2)" in lines
+    assert "<div" not in outline
+
+
+def test_token_budget():
+    outline = compact_accessibility_tree(SNAPSHOT, max_tokens=40)
+    assert len(outline) <= 40 * 4 + 40
+    assert outline.splitlines()[1] == '## navigation "Main"'
+    assert outline.endswith("more lines omitted)")
@@ -0,0 +1,32 @@
+import os
+import time
+
+from app.core.blobs import BlobStore, is_ref
+
+
+def test_large_values_become_deduplicated_refs(tmp_path):
+    store = BlobStore(str(tmp_path), min_bytes=100)
+    html = "<div>" + "x" * 500 + "</div>"
+
+    ref = store.maybe_put(html)
+    assert is_ref(ref) and len(ref) < 100
+    assert store.maybe_put(html) == ref  # identical content is stored once
+    assert sum(len(files) for _, _, files in os.walk(tmp_path)) == 1
+    assert store.maybe_put("short") == "short"
+    assert store.resolve("short") == "short"
+    assert store.resolve(ref) == html
+
+    # A fresh store (new process) reads the file behind an existing reference
+    assert BlobStore(str(tmp_path)).resolve(ref) == html
+
+
+def test_memory_lru_and_prune(tmp_path):
+    store = BlobStore(str(tmp_path), min_bytes=1, memory_max_bytes=1500)
+    refs = [store.put(str(i) * 1000) for i in range(3)]
+    assert store.resolve(refs[0]) == "0" * 1000  # evicted from memory, served from disk
+    assert store.stats()["entries"] == 1
+
+    old = time.time() - 3600
+    os.utime(store._path(refs[1][len("blob:sha256:"):]), (old, old))
+    assert store.prune(max_age=60) == 1
+    assert store.resolve(refs[2]) == "2" * 1000
@@ -0,0 +1,66 @@
+import time
+import pytest
+from app.core.cache import SQLiteCache, MemoryLRUCache, ExplorationCache, LLMResponseCache, make_key
+
+
+def test_cache_roundtrip_and_counters(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "c.sqlite3"), namespace="t")
+    assert cache.get("k") is None
+    cache.set("k", "value")
+    assert cache.get("k") == "value"
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+
+
+def test_cache_ttl_expiry(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "c.sqlite3"), namespace="t", ttl=0.05)
+    cache.set("k", "value")
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+
+def test_cache_lru_eviction_by_size(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "c.sqlite3"), namespace="t", max_bytes=25)
+    cache.set("a", "x" * 10)
+    cache.set("b", "x" * 10)
+    assert cache.get("a") is not None  # "a" becomes most recently used
+    cache.set("c", "x" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_exploration_key_depends_on_model_and_prompt_version(tmp_path):
+    base = ExplorationCache.key("<html></html>", "model-a", "1")
+    assert base == ExplorationCache.key("<html></html>", "model-a", "1")
+    assert base != ExplorationCache.key("<html></html>", "model-b", "1")
+    assert base != ExplorationCache.key("<html></html>", "model-a", "2")
+    assert make_key("a", "bc") != make_key("ab", "c")
+
+
+def test_memory_lru_cache_evicts_least_recently_used():
+    cache = MemoryLRUCache(max_bytes=25)
+    cache.set("a", "x" * 10)
+    cache.set("b", "x" * 10)
+    cache.get("a")
+    cache.set("c", "x" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+
+@pytest.mark.asyncio
+async def test_llm_response_cache_replays_normalized_prompts():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_core.messages import HumanMessage
+
+    cache = LLMResponseCache(MemoryLRUCache())
+    llm = FakeListChatModel(responses=["first", "second"], cache=cache)
+
+    response = await llm.ainvoke([HumanMessage(content="Plan:\n  login")])
+    replay = await llm.ainvoke([HumanMessage(content="Plan: login")])
+    assert response.content == replay.content == "first"
+    assert replay.response_metadata["cache_hit"] is True
+    assert replay.usage_metadata["total_tokens"] == 0
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["bytes_saved"] > 0
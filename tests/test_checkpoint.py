@@ -0,0 +1,66 @@
+import time
+
+import pytest
+from langgraph.graph import StateGraph, END
+from typing import TypedDict
+
+from app.core.checkpoint import DurableSqliteSaver
+
+
+class _State(TypedDict):
+    count: int
+
+
+async def _step(state: _State):
+    return {"count": state["count"] + 1}
+
+
+def _graph(saver):
+    workflow = StateGraph(_State)
+    workflow.add_node("first", _step)
+    workflow.add_node("second", _step)
+    workflow.set_entry_point("first")
+    workflow.add_edge("first", "second")
+    workflow.add_edge("second", END)
+    return workflow.compile(checkpointer=saver, interrupt_before=["second"])
+
+
+@pytest.mark.asyncio
+async def test_paused_thread_survives_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    config = {"configurable": {"thread_id": "review"}}
+
+    saver = DurableSqliteSaver(path)
+    await _graph(saver).ainvoke({"count": 0}, config)
+    assert (await _graph(saver).aget_state(config)).next == ("second",)
+    saver.close()
+
+    # A new process would open the same file and resume the interrupt
+    restarted = DurableSqliteSaver(path)
+    graph = _graph(restarted)
+    assert (await graph.aget_state(config)).next == ("second",)
+    assert (await graph.ainvoke(None, config))["count"] == 2
+    restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_compaction_applies_retention(tmp_path):
+    saver = DurableSqliteSaver(str(tmp_path / "c.sqlite3"), max_threads=2, max_age=3600, keep_last=2)
+    graph = _graph(saver)
+    for thread_id in ("old", "a", "b", "c"):
+        config = {"configurable": {"thread_id": thread_id}}
+        await graph.ainvoke({"count": 0}, config)
+        await graph.ainvoke(None, config)
+    with saver.cursor() as cur:
+        cur.execute("UPDATE thread_activity SET updated_at = ? WHERE thread_id = 'old'", (time.time() - 7200,))
+
+    assert saver.stats()["checkpoints"] > 8
+    removed = saver.compact()
+    assert removed["threads"] == 2  # "old" expired, "a" beyond max_threads
+    stats = saver.stats()
+    assert stats["threads"] == 2 and stats["checkpoints"] == 4
+
+    # The newest checkpoint of a kept thread is intact
+    state = await graph.aget_state({"configurable": {"thread_id": "c"}})
+    assert state.values["count"] == 2 and not state.next
+    saver.close()
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from app.engine.context_pool import ContextPool, PooledContext
+
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+
+    def on(self, event, handler):
+        self.handler = handler
+
+    def is_closed(self):
+        return self.closed
+
+    async def evaluate(self, expression):
+        if self.closed:
+            raise RuntimeError("Target closed")
+        return 1
+
+    async def goto(self, url):
+        pass
+
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+
+    async def clear_cookies(self):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+
+async def factory():
+    return PooledContext(context=FakeContext(), page=FakePage())
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_released_contexts():
+    pool = ContextPool(factory, max_size=2)
+    entry = await pool.acquire()
+    await pool.release(entry)
+    again = await pool.acquire()
+    assert again is entry
+    assert pool.stats()["created"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_bounds_concurrent_leases():
+    pool = ContextPool(factory, max_size=1)
+    first = await pool.acquire()
+    waiter = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+    await pool.release(first)
+    second = await asyncio.wait_for(waiter, 1)
+    assert second is first
+
+
+@pytest.mark.asyncio
+async def test_pool_recycles_crashed_and_expired_contexts():
+    from app.core.metrics import REGISTRY
+    events = lambda: REGISTRY.snapshot()["counters"].get("qa_agent_browser_pool_events_total", {})
+    evicted_before = events().get('{event="evicted"}', 0)
+    pool = ContextPool(factory, max_size=2, idle_timeout=0.01)
+    entry = await pool.acquire()
+    await pool.release(entry)
+    entry.page.closed = True
+    replacement = await pool.acquire()
+    assert replacement is not entry
+    assert entry.context.closed
+
+    await pool.release(replacement)
+    await asyncio.sleep(0.02)
+    await pool.acquire()
+    assert pool.stats()["evicted"] == 1
+    assert events()['{event="evicted"}'] == evicted_before + 1
+
+
+def test_browser_managers_share_one_collector():
+    from app.core.metrics import REGISTRY
+    from app.engine.browser import BrowserManager
+
+    before = len(REGISTRY._collectors)
+    managers = [BrowserManager(max_contexts=2) for _ in range(3)]
+    assert len(REGISTRY._collectors) == before
+    assert REGISTRY.snapshot()["gauges"]["qa_agent_browser_pool_contexts"]['{state="max_size"}'] >= 6
+    del managers
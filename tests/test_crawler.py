@@ -0,0 +1,101 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+import pytest
+from app.engine.crawler import SiteCrawler, format_site_map, hamming, normalize_url, parse_page, simhash
+from app.engine.readiness import ReadinessResult
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://Shop.Test:443/cart/?b=2&utm_source=x&a=1#top") == "https://shop.test/cart?a=1&b=2"
+    assert normalize_url("../login", "http://shop.test/a/b") == "http://shop.test/login"
+    assert normalize_url("http://shop.test:8080//x//") == "http://shop.test:8080/x"
+    assert normalize_url("http://shop.test") == "http://shop.test/"
+    assert normalize_url("mailto:sales@shop.test") is None
+    assert normalize_url("javascript:void(0)") is None
+
+
+def test_parse_page_keeps_same_origin_page_links():
+    html = """<html><head><title> Shop
+      Home </title><base href="/store/"></head><body>
+      <a href="cart">Cart</a><a href="cart#items">Cart again</a><a href="/login?utm_campaign=x">Login</a>
+      <a href="https://other.test/">Elsewhere</a><a href="manual.pdf">Manual</a>
+      <a href="/logout" rel="nofollow">Logout</a><a href="tel:123">Call</a></body></html>"""
+    title, links = parse_page(html, "http://shop.test/index.html")
+    assert title == "Shop Home"
+    assert links == ["http://shop.test/store/cart", "http://shop.test/login"]
+
+
+def test_simhash_flags_near_duplicates():
+    product = "<div><h1>Red shoe</h1><button id='buy'>Add to cart</button><p>Size 42, leather, red.</p></div>" * 20
+    other = product.replace("Red shoe", "Blue shoe", 1)
+    login = "<form><input name='user'><input name='password' type='password'><button>Sign in</button></form>" * 20
+    assert hamming(simhash(product), simhash(other)) <= 3
+    assert hamming(simhash(product), simhash(login)) > 3
+
+
+_PRODUCT = "".join(f"<div><button>Add size {size} to cart</button><p>Leather, in stock.</p></div>" for size in range(36, 46))
+SITE = {
+    "http://shop.test/": '<a href="/login">Login</a><a href="/cart">Cart</a><a href="/p/1">Shoe</a><a href="/p/2">Shoe</a>',
+    "http://shop.test/login": '<form><input name="user"><button>Sign in</button></form><a href="/">Home</a>',
+    "http://shop.test/cart": '<table><tr><td>Items</td></tr></table><a href="/checkout">Checkout</a>',
+    "http://shop.test/checkout": '<form><input name="card"><button>Pay now</button></form>',
+    "http://shop.test/p/1": "<h1>Red shoe</h1>" + _PRODUCT,
+    "http://shop.test/p/2": "<h1>Blue shoe</h1>" + _PRODUCT,
+}
+
+
+class _FakeBrowser:
+    """Serves SITE with a fixed delay per page and records the peak number of open pages."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.open = self.peak = 0
+        self.visited = []
+
+    @asynccontextmanager
+    async def lease(self):
+        self.open += 1
+        self.peak = max(self.peak, self.open)
+        try:
+            yield {}
+        finally:
+            self.open -= 1
+
+    async def navigate(self, url, page=None):
+        await asyncio.sleep(self.delay)
+        page["url"] = url
+        self.visited.append(url)
+        if url not in SITE:
+            return ReadinessResult("fixed", self.delay, "error", "404")
+        return ReadinessResult("fixed", self.delay)
+
+    async def get_content(self, page=None):
+        return SITE[page["url"]]
+
+
+@pytest.mark.asyncio
+async def test_crawl_is_concurrent_bounded_and_deduplicated():
+    browser = _FakeBrowser(delay=0.2)
+    crawler = SiteCrawler(browser, max_depth=2, max_pages=10, concurrency=4, clean=lambda html: html)
+    arrived = []
+    started = time.perf_counter()
+    pages = await crawler.crawl("http://shop.test", SITE["http://shop.test/"], on_page=lambda p: arrived.append(p.url))
+    elapsed = time.perf_counter() - started
+
+    # Level 1 (4 pages) and level 2 (checkout) in parallel: ~2 page loads, not 5
+    assert elapsed < 0.7 and browser.peak == 4
+    assert "http://shop.test/" not in browser.visited  # start page HTML was passed in
+    by_url = {p.url: p for p in pages}
+    assert set(by_url) == set(SITE)
+    assert by_url["http://shop.test/p/2"].duplicate_of == "http://shop.test/p/1"
+    assert by_url["http://shop.test/checkout"].depth == 2
+    assert "http://shop.test/p/2" not in arrived and len(arrived) == 5
+
+    site_map = format_site_map(pages)
+    assert "[P1] / (depth 0) -> P2, P3, P4, P5" in site_map
+    assert "/p/2 (depth 1) - same layout as P4" in site_map
+
+    limited = await SiteCrawler(_FakeBrowser(0), max_depth=1, max_pages=3, concurrency=2,
+                                clean=lambda html: html).crawl("http://shop.test/")
+    assert [p.url for p in limited] == ["http://shop.test/", "http://shop.test/login", "http://shop.test/cart"]
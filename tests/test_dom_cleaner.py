@@ -13,4 +13,57 @@ def test_attribute_filtering():
     clean = DOMCleaner.clean_dom(html)
     assert 'onclick' not in clean
     assert 'style' not in clean
-    assert 'data-test="login-input"' in clean
\ No newline at end of file
+    assert 'data-test="login-input"' in clean
+
+def test_stream_engine_matches_soup_engine():
+    html = (
+        '<!DOCTYPE html><html><head><title>T</title></head><body>'
+        '<div class="a  b" onclick="x()" id="q">a &amp; b<br><input value="x&quot;y" name="n">'
+        '<ul><li>1<li>2</ul><svg><path d="M0"/></svg><svg/><p>kept</p><script src="a.js"/><span>too</span>'
+        '<!-- note --><p>unclosed</body></html>'
+    )
+    for max_tokens in (8000, 10, 4):
+        expected = DOMCleaner.clean_dom(html, max_tokens, engine="soup")
+        assert DOMCleaner.clean_dom(html, max_tokens, engine="stream") == expected
+
+
+def test_stream_engine_respects_budget():
+    html = "<div>" + "<p class='row'>item</p>" * 5000 + "</div>"
+    clean = DOMCleaner.clean_dom(html, max_tokens=100)
+    assert len(clean) <= 400
+    assert not clean.endswith("<")
+
+
+def test_compact_mode_keeps_interactive_elements_over_budget():
+    header = "".join(f"<p>Marketing paragraph number {i} with many words</p>" for i in range(300))
+    html = f"<header>{header}</header><footer><form><input name='email'><button id='checkout'>Pay</button></form></footer>"
+    clean = DOMCleaner.clean_dom(html, max_tokens=100, mode="compact")
+    assert len(clean) <= 400
+    assert '<input name="email"/>' in clean
+    assert '<button id="checkout">Pay</button>' in clean
+
+
+def test_compact_mode_collapses_repeated_siblings():
+    card = "<div class='card'><h3>Item</h3><p>Description of the item</p><a href='/buy'>Add to cart</a></div>"
+    html = f"<main>{card * 40}</main>"
+    clean = DOMCleaner.clean_dom(html, max_tokens=500, mode="compact")
+    assert clean.count("Add to cart") == 1
+    assert "+39 similar div.card" in clean
+    # Under budget nothing is collapsed
+    assert DOMCleaner.clean_dom(html, mode="compact").count("Add to cart") == 40
+
+
+def test_compact_mode_keeps_distinct_form_fields():
+    fields = "".join(
+        f"<div class='form-group'><label>{name.title()}</label><input name='{name}' data-testid='signup-{name}'></div>"
+        for name in ("name", "email", "password", "confirm", "phone")
+    )
+    nav = "".join(f"<li><a data-testid='nav-{p}' href='/{p}'>{p}</a></li>" for p in ("login", "cart", "checkout"))
+    filler = "".join(f"<p>Marketing paragraph number {i} with many words</p>" for i in range(100))
+    html = f"<ul>{nav}</ul><form>{fields}</form>{filler}"
+    clean = DOMCleaner.clean_dom(html, max_tokens=300, mode="compact")
+    assert "similar" not in clean
+    for name in ("name", "email", "password", "confirm", "phone"):
+        assert f'name="{name}"' in clean
+    for page in ("login", "cart", "checkout"):
+        assert f'href="/{page}"' in clean
@@ -0,0 +1,30 @@
+from app.engine.dom_retriever import chunk_dom, DOMIndex, format_chunks, get_dom_index
+
+def _page():
+    sections = "".join(
+        f'<section class="promo"><h2>Offer {i}</h2><p>{"Seasonal discount text. " * 10}</p></section>'
+        for i in range(20)
+    )
+    login = (
+        '<form id="login-form"><input name="email" type="email" placeholder="Email Address">'
+        '<input name="password" type="password"><button type="submit">Login</button></form>'
+    )
+    return f"<html><body><main>{sections}{login}{sections}</main></body></html>"
+
+def test_chunks_cover_dom_in_order():
+    chunks = chunk_dom(_page(), max_chunk_chars=600)
+    assert len(chunks) > 3
+    assert [c.id for c in chunks] == [f"c{i}" for i in range(len(chunks))]
+    assert all(len(c.html) <= 600 for c in chunks)
+    assert "".join(c.html for c in chunks).count("<section") == 40
+
+def test_retrieval_finds_login_form():
+    index = DOMIndex(chunk_dom(_page(), max_chunk_chars=600))
+    selected = index.select("Scenario 1: Verify login with email and password", budget_chars=1000)
+    assert selected and any('id="login-form"' in c.html for c in selected)
+    assert sum(len(c.html) for c in selected) <= 1000
+    assert "<!-- " + selected[0].id in format_chunks(selected)
+
+def test_index_is_built_once_per_dom():
+    dom = _page()
+    assert get_dom_index(dom, 600) is get_dom_index(dom, 600)
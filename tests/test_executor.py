@@ -0,0 +1,181 @@
+import asyncio
+import pytest
+import time
+import os
+import sys
+from app.engine.executor import (
+    ExecutionLimits, LogBuffer, RunOutcome, TestWorkerPool, classify_exit, collect_output, compile_stop_rules,
+    read_lines, run_in_subprocess, stream_output, stream_subprocess
+)
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_code_in_fresh_namespace():
+    pool = TestWorkerPool(size=1, headless=True)
+    try:
+        assert "TEST PASSED" in await pool.run("x = 1\nprint('TEST PASSED')")
+        output = await pool.run("print(x)")
+        assert "ERROR:" in output and "NameError" in output
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_worker_is_replaced_after_crash():
+    pool = TestWorkerPool(size=1, headless=True)
+    try:
+        output = await pool.run("import os\nos._exit(3)")
+        assert "Test worker crashed" in output
+        assert "ok" in await pool.run("print('ok')")
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_do_not_collide():
+    pool = TestWorkerPool(size=2, headless=True)
+    try:
+        outputs = await asyncio.gather(*(
+            pool.run(f"import time\ntime.sleep(0.2)\nprint('run-{i}')") for i in range(2)
+        ))
+        assert [o.strip() for o in outputs] == ["run-0", "run-1"]
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_subprocess_mode_uses_unique_files():
+    outputs = await asyncio.gather(*(run_in_subprocess(f"print('sub-{i}')") for i in range(2)))
+    assert [o.strip() for o in outputs] == ["sub-0", "sub-1"]
+
+
+_FAILS_THEN_HANGS = "print('step 1')\nprint('TEST FAILED')\nimport time\ntime.sleep(30)"
+
+
+@pytest.mark.asyncio
+async def test_stop_rule_ends_subprocess_run_early():
+    started = time.perf_counter()
+    output = await collect_output(stream_output(stream_subprocess(_FAILS_THEN_HANGS), grace=0.2))
+    assert time.perf_counter() - started < 10
+    assert output.startswith("step 1\nTEST FAILED\n")
+    assert "stopped early" in output
+
+
+@pytest.mark.asyncio
+async def test_stop_rule_replaces_pool_worker():
+    pool = TestWorkerPool(size=1, headless=True)
+    try:
+        lines = [line async for _, line in stream_output(pool.stream(_FAILS_THEN_HANGS), grace=0.2,
+                                                         rules=compile_stop_rules([r"TEST FAILED"]))]
+        assert lines[:2] == ["step 1", "TEST FAILED"] and "stopped early" in lines[-1]
+        assert "ok" in await pool.run("print('ok')")
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_wall_time_limit_reports_timeout():
+    outcome = RunOutcome()
+    output = await collect_output(stream_output(stream_subprocess("import time\nprint('start')\ntime.sleep(60)"),
+                                                wall_time=0.5, outcome=outcome))
+    assert outcome.status == "timeout"
+    assert output.startswith("start\n") and "timed out" in output
+
+
+_FAILS_THEN_FLOODS = "print('TEST FAILED')\nwhile True:\n    print('noise ' * 100)"
+
+
+@pytest.mark.asyncio
+async def test_stop_rule_ends_noisy_subprocess_run():
+    output = await asyncio.wait_for(
+        collect_output(stream_output(stream_subprocess(_FAILS_THEN_FLOODS), grace=0.2)), 15)
+    assert output.startswith("TEST FAILED\n") and "stopped early" in output
+
+
+@pytest.mark.asyncio
+async def test_wall_time_limit_stops_noisy_subprocess():
+    outcome = RunOutcome()
+    source = stream_subprocess("while True:\n    print('noise ' * 100)")
+    output = await asyncio.wait_for(collect_output(stream_output(source, wall_time=1, outcome=outcome)), 15)
+    assert outcome.status == "timeout" and "timed out" in output
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(sys.platform == "win32", reason="rlimits are POSIX only")
+async def test_cpu_limit_reports_timeout():
+    outcome = RunOutcome()
+    output = await collect_output(stream_subprocess("while True: pass", ExecutionLimits(cpu_time=1), outcome))
+    assert outcome.status == "timeout" and outcome.returncode < 0
+    assert "CPU time limit" in output
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX signals")
+def test_external_sigkill_is_not_a_cpu_timeout():
+    import signal
+    limits = ExecutionLimits(cpu_time=120)
+    assert classify_exit(-signal.SIGXCPU, limits)[0] == "timeout"
+    assert classify_exit(-signal.SIGKILL, limits)[0] == "oom"
+    assert classify_exit(-signal.SIGSEGV, limits) == ("crash", "terminated by signal SIGSEGV")
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+async def test_leaked_child_processes_are_reaped():
+    code = ("import subprocess, sys\n"
+            "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'], start_new_session=True)\n"
+            "print(child.pid)")
+    pid = int((await run_in_subprocess(code)).split()[0])
+    for _ in range(50):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                if f.read().split()[2] == "Z":
+                    break
+        except FileNotFoundError:
+            break
+        await asyncio.sleep(0.1)
+    else:
+        pytest.fail("child process survived the run")
+
+
+def test_log_buffer_keeps_head_and_tail():
+    buffer = LogBuffer(max_chars=100)
+    for i in range(1000):
+        buffer.add("stdout", f"line {i}")
+    buffer.add("stderr", "boom")
+    text = buffer.text()
+    assert len(text) < 200
+    assert text.startswith("line 0\n") and "lines omitted" in text
+    assert text.endswith("line 999\n\nERROR:\nboom\n")
+
+
+_HUGE_LINE = "import sys\nsys.stdout.write('x' * 5_000_000)\nprint()\nprint('after')"
+
+
+@pytest.mark.asyncio
+async def test_long_lines_are_cut_while_read():
+    reader = asyncio.StreamReader()
+    reader.feed_data("short\r\n".encode() + "é".encode() * 100_000)
+    reader.feed_data(b"\ntail")
+    reader.feed_eof()
+    lines = [line async for line in read_lines(reader, max_line=10)]
+    assert lines == ["short", "éééééééééé [... 99990 chars truncated]", "tail"]
+
+
+@pytest.mark.asyncio
+async def test_subprocess_caps_huge_lines(monkeypatch):
+    from app.engine import executor
+    monkeypatch.setattr(executor.Config, "VERIFY_LINE_MAX_CHARS", 100)
+    lines = [line async for _, line in stream_subprocess(_HUGE_LINE)]
+    assert lines == ["x" * 100 + " [... 4999900 chars truncated]", "after"]
+
+
+@pytest.mark.asyncio
+async def test_worker_caps_huge_lines(monkeypatch):
+    from app.engine import executor
+    monkeypatch.setattr(executor.Config, "VERIFY_LINE_MAX_CHARS", 100)
+    pool = TestWorkerPool(size=1, headless=True)
+    try:
+        lines = [line async for _, line in pool.stream(_HUGE_LINE)]
+        assert lines == ["x" * 100 + " [... 4999900 chars truncated]", "after"]
+    finally:
+        await pool.close()
@@ -0,0 +1,31 @@
+import pytest
+from langchain_core.messages import HumanMessage
+from app.agent.scenarios import split_scenarios
+from app.core import llm as llm_module
+from app.core.fake_llm import FakeChatModel
+from config import Config
+
+
+@pytest.mark.asyncio
+async def test_get_llm_returns_fake_model_without_key(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(Config, "GOOGLE_API_KEY", None)
+    llm = llm_module.get_llm(node="design")
+    assert isinstance(llm, FakeChatModel)
+    assert llm_module.model_id() == "fake"
+
+    response = await llm.ainvoke([HumanMessage(content="Based on the page analysis below, propose a Test Plan.")])
+    assert len(split_scenarios(response.content)) == 3
+    assert response.usage_metadata["input_tokens"] > 0
+
+
+def test_fake_model_is_deterministic():
+    model = FakeChatModel()
+    prompt = "You are a Senior SDET.\n    URL: http://127.0.0.1:8000/login.html\n    Test Scenario: Scenario 1: Verify page loads\n"
+    code = model.reply(prompt)
+    assert code == model.reply(prompt)
+    compile(code, "generated_test_runner.py", "exec")
+    assert "http://127.0.0.1:8000/login.html" in code and "TEST PASSED" in code
+
+    summary = model.reply("Analyze this DOM\n<h1>Sign in</h1><button>Go</button><a href='/'>Home</a>")
+    assert summary.startswith("Page purpose: Sign in") and "1 x <button>" in summary
@@ -9,4 +9,9 @@ def test_llm_instantiation():
         llm = get_llm()
         assert llm is not None
     except ValueError:
-        pytest.fail("API Key missing")
\ No newline at end of file
+        pytest.fail("API Key missing")
+
+def test_llm_client_is_shared():
+    if not os.getenv("GOOGLE_API_KEY"):
+        pytest.skip("No API Key provided")
+    assert get_llm() is get_llm()
@@ -0,0 +1,104 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app.core.llm import LLMScheduler, TokenBucket, _throttle_info, llm_priority
+from app.core.metrics import REGISTRY
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_never_exceeds_limit_per_minute():
+    clock = _Clock()
+    bucket = TokenBucket(limit=60, burst_fraction=0.1, clock=clock)
+    assert bucket.capacity == 6 and bucket.wait_time(6) == 0
+    bucket.take(6)
+    assert bucket.wait_time(1) == pytest.approx(60 / 54)
+    clock.now = 60
+    assert bucket.level == 0 and bucket.wait_time(6) == 0  # refilled 54 in the minute: 6 + 54 = 60
+    bucket.pause(10)
+    assert bucket.wait_time(1) == pytest.approx(10 + 60 / 54)
+
+
+@pytest.mark.asyncio
+async def test_interactive_calls_jump_the_queue():
+    scheduler = LLMScheduler(rpm=600, tpm=0, burst_fraction=0)
+    order = []
+
+    async def call(name, priority):
+        with llm_priority(priority):
+            await scheduler.call(lambda: asyncio.sleep(0, result=order.append(name)), 10)
+
+    await scheduler.acquire(1)  # empties the burst
+    tasks = [asyncio.create_task(call("batch-1", "batch")), asyncio.create_task(call("batch-2", "batch"))]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(call("chat", "interactive")))
+    await asyncio.gather(*tasks)
+    assert order == ["chat", "batch-1", "batch-2"]
+
+
+@pytest.mark.asyncio
+async def test_throttled_call_is_retried():
+    scheduler = LLMScheduler(rpm=6000, tpm=0, backoff_base=0.01, max_retries=2)
+    request = httpx.Request("POST", "http://mock/v1/chat/completions")
+    throttle = httpx.HTTPStatusError("429", request=request,
+                                     response=httpx.Response(429, headers={"Retry-After": "0.05"}, request=request))
+    attempts = []
+
+    async def invoke():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise throttle
+        return "ok"
+
+    before = REGISTRY.snapshot()["counters"].get("qa_agent_llm_throttled_total", {}).get('{priority="interactive"}', 0)
+    assert await scheduler.call(invoke, 10) == "ok"
+    assert len(attempts) == 2
+    assert REGISTRY.snapshot()["counters"]["qa_agent_llm_throttled_total"]['{priority="interactive"}'] == before + 1
+    assert _throttle_info(throttle) == ("throttled", 0.05)
+    assert _throttle_info(ValueError("bad prompt")) is None
+    assert _throttle_info(RuntimeError("Error calling model: 503 UNAVAILABLE"))[0] == "transient"
+
+
+@pytest.mark.asyncio
+async def test_throttled_retry_waits_without_request_budget():
+    scheduler = LLMScheduler(rpm=0, tpm=0, backoff_base=0.01, max_retries=1)
+    request = httpx.Request("POST", "http://mock/v1/chat/completions")
+    throttle = httpx.HTTPStatusError("429", request=request,
+                                     response=httpx.Response(429, headers={"Retry-After": "0.3"}, request=request))
+    attempts = []
+
+    async def invoke():
+        attempts.append(time.perf_counter())
+        if len(attempts) == 1:
+            raise throttle
+        return "ok"
+
+    assert await scheduler.call(invoke, 10) == "ok"
+    assert attempts[1] - attempts[0] >= 0.3
+
+
+@pytest.mark.asyncio
+async def test_cached_prompt_skips_the_queue(monkeypatch):
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from app.core import llm as llm_module
+    from app.core.cache import LLMResponseCache, MemoryLRUCache
+
+    monkeypatch.setattr(llm_module.Config, "LLM_PROVIDER", "fake")
+    scheduler = LLMScheduler(rpm=1, tpm=0, clock=_Clock())  # one request, never refilled
+    monkeypatch.setattr(llm_module, "_scheduler", scheduler)
+    cache = LLMResponseCache(MemoryLRUCache())
+    llm = llm_module.ScheduledLLM(FakeListChatModel(responses=["plan", "other"], cache=cache))
+
+    assert (await llm.ainvoke("Design a plan")).content == "plan"
+    assert scheduler.requests.level == 0
+    replay = await asyncio.wait_for(llm.ainvoke("Design a plan"), 1)
+    assert replay.content == "plan" and replay.response_metadata["cache_hit"] is True
+    assert scheduler.requests.level == 0
+    assert cache.stats()["hits"] == 1
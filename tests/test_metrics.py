@@ -0,0 +1,59 @@
+import json
+import time
+import urllib.request
+
+from app.core.metrics import MetricsRegistry, MetricsTracker, REGISTRY, start_metrics_server
+
+def test_histogram_percentiles_and_prometheus_format():
+    registry = MetricsRegistry()
+    for ms in range(1, 101):
+        registry.observe("qa_agent_node_duration_seconds", ms / 100, node="design")
+    registry.inc("qa_agent_llm_tokens_total", 120, node="design", type="prompt")
+    registry.set_gauge("qa_agent_browser_pool_contexts", 2, state="in_use")
+
+    summary = registry.snapshot()["histograms"]["qa_agent_node_duration_seconds"]['{node="design"}']
+    assert (summary["count"], summary["p50"], summary["p95"], summary["p99"]) == (100, 0.5, 0.95, 0.99)
+
+    text = registry.render_prometheus()
+    assert "# TYPE qa_agent_node_duration_seconds histogram" in text
+    assert 'qa_agent_node_duration_seconds_bucket{node="design",le="0.5"} 50' in text
+    assert 'qa_agent_node_duration_seconds_bucket{node="design",le="+Inf"} 100' in text
+    assert 'qa_agent_llm_tokens_total{node="design",type="prompt"} 120' in text
+    assert 'qa_agent_browser_pool_contexts{state="in_use"} 2' in text
+
+def test_tracker_splits_tokens_and_resets():
+    tracker = MetricsTracker()
+    tracker.add_usage({"input_tokens": 70, "output_tokens": 30, "total_tokens": 100}, "implement")
+    tracker.log_step("Implementation")
+    assert (tracker.total_tokens, tracker.prompt_tokens, tracker.completion_tokens) == (100, 70, 30)
+    assert tracker.step_times[0]["step_duration"] >= 0
+
+    tracker.reset()
+    assert (tracker.total_tokens, tracker.prompt_tokens, tracker.step_times) == (0, 0, [])
+
+def test_tracker_timing_survives_checkpoint_in_another_process():
+    import subprocess
+    import sys
+    from app.core.checkpoint import state_serializer
+
+    # Serialize a tracker the way the SQLite saver does, from a fresh interpreter
+    script = ("import sys; from app.core.checkpoint import state_serializer; from app.core.metrics import MetricsTracker; "
+              "sys.stdout.buffer.write(state_serializer().dumps_typed(MetricsTracker())[1])")
+    payload = subprocess.run([sys.executable, "-c", script], capture_output=True, check=True).stdout
+    tracker = state_serializer().loads_typed(("msgpack", payload))
+    # Wall-clock anchors; perf_counter readings would be meaningless after a restart
+    assert abs(tracker.start_time - time.time()) < 30
+
+    tracker.log_step("Resumed")
+    assert 0 <= tracker.step_times[0]["cumulative_duration"] < 30
+    assert 0 <= tracker.get_stats()["duration"] < 30
+
+def test_metrics_endpoint_serves_registry():
+    REGISTRY.inc("qa_agent_cache_requests_total", cache="endpoint-test", result="hit")
+    server = start_metrics_server(0)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    with urllib.request.urlopen(f"{base}/metrics") as response:
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert 'cache="endpoint-test"' in response.read().decode()
+    with urllib.request.urlopen(f"{base}/metrics.json") as response:
+        assert "qa_agent_cache_requests_total" in json.loads(response.read())["counters"]
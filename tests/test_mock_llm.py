@@ -0,0 +1,35 @@
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage
+from app.core.mock_llm import MockChatModel
+from benchmarks.mock_llm_server import MockSettings, run_server
+
+PLAN_PROMPT = [HumanMessage(content="Based on the page analysis below, propose a Test Plan.")]
+
+
+@pytest.mark.asyncio
+async def test_mock_server_streams_templated_reply():
+    with run_server(MockSettings(ttft=0.05, tps=0, chunk_tokens=2, jitter=0)) as server:
+        llm = MockChatModel(base_url=server.url)
+        response = await llm.ainvoke(PLAN_PROMPT)
+        assert response.content.startswith("Test Plan:") and "Scenario 3:" in response.content
+        assert response.usage_metadata["output_tokens"] > 0
+
+        chunks = [chunk async for chunk in llm.astream(PLAN_PROMPT)]
+        assert len(chunks) > 10
+        merged = chunks[0]
+        for chunk in chunks[1:]:
+            merged += chunk
+        assert merged.content == response.content
+        assert merged.usage_metadata["total_tokens"] == response.usage_metadata["total_tokens"]
+        assert server.stats["requests"] == 2 and server.stats["streamed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_mock_server_injects_rate_limits():
+    with run_server(MockSettings(ttft=0, rate_429=1.0, retry_after=2)) as server:
+        with pytest.raises(httpx.HTTPStatusError) as error:
+            await MockChatModel(base_url=server.url).ainvoke(PLAN_PROMPT)
+        assert error.value.response.status_code == 429
+        assert error.value.response.headers["Retry-After"] == "2"
+        assert server.stats["rate_limited"] == 1
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import pytest
+from app.core import profiling
+from app.core.profiling import profile_run, profiled, span
+
+def test_spans_are_noops_without_trace():
+    with span("idle") as args:
+        args["x"] = 1
+    assert profiling.current_trace() is None
+
+@pytest.mark.asyncio
+async def test_nested_spans_export_chrome_trace(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling.Config, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling.Config, "PROFILE_CPROFILE_SPANS", {"hot"})
+
+    @profiled("work", "test")
+    async def work(n):
+        with span("hot"):
+            sum(range(10000))
+        await asyncio.sleep(0.01 * n)
+
+    with profile_run("unit run", enabled=True) as trace:
+        with span("outer", url="http://x"):
+            await asyncio.gather(work(1), work(2))
+
+    events = [e for e in trace.to_chrome()["traceEvents"] if e["ph"] == "X"]
+    by_name = {}
+    for e in events:
+        by_name.setdefault(e["name"], []).append(e)
+    assert set(by_name) == {"run", "outer", "work", "hot"}
+    outer = by_name["outer"][0]
+    # Concurrent tasks get their own lanes, nested inside the outer span's time range
+    assert len({e["tid"] for e in by_name["work"]}) == 2
+    assert all(outer["ts"] <= e["ts"] and e["ts"] + e["dur"] <= outer["ts"] + outer["dur"] for e in by_name["work"])
+    assert outer["args"]["url"] == "http://x"
+
+    assert len(trace.profiles) == 2 and by_name["hot"][0]["args"]["cprofile"].endswith(".prof")
+    exported = list(tmp_path.glob("unit_run-*.trace.json"))
+    assert exported and json.loads(exported[0].read_text())["traceEvents"]
+
+@pytest.mark.asyncio
+async def test_llm_calls_become_spans(tmp_path, monkeypatch):
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    monkeypatch.setattr(profiling.Config, "PROFILE_DIR", str(tmp_path))
+    llm = FakeListChatModel(responses=["hi"], callbacks=[profiling.ProfilingCallbackHandler()])
+    with profile_run("llm", enabled=True) as trace:
+        await llm.ainvoke("hello")
+    assert [e["name"] for e in trace.events if e["cat"] == "llm"] == ["llm"]
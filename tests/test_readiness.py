@@ -0,0 +1,50 @@
+import time
+import pytest
+from config import Config
+from app.engine.readiness import NetworkTracker, select_mode, wait_until_ready
+
+
+class FakePage:
+    """Page whose DOM keeps mutating until `settle_at` (monotonic seconds)."""
+
+    def __init__(self, settle_at):
+        self.settle_at = settle_at
+
+    def on(self, event, handler):
+        pass
+
+    def remove_listener(self, event, handler):
+        pass
+
+    async def evaluate(self, script):
+        now = time.monotonic()
+        return 0 if now < self.settle_at else (now - self.settle_at) * 1000
+
+
+def test_select_mode_uses_first_matching_rule(monkeypatch):
+    monkeypatch.setattr(Config, "READINESS_MODE", "adaptive")
+    monkeypatch.setattr(Config, "READINESS_RULES", [("*://spa.example.com/*", "mutation")])
+    assert select_mode("https://spa.example.com/cart") == "mutation"
+    assert select_mode("https://shop.example.com/") == "adaptive"
+
+
+@pytest.mark.asyncio
+async def test_adaptive_waits_for_dom_quiescence(monkeypatch):
+    monkeypatch.setattr(Config, "READINESS_NETWORK_IDLE_MS", 0)
+    monkeypatch.setattr(Config, "READINESS_DOM_QUIET_MS", 50)
+    page = FakePage(settle_at=time.monotonic() + 0.1)
+    started = time.monotonic()
+    result = await wait_until_ready(page, NetworkTracker(page), "adaptive", started)
+    assert result.reason == "settled"
+    assert 0.15 <= result.waited < 1.0
+
+
+@pytest.mark.asyncio
+async def test_readiness_is_capped(monkeypatch):
+    monkeypatch.setattr(Config, "READINESS_MAX_WAIT", 0.2)
+    page = FakePage(settle_at=float("inf"))
+    tracker = NetworkTracker(page)
+    tracker.inflight = 5  # never idle
+    result = await wait_until_ready(page, tracker, "adaptive", time.monotonic())
+    assert result.reason == "cap"
+    assert result.waited < 0.5
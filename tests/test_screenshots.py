@@ -0,0 +1,44 @@
+import pytest
+
+from app.core.blobs import BlobStore
+from app.engine import screenshots
+
+
+class _FakePage:
+    def __init__(self):
+        self.calls = []
+
+    async def screenshot(self, **options):
+        self.calls.append(options)
+        return b"\xff\xd8fake-jpeg"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path))
+    monkeypatch.setattr(screenshots, "get_blob_store", lambda: store)
+    return store
+
+
+@pytest.mark.asyncio
+async def test_capture_to_blob_store_with_unique_ids(store):
+    page = _FakePage()
+    first = await screenshots.capture_screenshot(page, fmt="jpeg", quality=55, max_width=0, full_page=False)
+    second = await screenshots.capture_screenshot(page, fmt="jpeg", quality=55, max_width=0, full_page=False)
+
+    assert page.calls[0] == {"type": "jpeg", "quality": 55, "full_page": False, "scale": "css",
+                             "timeout": screenshots.Config.SCREENSHOT_TIMEOUT}
+    assert first["mime"] == "image/jpeg"
+    assert first["id"] != second["id"]  # per-run artifact ids...
+    assert first["ref"] == second["ref"]  # ...over deduplicated content
+    assert store.get_bytes(first["ref"]) == b"\xff\xd8fake-jpeg"
+
+
+@pytest.mark.asyncio
+async def test_webp_falls_back_to_jpeg_without_pillow(store, monkeypatch):
+    monkeypatch.setattr(screenshots, "Image", None)
+    page = _FakePage()
+    shot = await screenshots.capture_screenshot(page, fmt="webp", max_width=800, full_page=True)
+
+    assert page.calls[0]["type"] == "jpeg" and page.calls[0]["full_page"] is True
+    assert shot["mime"] == "image/jpeg"
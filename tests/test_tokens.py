@@ -0,0 +1,75 @@
+import pytest
+from app.core.metrics import REGISTRY
+from app.core.tokens import TRUNCATION_MARKER, count_tokens, fit_prompt, get_token_counter, truncate_to_tokens
+from config import Config
+
+
+@pytest.fixture(autouse=True)
+def fake_provider(monkeypatch):
+    # The fake model's usage is exactly 4 chars per token, which keeps sizes predictable
+    monkeypatch.setattr(Config, "LLM_PROVIDER", "fake")
+
+
+def test_counts_are_memoized():
+    counter = get_token_counter()
+    text = "<button id='buy'>Buy now</button>" * 50
+    hits = counter.hits
+    assert count_tokens(text) == count_tokens(text) == len(text) // 4
+    assert counter.hits == hits + 1
+
+
+@pytest.mark.parametrize("keep", ["head", "middle"])
+def test_truncate_stays_within_budget(keep):
+    text = "".join(f"line {i}\n" for i in range(500))
+    cut = truncate_to_tokens(text, 100, keep)
+    assert TRUNCATION_MARKER in cut and count_tokens(cut) <= 100
+    assert cut.startswith("line 0\n")
+    assert cut.endswith("line 499\n") == (keep == "middle")
+
+
+def test_fit_prompt_shrinks_sections_in_order(monkeypatch):
+    monkeypatch.setitem(Config.PROMPT_BUDGETS, "test", 1000)
+    monkeypatch.setitem(Config.PROMPT_SECTIONS, "test", [("dom", 0.6, "head"), ("feedback", 0.4, "middle")])
+    template = "DOM: {dom}\nFeedback: {feedback}\n"
+    before = REGISTRY.snapshot()["histograms"].get("qa_agent_prompt_tokens", {}).get('{node="test"}', {}).get("count", 0)
+
+    # Fits: nothing is cut
+    small = fit_prompt("test", template, {"dom": "a" * 2000, "feedback": "b" * 1000})
+    assert small.truncated == {} and small.tokens == count_tokens(small.text)
+
+    # Over budget: the DOM gives back only what is needed, short feedback is untouched
+    fitted = fit_prompt("test", template, {"dom": "a" * 4000, "feedback": "b" * 400})
+    assert list(fitted.truncated) == ["dom"] and "b" * 400 in fitted.text
+    assert fitted.tokens <= 1000
+
+    # Both over their share: the DOM is cut to its share first, then the feedback
+    both = fit_prompt("test", template, {"dom": "a" * 8000, "feedback": "b" * 8000})
+    assert list(both.truncated) == ["dom", "feedback"] and both.tokens <= 1000
+    assert both.truncated["dom"][1] <= 600
+    assert REGISTRY.snapshot()["histograms"]["qa_agent_prompt_tokens"]['{node="test"}']["count"] == before + 3
+
+
+@pytest.mark.asyncio
+async def test_gemini_uses_local_tokenizer_loaded_off_the_loop(monkeypatch):
+    import sys
+    import threading
+    import types
+    from app.core import tokens
+
+    loaded_on = []
+
+    class FakeTokenizer:
+        def __init__(self, model_name):
+            loaded_on.append(threading.current_thread())
+
+        def count_tokens(self, text):
+            return types.SimpleNamespace(total_tokens=len(text.split()))
+
+    monkeypatch.setitem(sys.modules, "google.genai.local_tokenizer", types.SimpleNamespace(LocalTokenizer=FakeTokenizer))
+    monkeypatch.setattr(Config, "LLM_PROVIDER", "gemini")
+    monkeypatch.setattr(tokens, "_counters", {})
+
+    counter = await tokens.warm_token_counter()
+    assert counter.name == Config.MODEL_NAME
+    assert loaded_on == [loaded_on[0]] and loaded_on[0] is not threading.main_thread()
+    assert count_tokens("one two three") == 3
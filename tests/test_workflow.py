@@ -4,8 +4,194 @@ from app.core.state import AgentState
 def test_state_initialization():
     state = AgentState(
         url="http://test.com", metrics=None,
-        dom_content="", clean_dom="", screenshot_path=None, page_summary="",
+        dom_content="", clean_dom="", capture_screenshot=False, screenshot=None, page_summary="",
         element_map="", test_plan="", generated_code="", execution_logs="", 
-        test_results="", attempt_count=0, error_feedback=""
+        test_results="", execution_limits={}, attempt_count=0, error_feedback=""
     )
-    assert state['url'] == "http://test.com"
\ No newline at end of file
+    assert state['url'] == "http://test.com"
+
+class _FakeSnapshot:
+    def __init__(self, next_nodes, values):
+        self.next = next_nodes
+        self.values = values
+
+
+class _FakeGraph:
+    """Pauses before 'implement' and 'human_approval' like the real graph."""
+
+    def __init__(self):
+        self.pauses = ["implement", "human_approval"]
+        self.values = {}
+        self.updates = []
+
+    async def ainvoke(self, inputs, config):
+        if inputs:
+            self.values = dict(inputs)
+
+    async def aget_state(self, config):
+        return _FakeSnapshot(tuple(self.pauses[:1]), self.values)
+
+    async def aupdate_state(self, config, values):
+        self.updates.append((self.pauses.pop(0), values))
+        self.values.update(values, test_results="Passed")
+
+
+@pytest.mark.asyncio
+async def test_batch_workflow_auto_approves_interrupts():
+    from run_agent import run_workflow
+    from app.core.metrics import MetricsTracker
+
+    graph = _FakeGraph()
+    final = await run_workflow(graph, "http://test.com", MetricsTracker())
+    assert [node for node, _ in graph.updates] == ["implement", "human_approval"]
+    assert graph.updates[-1][1]["approved"] is True
+    assert final["test_results"] == "Passed"
+
+
+def test_percentile_nearest_rank():
+    from app.core.metrics import percentile
+    values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert percentile(values, 50) == 5
+    assert percentile(values, 95) == 10
+    assert percentile([], 99) == 0.0
+
+
+def test_split_scenarios():
+    from app.agent.scenarios import split_scenarios
+    plan = (
+        "Here is the plan:\n"
+        "**Scenario 1: Verify Login**\n1. Open page\n2. Submit form\n"
+        "Scenario 2: Check Header\n- logo visible\n"
+        "### Scenario 3 - Search\nType a query"
+    )
+    scenarios = split_scenarios(plan)
+    assert [s["id"] for s in scenarios] == ["s1", "s2", "s3"]
+    assert scenarios[0]["title"] == "Scenario 1: Verify Login"
+    assert "Submit form" in scenarios[0]["text"]
+    assert [s["id"] for s in split_scenarios("1. Login\n2. Header\n3. Cart")] == ["s1", "s2", "s3"]
+    assert len(split_scenarios("Just check the page loads")) == 1
+
+
+
+class _FakeLLM:
+    """Writes a script that passes unless the scenario mentions the cart."""
+
+    async def ainvoke(self, messages):
+        from langchain_core.messages import AIMessage
+        scenario = messages[0].content.split("Test Scenario: ")[1].split("\n")[0]
+        return AIMessage(content=f"print('TEST {'FAILED' if 'Cart' in scenario else 'PASSED'}')  # {scenario}")
+
+
+@pytest.fixture
+def fake_graph(monkeypatch):
+    """Real graph with exploration, the LLM and test execution faked; plans come from `plans`."""
+    import asyncio
+    from app.agent import graph as graph_module, nodes
+
+    plans = ["Scenario 1: Login\nScenario 2: Header\nScenario 3: Cart"]
+    executed = []
+
+    async def fake_explore(state):
+        return {"clean_dom": "<button>Login</button>", "page_summary": "Shop"}
+
+    async def fake_design(state):
+        return {"test_plan": plans[0], "user_feedback": "", "approved": False}
+
+    async def fake_execute(code, limits=None, outcome=None):
+        executed.append(code)
+        await asyncio.sleep(0.3)
+        yield "stdout", code
+
+    monkeypatch.setattr(graph_module, "node_explore", fake_explore)
+    monkeypatch.setattr(graph_module, "node_design", fake_design)
+    monkeypatch.setattr(nodes, "get_llm", lambda node=None: _FakeLLM())
+    monkeypatch.setattr(nodes.browser, "stream_generated_test", fake_execute)
+    monkeypatch.setattr(nodes.Config, "SCENARIO_PARALLELISM", 3)
+    monkeypatch.setattr(nodes, "_scenario_semaphores", {})
+    from langgraph.checkpoint.memory import MemorySaver
+    return graph_module.build_graph(checkpointer=MemorySaver()), plans, executed
+
+
+@pytest.mark.asyncio
+async def test_scenarios_run_in_parallel(fake_graph):
+    import time
+    from app.core.metrics import MetricsTracker
+    from run_agent import run_workflow
+
+    graph, _, _ = fake_graph
+    started = time.perf_counter()
+    final = await run_workflow(graph, "http://test.com", MetricsTracker())
+    assert time.perf_counter() - started < 0.8  # slowest scenario, not the sum (0.9s)
+
+    results = final["scenario_results"]
+    assert {sid: r["result"] for sid, r in results.items()} == {"s1": "Passed", "s2": "Passed", "s3": "Failed"}
+    assert final["test_results"] == "Failed"
+    assert final["attempt_count"] == 1
+    assert "=== s3: Scenario 3: Cart (Failed) ===" in final["execution_logs"]
+
+
+@pytest.mark.asyncio
+async def test_critique_reruns_only_changed_scenarios(fake_graph):
+    from app.core.metrics import MetricsTracker
+    from run_agent import initial_state
+
+    graph, plans, executed = fake_graph
+    config = {"configurable": {"thread_id": "incremental"}}
+    await graph.ainvoke(initial_state("http://test.com", MetricsTracker()), config)
+    await graph.ainvoke(None, config)  # approve plan -> implement, scenarios, verify
+    assert len(executed) == 3
+
+    # Critique: the cart scenario is rewritten and the others are renumbered
+    plans[0] = "Scenario 1: Header\nScenario 2: Checkout\nScenario 3: Login"
+    await graph.aupdate_state(config, {"user_feedback": "replace cart with checkout", "approved": False})
+    await graph.ainvoke(None, config)  # -> design, pauses before implement
+    await graph.ainvoke(None, config)
+
+    assert len(executed) == 4 and "Checkout" in executed[-1]
+    results = (await graph.aget_state(config)).values["scenario_results"]
+    assert {sid: (r["title"], r["reused"]) for sid, r in results.items()} == {
+        "s1": ("Scenario 1: Header", True),
+        "s2": ("Scenario 2: Checkout", False),
+        "s3": ("Scenario 3: Login", True),
+    }
+    assert (await graph.aget_state(config)).values["test_results"] == "Passed"
+
+
+@pytest.mark.asyncio
+async def test_critique_reruns_unchanged_failed_scenarios(fake_graph):
+    from app.core.metrics import MetricsTracker
+    from run_agent import initial_state
+
+    graph, _, executed = fake_graph
+    config = {"configurable": {"thread_id": "retry-failed"}}
+    await graph.ainvoke(initial_state("http://test.com", MetricsTracker()), config)
+    await graph.ainvoke(None, config)
+    assert len(executed) == 3
+
+    # Same plan after the critique: the passed scenarios are reused, the failed cart one runs again
+    await graph.aupdate_state(config, {"user_feedback": "the cart test looks flaky", "approved": False})
+    await graph.ainvoke(None, config)
+    await graph.ainvoke(None, config)
+
+    assert len(executed) == 4 and "Cart" in executed[-1]
+    results = (await graph.aget_state(config)).values["scenario_results"]
+    assert {sid: (r["result"], r["reused"]) for sid, r in results.items()} == {
+        "s1": ("Passed", True), "s2": ("Passed", True), "s3": ("Failed", False),
+    }
+
+
+@pytest.mark.asyncio
+async def test_scenario_parallelism_is_per_run(fake_graph, monkeypatch):
+    import asyncio
+    import time
+    from app.agent import nodes
+    from app.core.metrics import MetricsTracker
+    from run_agent import run_workflow
+
+    graph, _, executed = fake_graph
+    monkeypatch.setattr(nodes.Config, "SCENARIO_PARALLELISM", 1)
+    started = time.perf_counter()
+    await asyncio.gather(*(run_workflow(graph, "http://test.com", MetricsTracker()) for _ in range(2)))
+    # Each run executes its 3 scenarios one at a time (0.9s); the runs do not queue behind each other
+    assert len(executed) == 6 and time.perf_counter() - started < 1.5
+    assert nodes._scenario_semaphores == {}